@@ -0,0 +1,40 @@
+"""Add article_transitions table
+
+Revision ID: a3d9e4b17c20
+Revises: 5fe88c006a51
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3d9e4b17c20'
+down_revision: Union[str, Sequence[str], None] = '5fe88c006a51'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('article_transitions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('article_id', sa.Integer(), nullable=False),
+    sa.Column('from_status', sa.String(length=50), nullable=True),
+    sa.Column('to_status', sa.String(length=50), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['article_id'], ['articles.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_article_transitions_created_at'), 'article_transitions', ['created_at'], unique=False)
+    op.create_index('ix_article_transitions_article_id_created_at', 'article_transitions', ['article_id', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_article_transitions_article_id_created_at', table_name='article_transitions')
+    op.drop_index(op.f('ix_article_transitions_created_at'), table_name='article_transitions')
+    op.drop_table('article_transitions')
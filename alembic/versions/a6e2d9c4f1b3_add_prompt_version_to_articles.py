@@ -0,0 +1,28 @@
+"""Add prompt_version to articles
+
+Revision ID: a6e2d9c4f1b3
+Revises: f3c8a1e6b5d7
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6e2d9c4f1b3'
+down_revision: Union[str, Sequence[str], None] = 'f3c8a1e6b5d7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('articles', sa.Column('prompt_version', sa.String(length=16), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('articles', 'prompt_version')
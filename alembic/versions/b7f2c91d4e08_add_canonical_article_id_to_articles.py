@@ -0,0 +1,35 @@
+"""Add canonical_article_id to articles
+
+Revision ID: b7f2c91d4e08
+Revises: a3d9e4b17c20
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7f2c91d4e08'
+down_revision: Union[str, Sequence[str], None] = 'a3d9e4b17c20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('articles', sa.Column('canonical_article_id', sa.Integer(), nullable=True))
+    op.create_index(op.f('ix_articles_canonical_article_id'), 'articles', ['canonical_article_id'], unique=False)
+    op.create_foreign_key(
+        'fk_articles_canonical_article_id', 'articles', 'articles',
+        ['canonical_article_id'], ['id'], ondelete='SET NULL'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('fk_articles_canonical_article_id', 'articles', type_='foreignkey')
+    op.drop_index(op.f('ix_articles_canonical_article_id'), table_name='articles')
+    op.drop_column('articles', 'canonical_article_id')
@@ -0,0 +1,58 @@
+"""Add llm_usage and llm_usage_daily tables
+
+Revision ID: c2f7b8e1d9a4
+Revises: a6e2d9c4f1b3
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c2f7b8e1d9a4'
+down_revision: Union[str, Sequence[str], None] = 'a6e2d9c4f1b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('llm_usage',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('article_id', sa.Integer(), nullable=True),
+    sa.Column('source_name', sa.String(length=255), nullable=True),
+    sa.Column('prompt_type', sa.String(length=20), nullable=False),
+    sa.Column('model', sa.String(length=100), nullable=False),
+    sa.Column('input_tokens', sa.Integer(), nullable=False),
+    sa.Column('output_tokens', sa.Integer(), nullable=False),
+    sa.Column('latency_ms', sa.Integer(), nullable=False),
+    sa.Column('failed', sa.Boolean(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_llm_usage_created_at'), 'llm_usage', ['created_at'], unique=False)
+    op.create_table('llm_usage_daily',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('source_name', sa.String(length=255), nullable=False),
+    sa.Column('prompt_type', sa.String(length=20), nullable=False),
+    sa.Column('model', sa.String(length=100), nullable=False),
+    sa.Column('calls', sa.Integer(), nullable=False),
+    sa.Column('failures', sa.Integer(), nullable=False),
+    sa.Column('input_tokens', sa.BigInteger(), nullable=False),
+    sa.Column('output_tokens', sa.BigInteger(), nullable=False),
+    sa.Column('latency_ms', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_llm_usage_daily_key', 'llm_usage_daily', ['day', 'source_name', 'prompt_type', 'model'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_llm_usage_daily_key', table_name='llm_usage_daily')
+    op.drop_table('llm_usage_daily')
+    op.drop_index(op.f('ix_llm_usage_created_at'), table_name='llm_usage')
+    op.drop_table('llm_usage')
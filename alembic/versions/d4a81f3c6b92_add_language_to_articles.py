@@ -0,0 +1,28 @@
+"""Add language to articles
+
+Revision ID: d4a81f3c6b92
+Revises: b7f2c91d4e08
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4a81f3c6b92'
+down_revision: Union[str, Sequence[str], None] = 'b7f2c91d4e08'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('articles', sa.Column('language', sa.String(length=10), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('articles', 'language')
@@ -0,0 +1,41 @@
+"""Add article_translations table
+
+Revision ID: e19b7c5d20f4
+Revises: d4a81f3c6b92
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e19b7c5d20f4'
+down_revision: Union[str, Sequence[str], None] = 'd4a81f3c6b92'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('article_translations',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('article_id', sa.Integer(), nullable=False),
+    sa.Column('language', sa.String(length=10), nullable=False),
+    sa.Column('title', sa.Text(), nullable=False),
+    sa.Column('content', mysql.LONGTEXT(), nullable=True),
+    sa.Column('summary', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['article_id'], ['articles.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_article_translations_article_id_language', 'article_translations', ['article_id', 'language'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_article_translations_article_id_language', table_name='article_translations')
+    op.drop_table('article_translations')
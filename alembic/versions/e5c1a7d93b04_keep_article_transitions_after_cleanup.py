@@ -0,0 +1,42 @@
+"""Keep article_transitions rows when their article is deleted
+
+Revision ID: e5c1a7d93b04
+Revises: d8b3f6a2c5e1
+Create Date: 2026-10-20 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5c1a7d93b04'
+down_revision: Union[str, Sequence[str], None] = 'd8b3f6a2c5e1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# کلید خارجی بدون نام در a3d9e4b17c20 ساخته شده و MySQL این نام را به آن داده است
+IMPLICIT_FK_NAME = 'article_transitions_ibfk_1'
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.drop_constraint(IMPLICIT_FK_NAME, 'article_transitions', type_='foreignkey')
+    op.alter_column('article_transitions', 'article_id', existing_type=sa.Integer(), nullable=True)
+    op.create_foreign_key(
+        'fk_article_transitions_article_id', 'article_transitions', 'articles',
+        ['article_id'], ['id'], ondelete='SET NULL'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('fk_article_transitions_article_id', 'article_transitions', type_='foreignkey')
+    op.execute("DELETE FROM article_transitions WHERE article_id IS NULL")
+    op.alter_column('article_transitions', 'article_id', existing_type=sa.Integer(), nullable=False)
+    op.create_foreign_key(
+        IMPLICIT_FK_NAME, 'article_transitions', 'articles',
+        ['article_id'], ['id'], ondelete='CASCADE'
+    )
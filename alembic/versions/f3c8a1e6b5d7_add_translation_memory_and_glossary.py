@@ -0,0 +1,54 @@
+"""Add translation_memory and glossary_terms tables
+
+Revision ID: f3c8a1e6b5d7
+Revises: e19b7c5d20f4
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3c8a1e6b5d7'
+down_revision: Union[str, Sequence[str], None] = 'e19b7c5d20f4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('translation_memory',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('source_language', sa.String(length=10), nullable=False),
+    sa.Column('target_language', sa.String(length=10), nullable=False),
+    sa.Column('source_hash', sa.String(length=64), nullable=False),
+    sa.Column('source_text', sa.Text(), nullable=False),
+    sa.Column('target_text', sa.Text(), nullable=False),
+    sa.Column('hits', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('last_used_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_translation_memory_lookup', 'translation_memory', ['source_language', 'target_language', 'source_hash'], unique=True)
+    op.create_table('glossary_terms',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('source_language', sa.String(length=10), nullable=False),
+    sa.Column('target_language', sa.String(length=10), nullable=False),
+    sa.Column('term', sa.String(length=255), nullable=False),
+    sa.Column('translation', sa.String(length=255), nullable=False),
+    sa.Column('learned', sa.Boolean(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_glossary_terms_term', 'glossary_terms', ['source_language', 'target_language', 'term'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_glossary_terms_term', table_name='glossary_terms')
+    op.drop_table('glossary_terms')
+    op.drop_index('ix_translation_memory_lookup', table_name='translation_memory')
+    op.drop_table('translation_memory')
@@ -0,0 +1,288 @@
+# benchmarks/fakes.py
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# جایگزین‌های محلی برای سرویس‌های بیرونی pipeline: سایت خبری (RSS و HTML مقاله)، Bot API تلگرام و Vertex AI.
+# هر کدام تاخیر و نرخ خطای قابل تنظیم دارند و تعداد فراخوانی‌ها را برای گزارش نگه می‌دارند.
+
+
+@dataclass
+class Latency:
+    """تاخیر تصادفی: mean ثانیه با پراکندگی یکنواخت ±jitter (نسبی)."""
+    mean: float = 0.0
+    jitter: float = 0.5
+
+    def sample(self) -> float:
+        if self.mean <= 0:
+            return 0.0
+        return max(0.0, self.mean * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+
+@dataclass
+class CallStats:
+    calls: dict = field(default_factory=dict)
+    errors: dict = field(default_factory=dict)
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record(self, name: str, failed: bool = False):
+        with self.lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+            if failed:
+                self.errors[name] = self.errors.get(name, 0) + 1
+
+    def as_dict(self) -> dict:
+        with self.lock:
+            return {"calls": dict(self.calls), "errors": dict(self.errors)}
+
+
+class _Server:
+    """پایه مشترک: یک ThreadingHTTPServer روی پورت آزاد در یک thread پس‌زمینه."""
+
+    def __init__(self):
+        self.stats = CallStats()
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _handler_class(self):
+        server = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                server.handle(self, "GET", b"")
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                server.handle(self, "POST", self.rfile.read(length))
+
+            def log_message(self, format, *args):
+                pass
+
+        return _Handler
+
+    @staticmethod
+    def respond(request, status: int, content_type: str, body: bytes):
+        request.send_response(status)
+        request.send_header("Content-Type", content_type)
+        request.send_header("Content-Length", str(len(body)))
+        request.end_headers()
+        request.wfile.write(body)
+
+    def handle(self, request, method: str, body: bytes):
+        raise NotImplementedError
+
+
+class FakeNewsSite(_Server):
+    """
+    فیدهای RSS و صفحات HTML مقالات را از حافظه سرو می‌کند.
+    feeds و pages نگاشت مسیر به محتوا هستند. slow_prefixes (پیشوند مسیر به ثانیه) تاخیر اضافه
+    برای بخشی از سایت تعریف می‌کند تا میزبان‌های کند شبیه‌سازی شوند.
+    """
+
+    def __init__(self, latency: Latency = None, error_rate: float = 0.0):
+        super().__init__()
+        self.feeds = {}
+        self.pages = {}
+        self.latency = latency or Latency()
+        self.error_rate = error_rate
+        self.slow_prefixes = {}
+
+    def latency_for(self, path: str) -> float:
+        extra = sum(delay for prefix, delay in self.slow_prefixes.items() if path.startswith(prefix))
+        return self.latency.sample() + extra
+
+    def add_feed(self, name: str, entries: list) -> str:
+        """entries لیست (title, link) یا (title, link, description) است؛ آدرس فید را برمی‌گرداند."""
+        items = "".join(
+            f"<item><title>{_xml_escape(entry[0])}</title><link>{_xml_escape(entry[1])}</link>"
+            f"<guid>{_xml_escape(entry[1])}</guid>"
+            + (f"<description>{_xml_escape(entry[2])}</description>" if len(entry) > 2 else "")
+            + "</item>"
+            for entry in entries
+        )
+        self.feeds[f"/feeds/{name}.xml"] = (
+            '<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel>'
+            f"<title>{_xml_escape(name)}</title><link>{self.base_url}</link><description>bench</description>"
+            f"{items}</channel></rss>"
+        ).encode("utf-8")
+        return f"{self.base_url}/feeds/{name}.xml"
+
+    def add_article(self, path: str, title: str, paragraphs: list, image: bool = True) -> str:
+        image_meta = f'<meta property="og:image" content="{self.base_url}/images{path}.jpg">' if image else ""
+        body = "".join(f"<p>{_xml_escape(p)}</p>" for p in paragraphs)
+        self.pages[path] = (
+            f"<html><head><title>{_xml_escape(title)}</title>{image_meta}</head>"
+            f"<body><article><h1>{_xml_escape(title)}</h1>{body}</article></body></html>"
+        ).encode("utf-8")
+        return f"{self.base_url}{path}"
+
+    def handle(self, request, method, body):
+        path = urlparse(request.path).path
+        delay = self.latency_for(path)
+        if delay:
+            time.sleep(delay)
+        kind = "feed" if path.startswith("/feeds/") else "article"
+        if self.error_rate and random.random() < self.error_rate:
+            self.stats.record(kind, failed=True)
+            self.respond(request, 503, "text/plain", b"unavailable")
+            return
+        content = self.feeds.get(path) if kind == "feed" else self.pages.get(path)
+        self.stats.record(kind, failed=content is None)
+        if content is None:
+            self.respond(request, 404, "text/plain", b"not found")
+        elif kind == "feed":
+            self.respond(request, 200, "application/rss+xml", content)
+        else:
+            self.respond(request, 200, "text/html; charset=utf-8", content)
+
+
+class FakeTelegram(_Server):
+    """
+    زیرمجموعه‌ای از Bot API که tasks.py استفاده می‌کند. آدرس TELEGRAM_API_BASE_URL باید
+    برابر base_url + "/bot" باشد. با احتمال rate_limit_rate پاسخ 429 (RetryAfter) برمی‌گردد.
+    """
+
+    METHODS = ("sendMessage", "sendPhoto", "editMessageText", "editMessageCaption")
+
+    def __init__(self, latency: Latency = None, rate_limit_rate: float = 0.0, error_rate: float = 0.0):
+        super().__init__()
+        self.latency = latency or Latency()
+        self.rate_limit_rate = rate_limit_rate
+        self.error_rate = error_rate
+        self._message_ids = iter(range(1, 10 ** 9))
+        self._id_lock = threading.Lock()
+
+    @property
+    def api_base_url(self) -> str:
+        return f"{self.base_url}/bot"
+
+    def _reply(self, request, status: int, payload: dict):
+        self.respond(request, status, "application/json", json.dumps(payload).encode())
+
+    def handle(self, request, method, body):
+        api_method = urlparse(request.path).path.rsplit("/", 1)[-1]
+        if api_method == "getMe":
+            self._reply(request, 200, {"ok": True, "result": {
+                "id": 1, "is_bot": True, "first_name": "bench", "username": "bench_bot",
+            }})
+            return
+        delay = self.latency.sample()
+        if delay:
+            time.sleep(delay)
+        if api_method in self.METHODS and self.rate_limit_rate and random.random() < self.rate_limit_rate:
+            self.stats.record(api_method, failed=True)
+            self._reply(request, 429, {
+                "ok": False, "error_code": 429, "description": "Too Many Requests: retry after 1",
+                "parameters": {"retry_after": 1},
+            })
+            return
+        if api_method in self.METHODS and self.error_rate and random.random() < self.error_rate:
+            self.stats.record(api_method, failed=True)
+            self._reply(request, 400, {"ok": False, "error_code": 400, "description": "Bad Request: injected"})
+            return
+        self.stats.record(api_method)
+        params = {k: v[0] for k, v in parse_qs(body.decode("utf-8", "ignore")).items()}
+        chat_id = params.get("chat_id", "0")
+        with self._id_lock:
+            message_id = int(params.get("message_id") or next(self._message_ids))
+        self._reply(request, 200, {"ok": True, "result": {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": int(chat_id) if chat_id.lstrip("-").isdigit() else -1, "type": "private"},
+            "text": params.get("text") or params.get("caption") or "",
+        }})
+
+
+class _FakeUsage:
+    def __init__(self, prompt_token_count: int, candidates_token_count: int):
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+
+
+class _FakeResponse:
+    def __init__(self, text: str, usage: _FakeUsage):
+        self.text = text
+        self.usage_metadata = usage
+
+
+class FakeLLM:
+    """
+    جایگزین GenerativeModel در tasks._llm_models. پرامپت امتیازدهی (score_prefix) یک عدد و
+    بقیه پرامپت‌ها متنی هم‌اندازه ورودی برمی‌گردانند. تاخیر متناسب با طول خروجی قابل تنظیم است.
+    """
+
+    def __init__(self, latency: Latency = None, per_1k_chars: float = 0.0, error_rate: float = 0.0, score_prefix: str = ""):
+        self.latency = latency or Latency()
+        self.per_1k_chars = per_1k_chars
+        self.error_rate = error_rate
+        self.score_prefix = score_prefix
+        self.stats = CallStats()
+
+    def generate_content(self, prompt: str, stream: bool = False):
+        is_score = bool(self.score_prefix) and prompt.startswith(self.score_prefix)
+        kind = "score" if is_score else "text"
+        tail = prompt.rsplit("\n", 1)[-1] if is_score else prompt[-4000:]
+        output = str(random.randint(1, 10)) if is_score else f"[fa] {tail}"
+        if stream:
+            return self._stream(prompt, output, kind)
+        time.sleep(self.latency.sample() + self.per_1k_chars * len(output) / 1000)
+        if self.error_rate and random.random() < self.error_rate:
+            self.stats.record(kind, failed=True)
+            raise RuntimeError("Injected LLM failure")
+        self.stats.record(kind)
+        return _FakeResponse(output, _FakeUsage(len(prompt) // 4, len(output) // 4))
+
+    def _stream(self, prompt: str, output: str, kind: str, chunks: int = 8):
+        """اولین بخش پس از تاخیر پایه (time-to-first-token) و بقیه با تاخیر متناسب با طول خروجی."""
+        time.sleep(self.latency.sample())
+        if self.error_rate and random.random() < self.error_rate:
+            self.stats.record(kind, failed=True)
+            raise RuntimeError("Injected LLM failure")
+        self.stats.record(kind)
+        size = max(1, -(-len(output) // chunks))
+        pieces = [output[i:i + size] for i in range(0, len(output), size)] or [""]
+        for i, piece in enumerate(pieces):
+            if i:
+                time.sleep(self.per_1k_chars * len(piece) / 1000)
+            usage = _FakeUsage(len(prompt) // 4, len(output) // 4) if i == len(pieces) - 1 else None
+            yield _FakeResponse(piece, usage)
+
+
+SYLLABLES = "ka lo mi ren tu sa vor el din pa qui ro zet am bel nu"
+
+
+def headline(rng: random.Random, words: int = 8) -> str:
+    """
+    عنوان مصنوعی از کلمات ساختگی (حدود 4000 کلمه ممکن)؛ عناوین مستقل با واژگان کوچک به هم شبیه می‌شوند
+    و تشخیص خبر تکراری (core.dedup) آن‌ها را یکی می‌داند.
+    """
+    syllables = SYLLABLES.split()
+    return " ".join(
+        "".join(rng.choice(syllables) for _ in range(rng.randint(2, 3))) for _ in range(words)
+    ).capitalize()
+
+
+def _xml_escape(value: str) -> str:
+    return (
+        str(value).replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;").replace('"', "&quot;")
+    )
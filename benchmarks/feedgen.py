@@ -0,0 +1,184 @@
+# benchmarks/feedgen.py
+"""
+تولید کننده فیدهای RSS مصنوعی برای تست مقیاس: N منبع که هر کدام به طور میانگین M مطلب در ساعت
+منتشر می‌کنند، با توزیع قابل تنظیم برای مطالب تکراری بین فیدها، مقالات طولانی، مقالات بدون تصویر
+و میزبان‌های کند. فیدها و صفحات مقالات با FakeNewsSite به صورت محلی سرو می‌شوند.
+
+    python -m benchmarks.feedgen --sources 50 --entries-per-hour 12 --serve
+"""
+import argparse
+import math
+import random
+import time
+from dataclasses import dataclass
+
+from benchmarks.fakes import FakeNewsSite, Latency, headline
+
+FEED_WINDOW = 30  # مانند اکثر فیدهای واقعی، فقط آخرین مطالب در فید می‌مانند (fetch_source_task هم ۳۰ تا می‌خواند)
+
+WORDS = (
+    "government market election officials report economy energy talks climate court security health "
+    "technology minister budget inflation agreement investigation company protest region summit trade"
+).split()
+
+
+@dataclass
+class FeedProfile:
+    sources: int = 10
+    entries_per_hour: float = 12.0
+    duplicate_rate: float = 0.1       # سهم مطالبی که همان لینک مطلب یک فید دیگر را منتشر می‌کنند
+    near_duplicate_rate: float = 0.0  # سهم مطالبی که همان خبر فید دیگر را با لینک و عنوان کمی متفاوت منتشر می‌کنند
+    long_article_rate: float = 0.1    # سهم مقالات بسیار طولانی
+    missing_image_rate: float = 0.2   # سهم مقالات بدون og:image
+    slow_host_rate: float = 0.05      # سهم منابعی که میزبان کند دارند
+    slow_host_latency: float = 2.0    # تاخیر اضافه هر درخواست به میزبان کند (ثانیه)
+    paragraphs: int = 8               # میانه تعداد پاراگراف مقالات معمولی
+    long_paragraphs: int = 120
+
+
+def _sentence(rng: random.Random, words: int = 14) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def _poisson(rng: random.Random, mean: float) -> int:
+    # الگوریتم Knuth؛ برای میانگین‌های کوچک هر دوره کافی است
+    if mean <= 0:
+        return 0
+    limit, k, p = math.exp(-mean), 0, 1.0
+    while True:
+        p *= rng.random()
+        if p <= limit:
+            return k
+        k += 1
+
+
+class FeedGenerator:
+    """
+    وضعیت فیدها را نگه می‌دارد و با advance(minutes) زمان را جلو می‌برد تا مطالب جدید منتشر شوند.
+    آمار تولید (تکراری‌ها، مقالات طولانی، بدون تصویر) برای مقایسه با رفتار pipeline ثبت می‌شود.
+    """
+
+    def __init__(self, site: FakeNewsSite, profile: FeedProfile, seed: int = None):
+        self.site = site
+        self.profile = profile
+        self.rng = random.Random(seed)
+        self.entries = {s: [] for s in range(profile.sources)}
+        self.feed_urls = {}
+        self.counters = {"entries": 0, "duplicates": 0, "near_duplicates": 0, "long": 0, "no_image": 0}
+        self._next_id = 0
+        self.slow_sources = set()
+        for s in range(profile.sources):
+            if self.rng.random() < profile.slow_host_rate:
+                self.slow_sources.add(s)
+                self.site.slow_prefixes[f"/feeds/source-{s}.xml"] = profile.slow_host_latency
+                self.site.slow_prefixes[f"/articles/{s}/"] = profile.slow_host_latency
+            self._publish_feed(s)
+
+    @property
+    def feeds(self) -> list:
+        """لیست (نام منبع، آدرس فید) برای ثبت در جدول sources."""
+        return [(f"load-source-{s}", self.feed_urls[s]) for s in range(self.profile.sources)]
+
+    def _new_article(self, source: int):
+        p = self.profile
+        self._next_id += 1
+        title = f"{headline(self.rng)} #{self._next_id}"
+        long = self.rng.random() < p.long_article_rate
+        paragraphs = p.long_paragraphs if long else max(1, int(self.rng.lognormvariate(math.log(p.paragraphs), 0.5)))
+        image = self.rng.random() >= p.missing_image_rate
+        self.counters["long"] += long
+        self.counters["no_image"] += not image
+        link = self.site.add_article(
+            f"/articles/{source}/{self._next_id}", title,
+            [" ".join(_sentence(self.rng) for _ in range(4)) for _ in range(paragraphs)], image=image,
+        )
+        # خلاصه فید از همان واژگان ساختگی عنوان ساخته می‌شود تا خلاصه‌های مستقل شبیه هم نباشند
+        return title, link, headline(self.rng, 30)
+
+    def _rewrite(self, source: int, entry):
+        """همان خبر با آدرس جدید، یک کلمه حذف شده و نام ناشر در انتهای عنوان (مانند بازنشر خبرگزاری‌ها)."""
+        title, link, description = entry
+        words = title.split()
+        del words[self.rng.randrange(len(words) - 1)]
+        self._next_id += 1
+        page = self.site.pages[link[len(self.site.base_url):]].decode("utf-8")
+        path = f"/articles/{source}/{self._next_id}"
+        self.site.pages[path] = page.encode("utf-8")
+        return f"{' '.join(words)} - Source {source}", f"{self.site.base_url}{path}", description
+
+    def _publish_feed(self, source: int):
+        self.feed_urls[source] = self.site.add_feed(f"source-{source}", list(reversed(self.entries[source])))
+
+    def advance(self, minutes: float) -> int:
+        """مطالب منتشر شده در minutes دقیقه را به فیدها اضافه می‌کند؛ تعداد مطالب جدید را برمی‌گرداند."""
+        p = self.profile
+        mean = p.entries_per_hour * minutes / 60.0
+        published = 0
+        for s in range(p.sources):
+            for _ in range(_poisson(self.rng, mean)):
+                others = [o for o in self.entries if o != s and self.entries[o]]
+                roll = self.rng.random()
+                if others and roll < p.duplicate_rate:
+                    # بازنشر یک مطلب از فید دیگر با همان لینک (سندیکا)
+                    entry = self.rng.choice(self.entries[self.rng.choice(others)][-FEED_WINDOW:])
+                    self.counters["duplicates"] += 1
+                elif others and roll < p.duplicate_rate + p.near_duplicate_rate:
+                    entry = self._rewrite(s, self.rng.choice(self.entries[self.rng.choice(others)][-FEED_WINDOW:]))
+                    self.counters["near_duplicates"] += 1
+                else:
+                    entry = self._new_article(s)
+                self.entries[s].append(entry)
+                self.entries[s] = self.entries[s][-FEED_WINDOW:]
+                published += 1
+            self._publish_feed(s)
+        self.counters["entries"] += published
+        return published
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve synthetic RSS feeds locally")
+    parser.add_argument("--sources", type=int, default=10)
+    parser.add_argument("--entries-per-hour", type=float, default=12.0)
+    parser.add_argument("--duplicate-rate", type=float, default=0.1)
+    parser.add_argument("--near-duplicate-rate", type=float, default=0.0)
+    parser.add_argument("--long-article-rate", type=float, default=0.1)
+    parser.add_argument("--missing-image-rate", type=float, default=0.2)
+    parser.add_argument("--slow-host-rate", type=float, default=0.05)
+    parser.add_argument("--slow-host-latency", type=float, default=2.0)
+    parser.add_argument("--http-latency", type=float, default=0.05)
+    parser.add_argument("--minutes", type=float, default=60.0, help="simulated time published before serving")
+    parser.add_argument("--tick", type=float, default=0.0, help="with --serve, advance this many minutes every minute")
+    parser.add_argument("--serve", action="store_true", help="keep serving until interrupted")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    profile = FeedProfile(
+        sources=args.sources,
+        entries_per_hour=args.entries_per_hour,
+        duplicate_rate=args.duplicate_rate,
+        near_duplicate_rate=args.near_duplicate_rate,
+        long_article_rate=args.long_article_rate,
+        missing_image_rate=args.missing_image_rate,
+        slow_host_rate=args.slow_host_rate,
+        slow_host_latency=args.slow_host_latency,
+    )
+    site = FakeNewsSite(Latency(args.http_latency)).start()
+    generator = FeedGenerator(site, profile, args.seed)
+    generator.advance(args.minutes)
+    for name, url in generator.feeds:
+        print(f"{name}\t{url}")
+    print(f"# {generator.counters}, slow sources: {sorted(generator.slow_sources)}")
+    if not args.serve:
+        site.stop()
+        return generator
+    try:
+        while True:
+            time.sleep(60)
+            if args.tick:
+                generator.advance(args.tick)
+    except KeyboardInterrupt:
+        site.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+# benchmarks/pipeline.py
+"""
+benchmark سرتاسری pipeline: وظایف واقعی Celery روی SQLite/MySQL و Redis اجرا می‌شوند
+و RSS، تلگرام و LLM با جایگزین‌های محلی (benchmarks/fakes.py) شبیه‌سازی می‌شوند.
+یک مدیر شبیه‌سازی شده مقالات را تایید و منتشر می‌کند و در پایان توان عملیاتی و
+صدک‌های تاخیر هر مرحله (از لاگ article_transitions) گزارش می‌شود.
+
+    python -m benchmarks.pipeline --sources 5 --entries 10 --llm-latency 0.5
+    python -m benchmarks.pipeline --eager --sources 2 --entries 5 --json result.json
+
+بدون --eager وظایف در یک worker درون‌پردازه‌ای (pool از نوع threads) از طریق broker واقعی
+(REDIS_URL) اجرا می‌شوند و rate_limit وظایف هم اعمال می‌شود. در هر دو حالت یک Redis در دسترس لازم است.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.fakes import FakeLLM, FakeNewsSite, FakeTelegram, Latency, headline
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TERMINAL_STATUSES = ('published', 'rejected', 'failed', 'discarded', 'archived_unlinked', 'duplicate', 'archived_prefilter')
+BENCH_ADMIN_ID = 1001
+BENCH_CHANNEL = "@robopost_bench"
+
+LOREM = (
+    "Officials said the measure would take effect next month after a review of the budget. "
+    "Analysts expect the decision to influence markets across the region in the coming weeks. "
+    "The announcement followed several days of talks between the parties involved."
+)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="End-to-end RoboPost pipeline benchmark")
+    parser.add_argument("--sources", type=int, default=3)
+    parser.add_argument("--entries", type=int, default=5, help="entries per feed (fetch_source_task reads at most 30)")
+    parser.add_argument("--paragraphs", type=int, default=8, help="paragraphs per article page")
+    parser.add_argument("--eager", action="store_true", help="run tasks inline instead of an in-process worker")
+    parser.add_argument("--concurrency", type=int, default=8, help="worker threads (non-eager mode)")
+    parser.add_argument("--database-url", default=None, help="default: a fresh SQLite file in a temp dir")
+    parser.add_argument("--redis-url", default=None, help="default: $REDIS_URL or redis://localhost:6379/15")
+    parser.add_argument("--http-latency", type=float, default=0.05, help="mean RSS/article response time (s)")
+    parser.add_argument("--http-error-rate", type=float, default=0.0)
+    parser.add_argument("--telegram-latency", type=float, default=0.05)
+    parser.add_argument("--telegram-429-rate", type=float, default=0.0)
+    parser.add_argument("--telegram-error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="mean LLM call latency (s)")
+    parser.add_argument("--llm-per-1k-chars", type=float, default=0.0, help="extra LLM latency per 1000 output chars")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--approve-rate", type=float, default=1.0, help="share of articles the simulated admin approves")
+    parser.add_argument("--admin-delay", type=float, default=0.0, help="seconds the simulated admin waits before acting")
+    parser.add_argument("--timeout", type=float, default=600.0)
+    parser.add_argument("--trace", default=None, help="write spans (core.tracing) to this JSONL file")
+    parser.add_argument("--json", dest="json_path", default=None, help="also write the report as JSON")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--languages", default="fa", help="comma separated target languages, one channel each")
+    parser.add_argument("--stream", action="store_true", help="stream the summary into the admin message (LLM_STREAMING_ENABLED)")
+    return parser
+
+
+def build_site(site: FakeNewsSite, sources: int, entries: int, paragraphs: int) -> list:
+    """برای هر منبع یک فید با entries مقاله می‌سازد؛ لیست (نام منبع، آدرس فید) را برمی‌گرداند."""
+    feeds = []
+    for s in range(sources):
+        items = []
+        for e in range(entries):
+            title = f"{headline(random.Random(f'{s}-{e}'))} #{s}-{e}"
+            link = site.add_article(f"/articles/{s}/{e}", title, [LOREM] * paragraphs)
+            items.append((title, link))
+        feeds.append((f"bench-source-{s}", site.add_feed(f"source-{s}", items)))
+    return feeds
+
+
+def configure_environment(args, telegram: FakeTelegram, workdir: str):
+    """تنظیمات باید پیش از import شدن core.config مقداردهی شوند؛ هیچ سرویس واقعی (جز Redis) استفاده نمی‌شود."""
+    os.environ.update({
+        "TELEGRAM_BOT_TOKEN": "123456:bench",
+        "TELEGRAM_API_BASE_URL": telegram.api_base_url,
+        "ADMIN_USER_IDS": str(BENCH_ADMIN_ID),
+        "GOOGLE_PROJECT_ID": "bench",
+        "GOOGLE_LOCATION": "bench",
+        "GOOGLE_APPLICATION_CREDENTIALS": os.devnull,
+        "DATABASE_URL": args.database_url or f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        "REDIS_URL": args.redis_url or os.environ.get("REDIS_URL", "redis://localhost:6379/15"),
+    })
+    if args.trace:
+        os.environ["TRACE_EXPORT_PATH"] = os.path.abspath(args.trace)
+    if getattr(args, "stream", False):
+        os.environ["LLM_STREAMING_ENABLED"] = "true"
+
+
+def seed_database(feeds: list, languages: tuple = ("fa",)) -> list:
+    """
+    جداول را ساخته، منابع و برای هر زبان مقصد یک کانال مرتبط با همه آن‌ها را ثبت می‌کند؛
+    id کانال‌ها (مدیر شبیه‌سازی شده هر مقاله را در همه آن‌ها منتشر می‌کند) را برمی‌گرداند.
+    """
+    from core.database import Base, SessionLocal, engine
+    from core.db_models import Channel, Source
+
+    Base.metadata.create_all(engine)
+    db = SessionLocal()
+    try:
+        channels = [
+            Channel(
+                name=f"bench-{language}", telegram_channel_id=f"{BENCH_CHANNEL}_{language}",
+                target_language_code=language, admin_group_id=BENCH_ADMIN_ID,
+            )
+            for language in languages
+        ]
+        db.add_all(channels)
+        for name, rss_url in feeds:
+            source = Source(name=name, rss_url=rss_url, is_active=True)
+            source.channels.extend(channels)
+            db.add(source)
+        db.commit()
+        return [channel.id for channel in channels]
+    finally:
+        db.close()
+
+
+class AdminSimulator(threading.Thread):
+    """
+    نقش مدیر را بازی می‌کند: همان کارهای handlers/callback_handlers.py را (تغییر وضعیت اتمیک و
+    ارسال وظیفه بعدی) برای مقالات در انتظار تایید اولیه و انتشار انجام می‌دهد.
+    """
+
+    def __init__(self, channel_ids: list, approve_rate: float, delay: float, poll_interval: float = 0.2):
+        super().__init__(name="admin-simulator", daemon=True)
+        self.channel_ids = channel_ids
+        self.approve_rate = approve_rate
+        self.delay = delay
+        self.poll_interval = poll_interval
+        self.stopping = threading.Event()
+        self.first_seen = {}
+        self.dispatched = set()
+        self.errors = 0
+
+    def _ready(self, key) -> bool:
+        seen = self.first_seen.setdefault(key, time.monotonic())
+        return key not in self.dispatched and time.monotonic() - seen >= self.delay
+
+    def step(self):
+        from core.database import SessionLocal
+        from core.db_models import Article
+        from core.state_machine import transition
+        from tasks import process_article_task, publish_article_task
+
+        db = SessionLocal()
+        try:
+            rows = (
+                db.query(Article.id, Article.status)
+                .filter(Article.status.in_(['pending_initial_approval', 'sent_for_publication']))
+                .all()
+            )
+            for article_id, status in rows:
+                key = (article_id, status)
+                if not self._ready(key):
+                    continue
+                self.dispatched.add(key)
+                if status == 'pending_initial_approval':
+                    if random.random() < self.approve_rate:
+                        if transition(db, article_id, 'pending_initial_approval', 'approved'):
+                            process_article_task.delay(article_id)
+                    else:
+                        transition(db, article_id, 'pending_initial_approval', 'rejected')
+                else:
+                    for channel_id in self.channel_ids:
+                        publish_article_task.delay(article_id, channel_id)
+        finally:
+            db.close()
+
+    def run(self):
+        while not self.stopping.is_set():
+            try:
+                self.step()
+            except Exception:
+                self.errors += 1
+            self.stopping.wait(self.poll_interval)
+
+
+def wait_for_completion(expected: int, timeout: float, on_poll=None) -> bool:
+    """منتظر می‌ماند تا تمام مقالات به وضعیت پایانی برسند؛ on_poll در هر دور فراخوانی می‌شود."""
+    from core.database import SessionLocal
+    from core.db_models import Article
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if on_poll is not None:
+            on_poll()
+        db = SessionLocal()
+        try:
+            total = db.query(Article).count()
+            done = db.query(Article).filter(Article.status.in_(TERMINAL_STATUSES)).count()
+        finally:
+            db.close()
+        if total >= expected and done >= total:
+            return True
+        time.sleep(0.2)
+    return False
+
+
+def collect_report(wall_seconds: float, completed: bool, fakes: dict) -> dict:
+    from sqlalchemy import func
+    from core.database import SessionLocal
+    from core.db_models import Article
+    from core.pipeline_stats import collect_pipeline_stats
+
+    db = SessionLocal()
+    try:
+        statuses = dict(db.query(Article.status, func.count(Article.id)).group_by(Article.status).all())
+        stages = collect_pipeline_stats(db, hours=24)["stages"]
+    finally:
+        db.close()
+    for stats in stages.values():
+        stats["throughput_per_s"] = round(stats["count"] / wall_seconds, 3) if wall_seconds else 0.0
+    published = statuses.get('published', 0)
+    return {
+        "completed": completed,
+        "wall_seconds": round(wall_seconds, 3),
+        "articles": sum(statuses.values()),
+        "statuses": statuses,
+        "published_per_s": round(published / wall_seconds, 3) if wall_seconds else 0.0,
+        "stages": stages,
+        "fakes": fakes,
+    }
+
+
+def print_report(report: dict):
+    print(f"\nCompleted: {report['completed']}  wall: {report['wall_seconds']}s  articles: {report['articles']}")
+    print("Statuses: " + ", ".join(f"{k}={v}" for k, v in sorted(report["statuses"].items())))
+    print(f"Published throughput: {report['published_per_s']} articles/s\n")
+    print(f"{'stage':<16}{'count':>7}{'per_s':>9}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for stage, s in report["stages"].items():
+        print(f"{stage:<16}{s['count']:>7}{s['throughput_per_s']:>9}{s['p50']:>10}{s['p95']:>10}{s['p99']:>10}")
+    print()
+    for name, stats in report["fakes"].items():
+        print(f"{name}: calls={stats['calls']} errors={stats['errors']}")
+
+
+def main(argv=None) -> dict:
+    args = build_parser().parse_args(argv)
+    if args.seed is not None:
+        random.seed(args.seed)
+    os.chdir(ROOT)  # پرامپت‌ها با مسیر نسبی خوانده می‌شوند
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+
+    site = FakeNewsSite(Latency(args.http_latency), args.http_error_rate).start()
+    telegram = FakeTelegram(Latency(args.telegram_latency), args.telegram_429_rate, args.telegram_error_rate).start()
+    workdir = tempfile.mkdtemp(prefix="robopost-bench-")
+    configure_environment(args, telegram, workdir)
+    feeds = build_site(site, args.sources, min(args.entries, 30), args.paragraphs)
+
+    import tasks
+    from celery_app import celery_app
+    from core import llm_usage, tracing
+
+    with open(os.path.join(ROOT, "score_prompt.txt"), encoding="utf-8") as f:
+        score_prefix = f.read().strip()
+    llm = FakeLLM(Latency(args.llm_latency), args.llm_per_1k_chars, args.llm_error_rate, score_prefix)
+    from core import llm_router
+    for model_name in llm_router.configured_models():
+        tasks._llm_models[model_name] = llm
+    channel_ids = seed_database(feeds, tuple(args.languages.split(",")))
+    expected = args.sources * min(args.entries, 30)
+
+    admin = AdminSimulator(channel_ids, args.approve_rate, args.admin_delay)
+    worker = None
+    if args.eager:
+        celery_app.conf.update(task_always_eager=True, task_eager_propagates=False)
+    else:
+        from celery.contrib.testing.worker import start_worker
+        from core.extraction import EXTRACTION_QUEUE
+        worker = start_worker(
+            celery_app, pool="threads", concurrency=args.concurrency, perform_ping_check=False, loglevel="WARNING",
+            queues=["celery", EXTRACTION_QUEUE],
+        )
+        worker.__enter__()
+
+    start = time.monotonic()
+    try:
+        if args.eager:
+            # در حالت eager وظایف در همان thread اجرا می‌شوند؛ پرچم join در Celery سراسری است و
+            # اجرای همزمان وظایف eager از thread دیگر chord ها را می‌شکند، پس مدیر در همین thread کار می‌کند
+            tasks.run_all_fetchers_task.delay()
+            completed = wait_for_completion(expected, args.timeout, on_poll=admin.step)
+        else:
+            admin.start()
+            tasks.run_all_fetchers_task.delay()
+            completed = wait_for_completion(expected, args.timeout)
+        wall = time.monotonic() - start
+    finally:
+        admin.stopping.set()
+        if admin.is_alive():
+            admin.join(timeout=5)
+        if worker is not None:
+            worker.__exit__(None, None, None)
+        tracing.flush()
+        llm_usage.flush()
+
+    report = collect_report(wall, completed, {
+        "news_site": site.stats.as_dict(),
+        "telegram": telegram.stats.as_dict(),
+        "llm": llm.stats.as_dict(),
+    })
+    report["config"] = vars(args)
+    site.stop()
+    telegram.stop()
+    print_report(report)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, default=str)
+    return report
+
+
+if __name__ == "__main__":
+    main()
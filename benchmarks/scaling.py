@@ -0,0 +1,238 @@
+# benchmarks/scaling.py
+"""
+منحنی مقیاس مرحله fetch: برای هر تعداد منبع (مثلا 10، 100، 1000) فیدهای مصنوعی benchmarks/feedgen.py
+ساخته می‌شوند و چند چرخه run_all_fetchers_task اجرا می‌شود. چرخه اول کل تاریخچه فیدها را می‌خواند و
+چرخه‌های بعدی وضعیت پایدار (فقط مطالب جدید هر cycle-minutes دقیقه) را اندازه می‌گیرند.
+
+    python -m benchmarks.scaling --sources 10,100,1000 --entries-per-hour 12 --concurrency 16 --csv curve.csv
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.fakes import FakeLLM, FakeNewsSite, FakeTelegram, Latency
+from benchmarks.feedgen import FeedGenerator, FeedProfile
+from benchmarks.pipeline import ROOT, configure_environment, seed_database
+
+COLUMNS = (
+    "sources", "cycle", "feed_entries", "new_articles", "duplicates", "fetch_phase_s", "cycle_s", "sources_per_s",
+    "fetch_task_p50_s", "fetch_task_p95_s", "fetch_task_max_s", "db_queries", "queries_per_source",
+)
+
+
+class TaskTimer:
+    """مدت اجرای وظایف Celery این پردازه را با سیگنال‌های task_prerun/task_postrun ثبت می‌کند."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = {}
+        self.durations = {}
+
+    def connect(self):
+        from celery.signals import task_postrun, task_prerun
+        task_prerun.connect(self._on_prerun, weak=False)
+        task_postrun.connect(self._on_postrun, weak=False)
+
+    def reset(self):
+        with self.lock:
+            self.started.clear()
+            self.durations.clear()
+
+    def _on_prerun(self, task_id=None, **kwargs):
+        with self.lock:
+            self.started[task_id] = time.perf_counter()
+
+    def _on_postrun(self, task_id=None, task=None, **kwargs):
+        with self.lock:
+            start = self.started.pop(task_id, None)
+            if start is not None:
+                name = task.name.rsplit(".", 1)[-1]
+                self.durations.setdefault(name, []).append(time.perf_counter() - start)
+
+    def count(self, name: str) -> int:
+        with self.lock:
+            return len(self.durations.get(name, []))
+
+    def values(self, name: str) -> list:
+        with self.lock:
+            return sorted(self.durations.get(name, []))
+
+
+class QueryCounter:
+    def __init__(self, engine):
+        from sqlalchemy import event
+        self.count = 0
+        self.lock = threading.Lock()
+        event.listen(engine, "after_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args, **kwargs):
+        with self.lock:
+            self.count += 1
+
+
+def _wait(predicate, timeout: float) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def _article_counts(session_factory, article_model) -> tuple:
+    """(مقالات وارد شده به pipeline، خبرهای تکراری ادغام شده)"""
+    db = session_factory()
+    try:
+        duplicates = db.query(article_model).filter(article_model.status == 'duplicate').count()
+        return db.query(article_model).count() - duplicates, duplicates
+    finally:
+        db.close()
+
+
+def run_scale_point(n: int, args, timer: TaskTimer, queries: QueryCounter) -> list:
+    import tasks
+    from core.config_cache import invalidate
+    from core.database import Base, SessionLocal, engine
+    from core.db_models import Article
+    from core.pipeline_stats import percentile
+
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    site = FakeNewsSite(Latency(args.http_latency)).start()
+    profile = FeedProfile(
+        sources=n,
+        entries_per_hour=args.entries_per_hour,
+        duplicate_rate=args.duplicate_rate,
+        near_duplicate_rate=args.near_duplicate_rate,
+        long_article_rate=args.long_article_rate,
+        missing_image_rate=args.missing_image_rate,
+        slow_host_rate=args.slow_host_rate,
+        slow_host_latency=args.slow_host_latency,
+    )
+    generator = FeedGenerator(site, profile, args.seed)
+    seed_database(generator.feeds)
+    invalidate()
+
+    rows = []
+    try:
+        for cycle in range(1, args.cycles + 1):
+            published = generator.advance(args.history_minutes if cycle == 1 else args.cycle_minutes)
+            before = _article_counts(SessionLocal, Article)
+            timer.reset()
+            queries_before = queries.count
+            start = time.monotonic()
+            tasks.run_all_fetchers_task.delay()
+            fetched = _wait(lambda: timer.count("fetch_source_task") >= n, args.timeout)
+            fetch_phase = time.monotonic() - start
+            # قفل چرخه fetch در callback آزاد می‌شود؛ چرخه بعدی باید منتظر آن بماند
+            _wait(lambda: timer.count("wait_for_processing_and_notify_task") >= 1, args.timeout)
+            cycle_seconds = time.monotonic() - start
+            after = _article_counts(SessionLocal, Article)
+            durations = timer.values("fetch_source_task")
+            db_queries = queries.count - queries_before
+            rows.append({
+                "sources": n,
+                "cycle": cycle,
+                "feed_entries": published,
+                "new_articles": after[0] - before[0],
+                "duplicates": after[1] - before[1],
+                "fetch_phase_s": round(fetch_phase, 3) if fetched else None,
+                "cycle_s": round(cycle_seconds, 3),
+                "sources_per_s": round(n / fetch_phase, 2) if fetched and fetch_phase else None,
+                "fetch_task_p50_s": round(percentile(durations, 50), 3),
+                "fetch_task_p95_s": round(percentile(durations, 95), 3),
+                "fetch_task_max_s": round(durations[-1], 3) if durations else 0.0,
+                "db_queries": db_queries,
+                "queries_per_source": round(db_queries / n, 1),
+            })
+            print("  ".join(f"{col}={rows[-1][col]}" for col in COLUMNS), flush=True)
+    finally:
+        site.stop()
+    rows[-1]["generator"] = dict(generator.counters, slow_sources=len(generator.slow_sources))
+    return rows
+
+
+def main(argv=None) -> list:
+    parser = argparse.ArgumentParser(description="Fetch-stage scaling curve over synthetic feeds")
+    parser.add_argument("--sources", default="10,50,100,500", help="comma separated source counts")
+    parser.add_argument("--entries-per-hour", type=float, default=12.0)
+    parser.add_argument("--history-minutes", type=float, default=60.0, help="feed history before the first cycle")
+    parser.add_argument("--cycle-minutes", type=float, default=15.0, help="simulated time between fetch cycles")
+    parser.add_argument("--cycles", type=int, default=2)
+    parser.add_argument("--duplicate-rate", type=float, default=0.1)
+    parser.add_argument("--near-duplicate-rate", type=float, default=0.0)
+    parser.add_argument("--long-article-rate", type=float, default=0.1)
+    parser.add_argument("--missing-image-rate", type=float, default=0.2)
+    parser.add_argument("--slow-host-rate", type=float, default=0.05)
+    parser.add_argument("--slow-host-latency", type=float, default=2.0)
+    parser.add_argument("--http-latency", type=float, default=0.05)
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="latency of the title/score LLM calls")
+    parser.add_argument("--eager", action="store_true", help="run tasks inline (sequential baseline)")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--redis-url", default=None)
+    parser.add_argument("--trace", default=None)
+    parser.add_argument("--timeout", type=float, default=1800.0)
+    parser.add_argument("--csv", dest="csv_path", default=None)
+    parser.add_argument("--json", dest="json_path", default=None)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    os.chdir(ROOT)
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    telegram = FakeTelegram().start()
+    configure_environment(args, telegram, tempfile.mkdtemp(prefix="robopost-scaling-"))
+
+    import tasks
+    from celery_app import celery_app
+    from core.database import engine
+
+    from core import llm_router
+    with open(os.path.join(ROOT, "score_prompt.txt"), encoding="utf-8") as f:
+        llm = FakeLLM(Latency(args.llm_latency), score_prefix=f.read().strip())
+    for model_name in llm_router.configured_models():
+        tasks._llm_models[model_name] = llm
+    timer = TaskTimer()
+    timer.connect()
+    queries = QueryCounter(engine)
+
+    worker = None
+    if args.eager:
+        celery_app.conf.update(task_always_eager=True, task_eager_propagates=False)
+    else:
+        from celery.contrib.testing.worker import start_worker
+        from core.extraction import EXTRACTION_QUEUE
+        worker = start_worker(
+            celery_app, pool="threads", concurrency=args.concurrency, perform_ping_check=False, loglevel="WARNING",
+            queues=["celery", EXTRACTION_QUEUE],
+        )
+        worker.__enter__()
+
+    results = []
+    try:
+        for n in [int(x) for x in args.sources.split(",") if x.strip()]:
+            results.extend(run_scale_point(n, args, timer, queries))
+    finally:
+        if worker is not None:
+            worker.__exit__(None, None, None)
+        telegram.stop()
+
+    if args.csv_path:
+        with open(args.csv_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=COLUMNS, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(results)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "curve": results}, f, indent=2, default=str)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,9 @@ from telegram.constants import ParseMode
 from core.config import settings
 from utils import logger
 from handlers import admin_commands, callback_handlers, jobs
+from core.http_server import start_http_server
+from core.pipeline_stats import stats_http_route
+from core.metrics import metrics_http_route
 
 def main():
     """راه‌اندازی و اجرای ربات تلگرام."""
@@ -17,6 +20,7 @@ def main():
     application = (
         Application.builder()
         .token(settings.TELEGRAM_BOT_TOKEN)
+        .base_url(settings.TELEGRAM_API_BASE_URL)
         .defaults(defaults)
         .build()
     )
@@ -28,7 +32,9 @@ def main():
         "add_source": admin_commands.add_source, "remove_source": admin_commands.remove_source, "list_sources": admin_commands.list_sources,
         "add_channel": admin_commands.add_channel, "remove_channel": admin_commands.remove_channel, "list_channels": admin_commands.list_channels,
         "link": admin_commands.link_source_to_channel, "unlink": admin_commands.unlink_source_from_channel,
-        "status": admin_commands.status, "force_fetch": admin_commands.force_fetch
+        "status": admin_commands.status, "stats": admin_commands.stats, "force_fetch": admin_commands.force_fetch,
+        "profile": admin_commands.profile, "profile_report": admin_commands.profile_report,
+        "glossary": admin_commands.glossary, "prompts": admin_commands.prompts_command, "usage": admin_commands.usage
     }
     for command, handler_func in command_handlers.items():
         application.add_handler(CommandHandler(command, handler_func, filters=admin_filter))
@@ -39,10 +45,14 @@ def main():
     # ثبت کارهای زمان‌بندی شده
     job_queue = application.job_queue
     job_queue.run_repeating(jobs.cleanup_db_job, interval=3600, first=300)
+    job_queue.run_repeating(jobs.rollup_llm_usage_job, interval=3600, first=600)
     
     # ثبت error handler عمومی
     application.add_error_handler(jobs.error_handler)
     
+    # endpoint ماشین‌خوان آمار مراحل pipeline و سنجه‌های Prometheus
+    start_http_server(settings.BOT_HTTP_PORT, {"/stats": stats_http_route, "/metrics": metrics_http_route})
+
     logger.info(f"Bot service running for admins: {settings.admin_ids_list}")
     application.run_polling()
 
@@ -1,5 +1,13 @@
 # celery_app.py
 from celery import Celery
+from celery.signals import (
+    before_task_publish,
+    task_postrun,
+    task_prerun,
+    worker_init,
+    worker_process_init,
+    worker_process_shutdown,
+)
 from core.config import settings
 
 celery_app = Celery(
@@ -11,5 +19,91 @@ celery_app = Celery(
 
 celery_app.conf.update(
     task_track_started=True,
-    broker_connection_retry_on_startup=True
+    broker_connection_retry_on_startup=True,
+    # تجزیه HTML (CPU-bound) در worker جداگانه با یک پردازه به ازای هر هسته اجرا می‌شود
+    task_routes={"tasks.extract_article_task": {"queue": "extraction"}},
 )
+
+
+def task_signature(name: str, *args, **kwargs):
+    """
+    امضای یک وظیفه از روی نام آن. bot و listener فقط وظیفه ارسال می‌کنند و با این تابع
+    بدون import کردن tasks (و feedparser/newspaper/requests) پیام را در صف قرار می‌دهند.
+    """
+    return celery_app.signature(f"tasks.{name}", args=args, kwargs=kwargs)
+
+
+@worker_process_init.connect
+def _reset_db_pool(**kwargs):
+    """
+    اتصال‌های دیتابیس به ارث رسیده از پردازه والد را در هر فرزند prefork رها می‌کند
+    و ردیابی و پروفایل‌گیری همین پردازه را راه‌اندازی می‌کند.
+    """
+    from core.database import dispose_engine_after_fork
+    from core.profiling import install as install_profiling
+    from core.tracing import set_service_name
+    dispose_engine_after_fork()
+    set_service_name("worker")
+    install_profiling()
+
+
+@worker_init.connect
+def _start_metrics_server(**kwargs):
+    """سرور /metrics را در پردازه اصلی worker اجرا می‌کند؛ سنجه‌های فرزندان از PROMETHEUS_MULTIPROC_DIR خوانده می‌شوند."""
+    import glob
+    import os
+    multiproc_dir = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if multiproc_dir:
+        os.makedirs(multiproc_dir, exist_ok=True)
+        for path in glob.glob(os.path.join(multiproc_dir, "*.db")):
+            os.remove(path)
+    from core.http_server import start_http_server
+    from core.metrics import metrics_http_route
+    start_http_server(settings.WORKER_METRICS_PORT, {"/metrics": metrics_http_route})
+
+
+@worker_process_shutdown.connect
+def _mark_metrics_process_dead(pid=None, **kwargs):
+    import os
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(pid or os.getpid())
+
+
+@worker_process_shutdown.connect
+def _flush_llm_usage(**kwargs):
+    """ردیف‌های مصرف LLM که هنوز در صف این پردازه هستند پیش از خروج نوشته می‌شوند."""
+    from core.llm_usage import flush
+    flush()
+
+
+# span های فعال وظایف در این پردازه، بر اساس task_id
+_task_spans = {}
+
+
+@before_task_publish.connect
+def _inject_trace_context(headers=None, **kwargs):
+    """زمینه ردیابی فعلی را در هدر پیام Celery قرار می‌دهد تا وظیفه بعدی زیر همان trace اجرا شود."""
+    from core.tracing import TRACE_HEADER, inject_context
+    context = inject_context()
+    if context and headers is not None:
+        headers[TRACE_HEADER] = context
+
+
+@task_prerun.connect
+def _start_task_span(task_id=None, task=None, **kwargs):
+    import os
+    from core.tracing import TRACE_HEADER, current_context, extract_context, start_span
+    value = getattr(task.request, TRACE_HEADER, None) or (task.request.headers or {}).get(TRACE_HEADER)
+    # وظیفه‌ای که زمینه‌ای همراه ندارد (مثلا run_all_fetchers_task) ریشه یک trace جدید است
+    parent = extract_context(value) or current_context() or (os.urandom(16).hex(), None)
+    _task_spans[task_id] = start_span(
+        f"task.{task.name.rsplit('.', 1)[-1]}", parent=parent,
+        task_id=task_id, retries=task.request.retries or 0,
+    )
+
+
+@task_postrun.connect
+def _finish_task_span(task_id=None, state=None, **kwargs):
+    from core.tracing import finish_span
+    finish_span(_task_spans.pop(task_id, None), error=None if state in (None, "SUCCESS") else state)
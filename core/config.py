@@ -3,13 +3,79 @@ from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     TELEGRAM_BOT_TOKEN: str
+    TELEGRAM_API_BASE_URL: str = "https://api.telegram.org/bot"
     ADMIN_USER_IDS: str
     GOOGLE_PROJECT_ID: str
     GOOGLE_LOCATION: str
     GOOGLE_APPLICATION_CREDENTIALS: str
     GEMINI_MODEL_NAME: str = "gemini-1.5-flash-latest"
+    # مدل هر نوع پرامپت و circuit breaker تاخیر/خطا (core/llm_router.py)
+    LLM_MODELS: str = ""
+    LLM_FALLBACK_MODEL: str = ""
+    LLM_BREAKER_WINDOW: int = 20
+    LLM_BREAKER_MIN_CALLS: int = 5
+    LLM_BREAKER_ERROR_RATE: float = 0.5
+    LLM_BREAKER_P95_SECONDS: str = "title=10,score=10,title_full=15,content=90,summary=60"
+    LLM_BREAKER_COOLDOWN: int = 120
+    # ثبت مصرف هر فراخوانی LLM (core/llm_usage.py)؛ قیمت هر مدل به دلار برای یک میلیون token ورودی/خروجی
+    LLM_USAGE_ENABLED: bool = True
+    LLM_USAGE_RAW_DAYS: int = 7
+    LLM_PRICES: str = "gemini-1.5-flash-latest=0.075/0.30"
     DATABASE_URL: str
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 5
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_TIMEOUT: int = 30
     REDIS_URL: str
+    CONFIG_CACHE_TTL: int = 300
+    FETCH_CYCLE_LOCK_TTL: int = 900
+    STREAM_BATCH_SIZE: int = 50
+    STREAM_COALESCE_WINDOW_MS: int = 30000
+    STREAM_MAXLEN: int = 1000
+    STREAM_PENDING_IDLE_MS: int = 60000
+    STREAM_MAX_DELIVERIES: int = 5
+    STREAM_MAINTENANCE_INTERVAL: int = 30
+    LISTENER_HEALTH_PORT: int = 8081
+    LISTENER_SHUTDOWN_TIMEOUT: int = 30
+    DISPATCH_DEDUP_TTL: int = 600
+    PREPROCESS_SCAN_BATCH: int = 500
+    # تشخیص خبرهای تقریبا تکراری بین منابع (SimHash)؛ فاصله همینگ مجاز و پنجره زمانی جستجو
+    DEDUP_ENABLED: bool = True
+    DEDUP_MAX_DISTANCE: int = 8
+    DEDUP_WINDOW_HOURS: int = 48
+    DEDUP_LEAD_WORDS: int = 40
+    # پیش‌فیلتر محلی عناوین (core/prefilter.py)؛ فقط ناحیه نامطمئن بین دو آستانه به LLM می‌رود
+    PREFILTER_ENABLED: bool = True
+    PREFILTER_RULES_PATH: str = "prefilter_rules.json"
+    PREFILTER_MIN_SAMPLES: int = 300
+    PREFILTER_ARCHIVE_BELOW: float = 0.05
+    PREFILTER_ACCEPT_ABOVE: float = 0.97
+    PREFILTER_LEARNING_RATE: float = 0.1
+    PREFILTER_FEATURE_BITS: int = 18
+    # حداکثر زبان‌های مقصدی که ترجمه آن‌ها برای یک مقاله همزمان انجام می‌شود
+    TRANSLATION_PARALLELISM: int = 4
+    # حافظه ترجمه عناوین منتشر شده و واژه‌نامه (core/translation_memory.py)
+    TRANSLATION_MEMORY_ENABLED: bool = True
+    GLOSSARY_MIN_OCCURRENCES: int = 3
+    # پوشه فایل‌های پرامپت و فاصله بررسی تغییر آن‌ها (core/prompts.py)
+    PROMPTS_DIR: str = "."
+    PROMPT_RELOAD_INTERVAL: int = 10
+    # نمایش تدریجی خلاصه در پیام مدیر هنگام تولید (streaming) و حداقل فاصله بین دو ویرایش آن پیام
+    LLM_STREAMING_ENABLED: bool = False
+    LLM_STREAM_EDIT_INTERVAL: float = 3.0
+    # سیاست retry وظایف (core/retry.py): پایه و سقف backoff نمایی با jitter به ثانیه
+    RETRY_BASE_SECONDS: float = 30.0
+    RETRY_MAX_SECONDS: float = 600.0
+    BOT_HTTP_PORT: int = 8082
+    WORKER_METRICS_PORT: int = 9100
+    # خروجی ردیابی: فایل JSONL و/یا آدرس collector سازگار با Zipkin v2 (خالی = غیرفعال)
+    TRACE_EXPORT_PATH: str = ""
+    TRACE_COLLECTOR_URL: str = ""
+    # پروفایل‌گیری وظایف: سهم اجراهایی که با cProfile اجرا می‌شوند (0 = غیرفعال)
+    PROFILING_SAMPLE_RATE: float = 0.0
+    PROFILING_DIR: str = "profiles"
+    PROFILING_TASKS: str = ""
     
     @property
     def admin_ids_list(self) -> list[int]:
@@ -0,0 +1,118 @@
+# core/config_cache.py
+import threading
+import time
+from dataclasses import dataclass
+from .config import settings
+from .database import SessionLocal
+from .db_models import Source, Channel, source_channel_map
+from .redis_client import on_event, publish_event, ensure_event_listener
+
+# کش درون‌پردازه‌ای منابع، کانال‌ها و گراف source_channel_map.
+# این داده‌ها فقط با دستورات ادمین تغییر می‌کنند؛ پس از هر تغییر یک رویداد "config"
+# منتشر می‌شود تا کش تمام worker ها باطل شود. TTL فقط یک تور ایمنی برای پیام‌های از دست رفته است.
+CONFIG_EVENT = "config"
+
+
+@dataclass(frozen=True)
+class CachedSource:
+    id: int
+    name: str
+    rss_url: str
+    is_active: bool
+    channel_ids: tuple
+
+
+@dataclass(frozen=True)
+class CachedChannel:
+    id: int
+    name: str
+    telegram_channel_id: str
+    target_language_code: str
+    admin_group_id: int
+    is_active: bool
+
+
+class ConfigSnapshot:
+    """یک تصویر فقط‌خواندنی از پیکربندی منابع و کانال‌ها."""
+
+    def __init__(self, sources, channels):
+        self.sources_by_id = {s.id: s for s in sources}
+        self.sources_by_name = {s.name: s for s in sources}
+        self.channels_by_id = {c.id: c for c in channels}
+        self.loaded_at = time.monotonic()
+
+    def active_sources(self) -> list:
+        return [s for s in self.sources_by_id.values() if s.is_active]
+
+    def get_source(self, source_id: int):
+        return self.sources_by_id.get(source_id)
+
+    def get_source_by_name(self, name: str):
+        return self.sources_by_name.get(name)
+
+    def get_channel(self, channel_id: int):
+        return self.channels_by_id.get(channel_id)
+
+    def channels_for_source(self, source) -> list:
+        if source is None:
+            return []
+        return [self.channels_by_id[cid] for cid in source.channel_ids if cid in self.channels_by_id]
+
+
+_lock = threading.Lock()
+_snapshot = None
+_generation = 0
+_subscribed = False
+
+
+def _load() -> ConfigSnapshot:
+    db = SessionLocal()
+    try:
+        links = {}
+        for source_id, channel_id in db.query(source_channel_map.c.source_id, source_channel_map.c.channel_id).all():
+            links.setdefault(source_id, []).append(channel_id)
+        sources = [
+            CachedSource(s.id, s.name, s.rss_url, bool(s.is_active), tuple(sorted(links.get(s.id, ()))))
+            for s in db.query(Source).order_by(Source.id).all()
+        ]
+        channels = [
+            CachedChannel(c.id, c.name, c.telegram_channel_id, c.target_language_code or 'fa', c.admin_group_id, bool(c.is_active))
+            for c in db.query(Channel).order_by(Channel.id).all()
+        ]
+        return ConfigSnapshot(sources, channels)
+    finally:
+        db.close()
+
+
+def invalidate(_payload: str = ""):
+    """کش پردازه جاری را باطل می‌کند."""
+    global _snapshot, _generation
+    _generation += 1
+    _snapshot = None
+
+
+def get_config() -> ConfigSnapshot:
+    """تصویر فعلی پیکربندی را برمی‌گرداند و در صورت نیاز آن را از دیتابیس بارگذاری می‌کند."""
+    global _snapshot, _subscribed
+    if not _subscribed:
+        on_event(CONFIG_EVENT, invalidate)
+        _subscribed = True
+    ensure_event_listener()
+    snapshot = _snapshot
+    if snapshot is not None and time.monotonic() - snapshot.loaded_at < settings.CONFIG_CACHE_TTL:
+        return snapshot
+    with _lock:
+        snapshot = _snapshot
+        if snapshot is not None and time.monotonic() - snapshot.loaded_at < settings.CONFIG_CACHE_TTL:
+            return snapshot
+        generation = _generation
+        snapshot = _load()
+        # اگر در حین بارگذاری باطل شده باشد، نتیجه فقط برای همین فراخوانی استفاده می‌شود
+        if generation == _generation:
+            _snapshot = snapshot
+        return snapshot
+
+
+def notify_config_changed():
+    """پس از هر تغییر در منابع، کانال‌ها یا اتصال‌ها فراخوانی می‌شود تا کش تمام پردازه‌ها باطل شود."""
+    publish_event(CONFIG_EVENT)
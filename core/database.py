@@ -1,17 +1,132 @@
 # core/database.py
-from sqlalchemy import create_engine
+import threading
+import time
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.pool import QueuePool
 from .config import settings
+from .metrics import DB_QUERY_SECONDS, DB_POOL_CHECKOUT_SECONDS
+from .tracing import current_context, record_span
 
-engine = create_engine(settings.DATABASE_URL)
+
+class PoolMetrics:
+    """شمارنده‌های ساده برای checkout و زمان انتظار در pool اتصال‌ها."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.checkout_wait_total = 0.0
+        self.checkout_wait_max = 0.0
+        self.connects = 0
+        self.invalidations = 0
+
+    def record_checkout(self, wait: float):
+        with self._lock:
+            self.checkouts += 1
+            self.checkout_wait_total += wait
+            if wait > self.checkout_wait_max:
+                self.checkout_wait_max = wait
+
+    def record_connect(self):
+        with self._lock:
+            self.connects += 1
+
+    def record_invalidation(self):
+        with self._lock:
+            self.invalidations += 1
+
+
+pool_metrics = PoolMetrics()
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool که زمان انتظار برای گرفتن اتصال را اندازه می‌گیرد."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            wait = time.perf_counter() - start
+            pool_metrics.record_checkout(wait)
+            DB_POOL_CHECKOUT_SECONDS.observe(wait)
+
+
+def _engine_kwargs(url: str) -> dict:
+    # SQLite (تست‌ها و benchmark) pool مخصوص خودش را دارد و این تنظیمات را نمی‌پذیرد
+    if url.startswith("sqlite"):
+        return {}
+    return {
+        "poolclass": TimedQueuePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+    }
+
+
+engine = create_engine(settings.DATABASE_URL, **_engine_kwargs(settings.DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+
+@event.listens_for(engine, "connect")
+def _on_connect(dbapi_connection, connection_record):
+    pool_metrics.record_connect()
+
+
+@event.listens_for(engine, "invalidate")
+def _on_invalidate(dbapi_connection, connection_record, exception):
+    pool_metrics.record_invalidation()
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info["query_start"] = time.perf_counter()
+    conn.info["query_wall_start"] = time.time()
+
+
+@event.listens_for(engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    DB_QUERY_SECONDS.observe(time.perf_counter() - conn.info["query_start"])
+    trace = current_context()
+    if trace:
+        record_span(
+            "db.query", trace[0], conn.info["query_wall_start"], time.time(),
+            parent_id=trace[1], statement=statement[:200],
+        )
+
+
+def dispose_engine_after_fork():
+    """
+    در پردازه فرزند Celery (worker_process_init) فراخوانی می‌شود.
+    اتصال‌های به ارث رسیده از پردازه والد بسته نمی‌شوند (close=False) تا سوکت‌های والد خراب نشوند؛
+    فقط رها شده و یک pool تازه برای این پردازه ساخته می‌شود.
+    """
+    engine.dispose(close=False)
+
+
+def pool_status() -> dict:
+    """وضعیت فعلی pool و شمارنده‌های checkout را برمی‌گرداند."""
+    pool = engine.pool
+    status = {
+        "checkouts": pool_metrics.checkouts,
+        "checkout_wait_total": pool_metrics.checkout_wait_total,
+        "checkout_wait_max": pool_metrics.checkout_wait_max,
+        "connects": pool_metrics.connects,
+        "invalidations": pool_metrics.invalidations,
+    }
+    if isinstance(pool, QueuePool):
+        status.update(size=pool.size(), checked_out=pool.checkedout(), overflow=pool.overflow())
+    return status
+
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
-        
\ No newline at end of file
+
@@ -1,11 +1,15 @@
 # core/db_models.py
-from sqlalchemy import (Column, Integer, String, Text, Boolean, DateTime,
+from sqlalchemy import (Column, Integer, String, Text, Boolean, DateTime, Date,
                         ForeignKey, Table, BigInteger, Index)
 from sqlalchemy.dialects.mysql import LONGTEXT
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
+from datetime import datetime
 from .database import Base
 
+# در MySQL متن‌های بلند LONGTEXT هستند؛ روی SQLite (تست‌ها و benchmark) همان Text
+LongText = Text().with_variant(LONGTEXT, 'mysql')
+
 # جدول واسط برای رابطه چندبه‌چند بین منابع و کانال‌ها
 source_channel_map = Table('source_channel_map', Base.metadata,
     Column('source_id', Integer, ForeignKey('sources.id', ondelete="CASCADE"), primary_key=True),
@@ -40,17 +44,133 @@ class Article(Base):
     source_name = Column(String(255), nullable=False)
     original_url = Column(String(2048), nullable=False)
     original_title = Column(Text, nullable=False)
-    original_content = Column(LONGTEXT, nullable=True)
+    original_content = Column(LongText, nullable=True)
+    # کد دوحرفی زبان خبر (core.language)
+    language = Column(String(10), nullable=True)
     image_url = Column(String(2048), nullable=True)
     status = Column(String(50), default='new', index=True)
     translated_title = Column(Text, nullable=True)
-    translated_content = Column(LONGTEXT, nullable=True)
+    translated_content = Column(LongText, nullable=True)
     summary = Column(Text, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     admin_chat_id = Column(BigInteger, nullable=True)
     admin_message_id = Column(Integer, nullable=True)
     news_value_score = Column(Integer, index=True, nullable=True, default=None)
+    # برای خبرهای تکراری (status='duplicate') شناسه مقاله اصلی همان خبر
+    canonical_article_id = Column(Integer, ForeignKey('articles.id', ondelete="SET NULL"), nullable=True, index=True)
+    # نسخه مجموعه پرامپت‌هایی که ترجمه و خلاصه مقاله با آن ساخته شده (core.prompts.version)
+    prompt_version = Column(String(16), nullable=True)
     __table_args__ = (
         Index('ix_articles_original_url', 'original_url', unique=True, mysql_length=255),
     )
-    
\ No newline at end of file
+    
+
+class ArticleTranslation(Base):
+    """عنوان، متن و خلاصه یک مقاله در یک زبان مقصد؛ یک ردیف برای هر (مقاله، زبان) صرف‌نظر از تعداد کانال‌ها."""
+    __tablename__ = 'article_translations'
+    id = Column(Integer, primary_key=True)
+    article_id = Column(Integer, ForeignKey('articles.id', ondelete="CASCADE"), nullable=False)
+    language = Column(String(10), nullable=False)
+    title = Column(Text, nullable=False)
+    content = Column(LongText, nullable=True)
+    summary = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    __table_args__ = (
+        Index('ix_article_translations_article_id_language', 'article_id', 'language', unique=True),
+    )
+
+
+class ArticlePublication(Base):
+    """انتشار یک مقاله در یک کانال؛ ردیف ادعای انتشار (publishing) است و پس از ارسال published می‌شود."""
+    __tablename__ = 'article_publications'
+    id = Column(Integer, primary_key=True)
+    article_id = Column(Integer, ForeignKey('articles.id', ondelete="CASCADE"), nullable=False)
+    channel_id = Column(Integer, ForeignKey('channels.id', ondelete="CASCADE"), nullable=False)
+    status = Column(String(20), nullable=False, default='publishing')
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    published_at = Column(DateTime, nullable=True)
+    __table_args__ = (
+        Index('ix_article_publications_article_id_channel_id', 'article_id', 'channel_id', unique=True),
+    )
+
+
+class TranslationMemory(Base):
+    """ترجمه‌های تایید شده (منتشر شده) عناوین؛ source_hash روی متن نرمال‌شده با اعداد جایگزین شده است."""
+    __tablename__ = 'translation_memory'
+    id = Column(Integer, primary_key=True)
+    source_language = Column(String(10), nullable=False)
+    target_language = Column(String(10), nullable=False)
+    source_hash = Column(String(64), nullable=False)
+    source_text = Column(Text, nullable=False)
+    target_text = Column(Text, nullable=False)
+    hits = Column(Integer, default=0, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    last_used_at = Column(DateTime, nullable=True)
+    __table_args__ = (
+        Index('ix_translation_memory_lookup', 'source_language', 'target_language', 'source_hash', unique=True),
+    )
+
+
+class GlossaryTerm(Base):
+    """ترجمه ثابت اسامی خاص و عبارات؛ learned=True یعنی از ترجمه‌های منتشر شده استخراج شده و مدیر آن را ثبت نکرده."""
+    __tablename__ = 'glossary_terms'
+    id = Column(Integer, primary_key=True)
+    source_language = Column(String(10), nullable=False)
+    target_language = Column(String(10), nullable=False)
+    term = Column(String(255), nullable=False)
+    translation = Column(String(255), nullable=False)
+    learned = Column(Boolean, default=False, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    __table_args__ = (
+        Index('ix_glossary_terms_term', 'source_language', 'target_language', 'term', unique=True),
+    )
+
+
+class LLMUsage(Base):
+    """یک ردیف برای هر فراخوانی LLM؛ ردیف‌های قدیمی‌تر از LLM_USAGE_RAW_DAYS در llm_usage_daily تجمیع می‌شوند."""
+    __tablename__ = 'llm_usage'
+    id = Column(Integer, primary_key=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    # بدون کلید خارجی تا پاک شدن مقالات قدیمی سابقه مصرف را حذف نکند
+    article_id = Column(Integer, nullable=True)
+    source_name = Column(String(255), nullable=True)
+    prompt_type = Column(String(20), nullable=False)
+    model = Column(String(100), nullable=False)
+    input_tokens = Column(Integer, default=0, nullable=False)
+    output_tokens = Column(Integer, default=0, nullable=False)
+    latency_ms = Column(Integer, default=0, nullable=False)
+    failed = Column(Boolean, default=False, nullable=False)
+
+
+class LLMUsageDaily(Base):
+    """جمع روزانه مصرف LLM به تفکیک منبع، نوع پرامپت و مدل (source_name خالی = بدون مقاله)."""
+    __tablename__ = 'llm_usage_daily'
+    id = Column(Integer, primary_key=True)
+    day = Column(Date, nullable=False)
+    source_name = Column(String(255), nullable=False, default='')
+    prompt_type = Column(String(20), nullable=False)
+    model = Column(String(100), nullable=False)
+    calls = Column(Integer, default=0, nullable=False)
+    failures = Column(Integer, default=0, nullable=False)
+    input_tokens = Column(BigInteger, default=0, nullable=False)
+    output_tokens = Column(BigInteger, default=0, nullable=False)
+    latency_ms = Column(BigInteger, default=0, nullable=False)
+    __table_args__ = (
+        Index('ix_llm_usage_daily_key', 'day', 'source_name', 'prompt_type', 'model', unique=True),
+    )
+
+
+class ArticleTransition(Base):
+    """
+    لاگ افزایشی تغییر وضعیت مقالات؛ منبع اندازه‌گیری تاخیر هر مرحله از pipeline.
+    با پاک شدن مقاله در cleanup_db_job لاگ آن باقی می‌ماند و فقط article_id آن NULL می‌شود.
+    """
+    __tablename__ = 'article_transitions'
+    id = Column(Integer, primary_key=True)
+    article_id = Column(Integer, ForeignKey('articles.id', ondelete="SET NULL"), nullable=True)
+    from_status = Column(String(50), nullable=True)
+    to_status = Column(String(50), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    __table_args__ = (
+        Index('ix_article_transitions_article_id_created_at', 'article_id', 'created_at'),
+    )
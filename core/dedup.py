@@ -0,0 +1,140 @@
+# core/dedup.py
+import re
+import time
+import hashlib
+import logging
+from html import unescape
+from .config import settings
+from .redis_client import get_redis
+
+logger = logging.getLogger("NewsBot")
+
+# تشخیص خبرهای تقریبا تکراری بین منابع: SimHash 64 بیتی روی عنوان و ابتدای متن نرمال‌شده.
+# اثرانگشت به (DEDUP_MAX_DISTANCE + 1) باند تقسیم و هر باند در Redis ایندکس می‌شود (LSH)؛ دو خبر
+# با فاصله همینگ حداکثر DEDUP_MAX_DISTANCE دست کم در یک باند یکسان‌اند، پس فقط همان کاندیداها
+# مقایسه می‌شوند. فقط مقالات اصلی (canonical) ایندکس می‌شوند.
+FINGERPRINT_BITS = 64
+INDEX_PREFIX = "dedup:lsh"
+# اثرانگشت هر مقاله ایندکس شده تا بتوان هنگام پاک شدن مقاله آن را از باندها حذف کرد
+ARTICLE_PREFIX = "dedup:article"
+
+STOPWORDS = frozenset(
+    "a an the and or but of to in on at for from by with as is are was were be been it its this that "
+    "these those has have had will would says said after over into than about".split()
+)
+_TAG_RE = re.compile(r"<[^>]+>")
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+# پسوند نام ناشر در عنوان فیدهای تجمیعی، مثل «... - Reuters» یا «... | BBC News»
+_PUBLISHER_SUFFIX_RE = re.compile(r"\s+[-–—|]\s+[^-–—|]{1,40}$")
+TITLE_WEIGHT = 2
+
+
+def _tokens(text: str) -> list:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in STOPWORDS and len(t) > 1]
+
+
+def _hash64(feature: str) -> int:
+    return int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def simhash(title: str, lead: str = "") -> int:
+    """
+    SimHash کلمات عنوان (بدون نام ناشر) و DEDUP_LEAD_WORDS کلمه اول متن (بدون تگ HTML).
+    کلمات عنوان وزن بیشتری دارند؛ از جفت‌کلمه‌ها استفاده نمی‌شود چون بازنویسی جمله‌ها در متن‌های
+    کوتاه فاصله را بیش از حد بالا می‌برد.
+    """
+    title_tokens = _tokens(_PUBLISHER_SUFFIX_RE.sub("", title or ""))
+    lead_tokens = _tokens(_TAG_RE.sub(" ", unescape(lead or "")))[:settings.DEDUP_LEAD_WORDS]
+    if not title_tokens and not lead_tokens:
+        return 0
+    weights = [0] * FINGERPRINT_BITS
+    for tokens, weight in ((title_tokens, TITLE_WEIGHT), (lead_tokens, 1)):
+        for token in tokens:
+            h = _hash64(token)
+            for bit in range(FINGERPRINT_BITS):
+                weights[bit] += weight if (h >> bit) & 1 else -weight
+    fingerprint = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def bands(fingerprint: int) -> list:
+    count = settings.DEDUP_MAX_DISTANCE + 1
+    width = FINGERPRINT_BITS // count
+    mask = (1 << width) - 1
+    return [(fingerprint >> (i * width)) & mask for i in range(count)]
+
+
+def _band_keys(fingerprint: int) -> list:
+    return [f"{INDEX_PREFIX}:{i}:{value:x}" for i, value in enumerate(bands(fingerprint))]
+
+
+def find_canonical(fingerprint: int):
+    """
+    نزدیک‌ترین مقاله اصلی در پنجره DEDUP_WINDOW_HOURS را برمی‌گرداند: (article_id, distance) یا None.
+    خطای Redis باعث توقف دریافت خبر نمی‌شود؛ در این صورت خبر تکراری فرض نمی‌شود.
+    """
+    if not fingerprint:
+        return None
+    min_score = time.time() - settings.DEDUP_WINDOW_HOURS * 3600
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for key in _band_keys(fingerprint):
+            pipe.zrangebyscore(key, min_score, "+inf")
+        results = pipe.execute()
+    except Exception as e:
+        logger.warning(f"Near-duplicate lookup failed: {e}")
+        return None
+    best = None
+    for members in results:
+        for member in members:
+            article_id, candidate = member.decode().split(":")
+            distance = hamming(fingerprint, int(candidate, 16))
+            if distance <= settings.DEDUP_MAX_DISTANCE and (best is None or distance < best[1]):
+                best = (int(article_id), distance)
+    return best
+
+
+def index_article(article_id: int, fingerprint: int):
+    """یک مقاله اصلی را در باندهای LSH ثبت و ورودی‌های خارج از پنجره را حذف می‌کند."""
+    if not fingerprint:
+        return
+    now = time.time()
+    window = settings.DEDUP_WINDOW_HOURS * 3600
+    member = f"{article_id}:{fingerprint:016x}"
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for key in _band_keys(fingerprint):
+            pipe.zadd(key, {member: now})
+            pipe.zremrangebyscore(key, "-inf", now - window)
+            pipe.expire(key, window)
+        pipe.set(f"{ARTICLE_PREFIX}:{article_id}", f"{fingerprint:016x}", ex=window)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Could not index article {article_id} for near-duplicate detection: {e}")
+
+
+def forget(article_ids: list):
+    """مقالات پاک شده را از ایندکس خارج می‌کند تا خبرهای بعدی به مقاله‌ای که وجود ندارد متصل نشوند."""
+    if not article_ids:
+        return
+    keys = [f"{ARTICLE_PREFIX}:{article_id}" for article_id in article_ids]
+    try:
+        r = get_redis()
+        pipe = r.pipeline(transaction=False)
+        for article_id, value in zip(article_ids, r.mget(keys)):
+            if value is None:
+                continue
+            fingerprint = int(value, 16)
+            for key in _band_keys(fingerprint):
+                pipe.zrem(key, f"{article_id}:{fingerprint:016x}")
+        pipe.delete(*keys)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Could not remove {len(article_ids)} article(s) from the near-duplicate index: {e}")
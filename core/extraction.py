@@ -0,0 +1,36 @@
+# core/extraction.py
+# استخراج متن، عنوان و تصویر از HTML خام. این کار CPU-bound است (ساخت DOM با lxml) و فقط در
+# worker صف extraction اجرا می‌شود؛ worker های I/O فقط HTML را دانلود کرده و به این صف می‌فرستند.
+from .language import DEFAULT_LANGUAGE
+
+EXTRACTION_QUEUE = "extraction"
+
+_configs = {}
+
+
+def _newspaper_config(language: str):
+    """یک Config برای هر زبان (stopword های newspaper به زبان وابسته‌اند)."""
+    config = _configs.get(language)
+    if config is None:
+        from newspaper import Config
+        from newspaper.utils import get_available_languages
+        config = Config()
+        # دانلود تصاویر برای انتخاب بزرگ‌ترین تصویر، I/O را وارد مرحله CPU-bound می‌کند؛ تصویر از متا تگ‌ها خوانده می‌شود
+        config.fetch_images = False
+        config.memoize_articles = False
+        config.set_language(language if language in get_available_languages() else DEFAULT_LANGUAGE)
+        config = _configs[language] = config
+    return config
+
+
+def extract_article(html: str, url: str, language: str = None) -> dict:
+    """HTML یک مقاله را تجزیه کرده و {'title', 'text', 'image'} برمی‌گرداند."""
+    from newspaper import Article as NewspaperArticle
+    article = NewspaperArticle(url, config=_newspaper_config(language or DEFAULT_LANGUAGE))
+    article.download(input_html=html)
+    article.parse()
+    return {
+        "title": article.title or None,
+        "text": article.text or None,
+        "image": article.top_image or None,
+    }
@@ -0,0 +1,44 @@
+# core/http_server.py
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import logging
+
+logger = logging.getLogger("NewsBot")
+
+
+def start_http_server(port: int, routes: dict) -> ThreadingHTTPServer:
+    """
+    یک سرور HTTP سبک در یک thread پس‌زمینه اجرا می‌کند.
+    routes نگاشت مسیر به تابعی است که query (dict) را گرفته و (status, content_type, body) برمی‌گرداند.
+    """
+
+    class _Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            route = routes.get(url.path)
+            if route is None:
+                self.send_error(404)
+                return
+            try:
+                status, content_type, body = route(parse_qs(url.query))
+            except Exception as e:
+                logger.error(f"HTTP route {url.path} failed: {e}", exc_info=True)
+                self.send_error(500)
+                return
+            if isinstance(body, str):
+                body = body.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("0.0.0.0", port), _Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name=f"http-{port}", daemon=True).start()
+    logger.info(f"HTTP endpoint listening on :{port} ({', '.join(routes)})")
+    return server
@@ -0,0 +1,101 @@
+# core/language.py
+import re
+from collections import Counter
+
+# تشخیص سریع و محلی زبان عنوان/خلاصه خبر (بدون مدل و شبکه):
+# ابتدا خط نوشتاری غالب شمرده می‌شود؛ برای خط عربی حروف مخصوص فارسی، و برای خط لاتین
+# کلمات پرتکرار هر زبان تعیین‌کننده‌اند. اگر متن برای تصمیم کافی نباشد None برمی‌گردد تا
+# زبان منبع (تگ language فید یا اکثریت مطالب همان fetch) جایگزین شود.
+DEFAULT_LANGUAGE = "en"
+
+LANGUAGE_NAMES = {
+    "en": "English", "fa": "Persian", "ar": "Arabic", "fr": "French", "de": "German", "es": "Spanish",
+    "it": "Italian", "pt": "Portuguese", "nl": "Dutch", "tr": "Turkish", "id": "Indonesian", "ru": "Russian",
+    "uk": "Ukrainian", "el": "Greek", "he": "Hebrew", "hi": "Hindi", "zh": "Chinese", "ja": "Japanese",
+    "ko": "Korean",
+}
+
+_SCRIPTS = (
+    ("arabic", 0x0600, 0x06FF), ("arabic", 0xFB50, 0xFDFF), ("arabic", 0xFE70, 0xFEFF),
+    ("cyrillic", 0x0400, 0x04FF), ("greek", 0x0370, 0x03FF), ("hebrew", 0x0590, 0x05FF),
+    ("devanagari", 0x0900, 0x097F), ("hangul", 0xAC00, 0xD7AF), ("kana", 0x3040, 0x30FF),
+    ("han", 0x4E00, 0x9FFF),
+)
+_SCRIPT_LANGUAGE = {"greek": "el", "hebrew": "he", "devanagari": "hi", "hangul": "ko", "han": "zh"}
+
+_PERSIAN_CHARS = set("پچژگکی")
+_ARABIC_CHARS = set("يكةأإ")
+_UKRAINIAN_CHARS = set("іїєґ")
+
+_STOPWORDS = {
+    "en": "the of and to in is for on with that by from at as are was says after over new will has",
+    "fr": "le la les des de du et un une est pour dans sur au aux par qui que avec après",
+    "de": "der die das und ist nicht mit den dem ein eine zu für von auf im nach bei wird",
+    "es": "el la los las de del y en que por para con una un es se tras según más",
+    "it": "il lo la gli le di del della e che per con una un è nel alla dopo più",
+    "pt": "o a os as de do da e que em para com uma um é no na após mais",
+    "nl": "de het een en van in is op voor met dat niet zijn bij na door",
+    "tr": "ve bir bu için ile da de olarak gibi daha sonra çok ama kadar",
+    "id": "dan yang di ke dari untuk dengan ini itu pada dalam tidak akan oleh",
+}
+_STOPWORDS = {lang: set(words.split()) for lang, words in _STOPWORDS.items()}
+_WORD_RE = re.compile(r"[^\W\d_]+", re.UNICODE)
+_TAG_RE = re.compile(r"<[^>]+>")
+MIN_LETTERS = 12
+
+
+def _script(ch: str) -> str:
+    code = ord(ch)
+    for name, start, end in _SCRIPTS:
+        if start <= code <= end:
+            return name
+    return "latin" if ch.isalpha() and code < 0x0250 else None
+
+
+def detect_language(text: str):
+    """کد دوحرفی زبان متن یا None اگر متن کوتاه/مبهم باشد."""
+    text = _TAG_RE.sub(" ", text or "")
+    letters = [ch for ch in text if ch.isalpha()]
+    if len(letters) < MIN_LETTERS:
+        return None
+    scripts = Counter(s for s in map(_script, letters) if s)
+    if not scripts:
+        return None
+    script, _ = scripts.most_common(1)[0]
+    if script == "arabic":
+        persian = sum(ch in _PERSIAN_CHARS for ch in letters)
+        arabic = sum(ch in _ARABIC_CHARS for ch in letters)
+        return "fa" if persian >= arabic else "ar"
+    if script == "cyrillic":
+        return "uk" if any(ch in _UKRAINIAN_CHARS for ch in letters) else "ru"
+    if script in ("kana", "han"):
+        return "ja" if scripts.get("kana") else "zh"
+    if script != "latin":
+        return _SCRIPT_LANGUAGE[script]
+    words = [w.lower() for w in _WORD_RE.findall(text)]
+    hits = Counter({lang: sum(w in stop for w in words) for lang, stop in _STOPWORDS.items()})
+    (best, best_hits), (_, second_hits) = hits.most_common(2)
+    if best_hits < 2 or best_hits == second_hits:
+        return None
+    return best
+
+
+def normalize_code(code: str):
+    """'en-US' یا 'fa_IR' (تگ language فید) را به کد دوحرفی تبدیل می‌کند."""
+    if not code:
+        return None
+    code = re.split(r"[-_]", code.strip().lower())[0]
+    return code if len(code) == 2 and code.isalpha() else None
+
+
+def source_language(feed_language: str, detected: list):
+    """زبان منبع: تگ language فید، وگرنه زبان اکثریت مطالبی که با اطمینان تشخیص داده شده‌اند."""
+    code = normalize_code(feed_language)
+    if code:
+        return code
+    votes = Counter(lang for lang in detected if lang)
+    return votes.most_common(1)[0][0] if votes else DEFAULT_LANGUAGE
+
+
+def language_name(code: str) -> str:
+    return LANGUAGE_NAMES.get(code or DEFAULT_LANGUAGE, code or LANGUAGE_NAMES[DEFAULT_LANGUAGE])
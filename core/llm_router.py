@@ -0,0 +1,128 @@
+# core/llm_router.py
+import math
+import time
+import threading
+import logging
+from collections import deque
+from .config import settings
+
+logger = logging.getLogger("NewsBot")
+
+# انتخاب مدل LLM برای هر نوع پرامپت و circuit breaker روی تاخیر و خطای هر مدل:
+#  - LLM_MODELS مدل هر نوع پرامپت را تعیین می‌کند ("score=gemini-2.0-flash-lite,summary=gemini-1.5-pro")؛
+#    نوع‌های ذکر نشده از GEMINI_MODEL_NAME استفاده می‌کنند.
+#  - اگر در LLM_BREAKER_WINDOW فراخوانی اخیر یک مدل (برای همان نوع پرامپت) نرخ خطا یا p95 تاخیر از آستانه
+#    بگذرد، مدار باز می‌شود و تا LLM_BREAKER_COOLDOWN ثانیه آن نوع پرامپت به LLM_FALLBACK_MODEL می‌رود.
+#    پس از آن یک فراخوانی آزمایشی به مدل اصلی فرستاده می‌شود و در صورت موفقیت مدار بسته می‌شود.
+# وضعیت در هر پردازه نگه داشته می‌شود؛ هر worker بر اساس فراخوانی‌های خودش تصمیم می‌گیرد.
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+_lock = threading.Lock()
+_breakers = {}
+
+
+def _parse_map(value: str) -> dict:
+    """'a=x, b=y' -> {'a': 'x', 'b': 'y'}"""
+    result = {}
+    for item in (value or "").split(","):
+        key, sep, val = item.partition("=")
+        if sep and key.strip() and val.strip():
+            result[key.strip()] = val.strip()
+    return result
+
+
+def primary_model(prompt_type: str) -> str:
+    return _parse_map(settings.LLM_MODELS).get(prompt_type, settings.GEMINI_MODEL_NAME)
+
+
+def fallback_model(prompt_type: str):
+    """مدل جایگزین نوع پرامپت؛ None اگر با مدل اصلی یکی باشد."""
+    fallback = settings.LLM_FALLBACK_MODEL or settings.GEMINI_MODEL_NAME
+    return fallback if fallback != primary_model(prompt_type) else None
+
+
+def configured_models() -> set:
+    """نام تمام مدل‌هایی که ممکن است استفاده شوند."""
+    return {settings.GEMINI_MODEL_NAME, settings.LLM_FALLBACK_MODEL or settings.GEMINI_MODEL_NAME,
+            *_parse_map(settings.LLM_MODELS).values()}
+
+
+def p95_threshold(prompt_type: str) -> float:
+    """آستانه p95 تاخیر هر نوع پرامپت (LLM_BREAKER_P95_SECONDS به شکل 'content=90,score=10' یا یک عدد)."""
+    value = settings.LLM_BREAKER_P95_SECONDS
+    thresholds = _parse_map(value)
+    if not thresholds:
+        return float(value)
+    return float(thresholds.get(prompt_type, thresholds.get("*", math.inf)))
+
+
+def _breaker(model: str, prompt_type: str) -> dict:
+    key = (model, prompt_type)
+    state = _breakers.get(key)
+    if state is None:
+        state = _breakers[key] = {
+            "state": CLOSED, "calls": deque(maxlen=settings.LLM_BREAKER_WINDOW), "opened_at": 0.0, "probing": False,
+        }
+    return state
+
+
+def _p95(values: list) -> float:
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(0.95 * len(ordered)) - 1)]
+
+
+def choose(prompt_type: str) -> str:
+    """مدلی که این فراخوانی باید به آن برود."""
+    primary = primary_model(prompt_type)
+    fallback = fallback_model(prompt_type)
+    if fallback is None:
+        return primary
+    with _lock:
+        breaker = _breaker(primary, prompt_type)
+        if breaker["state"] == CLOSED:
+            return primary
+        if breaker["state"] == OPEN and time.monotonic() - breaker["opened_at"] >= settings.LLM_BREAKER_COOLDOWN:
+            breaker["state"] = HALF_OPEN
+            breaker["probing"] = False
+        # در حالت half-open فقط یک فراخوانی آزمایشی همزمان به مدل اصلی می‌رود
+        if breaker["state"] == HALF_OPEN and not breaker["probing"]:
+            breaker["probing"] = True
+            return primary
+    return fallback
+
+
+def record(model: str, prompt_type: str, seconds: float, failed: bool = False) -> str:
+    """نتیجه یک فراخوانی را ثبت کرده و وضعیت مدار مدل اصلی این نوع پرامپت را برمی‌گرداند."""
+    if model != primary_model(prompt_type) or fallback_model(prompt_type) is None:
+        return None
+    with _lock:
+        breaker = _breaker(model, prompt_type)
+        if breaker["state"] == HALF_OPEN and breaker["probing"]:
+            breaker["probing"] = False
+            slow = seconds >= p95_threshold(prompt_type)
+            if failed or slow:
+                breaker["state"], breaker["opened_at"] = OPEN, time.monotonic()
+            else:
+                breaker["state"] = CLOSED
+                breaker["calls"].clear()
+                logger.info(f"LLM circuit for {model}/{prompt_type} closed after a successful probe.")
+            return breaker["state"]
+        if breaker["state"] != CLOSED:
+            return breaker["state"]
+        calls = breaker["calls"]
+        calls.append((seconds, failed))
+        if len(calls) < settings.LLM_BREAKER_MIN_CALLS:
+            return CLOSED
+        error_rate = sum(f for _, f in calls) / len(calls)
+        latencies = [s for s, f in calls if not f]
+        p95 = _p95(latencies) if latencies else 0.0
+        if error_rate >= settings.LLM_BREAKER_ERROR_RATE or p95 >= p95_threshold(prompt_type):
+            breaker["state"], breaker["opened_at"] = OPEN, time.monotonic()
+            logger.warning(
+                f"LLM circuit for {model}/{prompt_type} opened (error rate {error_rate:.0%}, p95 {p95:.1f}s); "
+                f"using {fallback_model(prompt_type)} for {settings.LLM_BREAKER_COOLDOWN}s."
+            )
+        return breaker["state"]
+
@@ -0,0 +1,230 @@
+# core/llm_usage.py
+import os
+import time
+import queue
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime, date, timedelta
+from sqlalchemy import func, cast, Integer
+from sqlalchemy.orm import Session
+from .config import settings
+from .database import SessionLocal
+from .db_models import Article, ArticleTransition, LLMUsage, LLMUsageDaily
+
+logger = logging.getLogger("NewsBot")
+
+# حسابداری مصرف LLM: هر فراخوانی (token ورودی/خروجی، تاخیر، مدل) با مقاله و منبعی که وظیفه جاری روی
+# آن کار می‌کند ثبت می‌شود. انتساب با یک ContextVar منتقل می‌شود، پس thread هایی که با
+# contextvars.copy_context() اجرا می‌شوند (ترجمه موازی زبان‌ها) هم به همان مقاله نسبت داده می‌شوند.
+# ردیف‌ها مثل span های core/tracing.py در یک صف جمع و هر FLUSH_INTERVAL ثانیه (یا هر MAX_BATCH ردیف)
+# با یک INSERT دسته‌ای و یک commit نوشته می‌شوند، نه یک session و commit برای هر فراخوانی.
+# ردیف‌های خام قدیمی‌تر از LLM_USAGE_RAW_DAYS در llm_usage_daily تجمیع و حذف می‌شوند.
+GROUPINGS = ("source", "prompt_type", "model")
+FLUSH_INTERVAL = 1.0
+MAX_BATCH = 500
+
+_attribution = contextvars.ContextVar("llm_usage_attribution", default=(None, None))
+_queue = None
+_writer_pid = None
+_writer_lock = threading.Lock()
+
+
+@contextmanager
+def attribute(article_id: int, source_name: str):
+    """فراخوانی‌های LLM داخل این بلوک به مقاله و منبع داده شده نسبت داده می‌شوند."""
+    token = _attribution.set((article_id, source_name))
+    try:
+        yield
+    finally:
+        _attribution.reset(token)
+
+
+def record(prompt_type: str, model: str, input_tokens: int, output_tokens: int, seconds: float, failed: bool = False):
+    """یک فراخوانی را در صف نوشتن قرار می‌دهد؛ خطای دیتابیس فقط لاگ می‌شود و نتیجه LLM را از بین نمی‌برد."""
+    if not settings.LLM_USAGE_ENABLED:
+        return
+    article_id, source_name = _attribution.get()
+    _ensure_writer().put(dict(
+        created_at=datetime.utcnow(), article_id=article_id, source_name=source_name, prompt_type=prompt_type,
+        model=model, input_tokens=input_tokens or 0, output_tokens=output_tokens or 0,
+        latency_ms=int(seconds * 1000), failed=failed,
+    ))
+
+
+def _ensure_writer() -> queue.Queue:
+    """برای هر پردازه (پس از fork) یک صف و یک thread نویسنده جداگانه ساخته می‌شود."""
+    global _queue, _writer_pid
+    pid = os.getpid()
+    if _queue is not None and _writer_pid == pid:
+        return _queue
+    with _writer_lock:
+        if _queue is None or _writer_pid != pid:
+            _queue = queue.Queue()
+            _writer_pid = pid
+            threading.Thread(target=_write_loop, args=(_queue,), name="llm-usage-writer", daemon=True).start()
+    return _queue
+
+
+def flush(timeout: float = 5.0):
+    """منتظر می‌ماند تا ردیف‌های صف شده نوشته شوند (برای پایان پردازه worker، benchmark و تست‌ها)."""
+    if _queue is None or _writer_pid != os.getpid():
+        return
+    deadline = time.monotonic() + timeout
+    while _queue.unfinished_tasks and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+
+def _write_loop(q: queue.Queue):
+    while True:
+        batch = [q.get()]
+        deadline = time.monotonic() + FLUSH_INTERVAL
+        while len(batch) < MAX_BATCH:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(q.get(timeout=remaining))
+            except queue.Empty:
+                break
+        try:
+            _write_batch(batch)
+        except Exception as e:
+            logger.warning(f"Could not record {len(batch)} LLM usage row(s): {e}")
+        finally:
+            for _ in batch:
+                q.task_done()
+
+
+def _write_batch(batch: list):
+    db = SessionLocal()
+    try:
+        db.bulk_insert_mappings(LLMUsage, batch)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def prices() -> dict:
+    """{model: (دلار برای یک میلیون token ورودی، خروجی)} از LLM_PRICES به شکل 'model=0.075/0.30,...'"""
+    result = {}
+    for item in (settings.LLM_PRICES or "").split(","):
+        model, _, price = item.partition("=")
+        price_in, _, price_out = price.partition("/")
+        try:
+            result[model.strip()] = (float(price_in), float(price_out or price_in))
+        except ValueError:
+            continue
+    return result
+
+
+def cost(model: str, input_tokens: int, output_tokens: int, price_table: dict = None):
+    """هزینه به دلار؛ None اگر قیمت مدل تعریف نشده باشد."""
+    price = (price_table if price_table is not None else prices()).get(model)
+    if price is None:
+        return None
+    return (input_tokens * price[0] + output_tokens * price[1]) / 1_000_000
+
+
+def _as_date(value) -> date:
+    # func.date در SQLite رشته و در MySQL شیء date برمی‌گرداند
+    return datetime.strptime(value, "%Y-%m-%d").date() if isinstance(value, str) else value
+
+
+def rollup(db: Session, raw_days: int = None) -> int:
+    """ردیف‌های خام قدیمی‌تر از raw_days روز (مرز روز) را در جدول روزانه جمع و حذف می‌کند؛ تعداد ردیف‌های حذف شده."""
+    raw_days = settings.LLM_USAGE_RAW_DAYS if raw_days is None else raw_days
+    cutoff = datetime.combine(datetime.utcnow().date() - timedelta(days=raw_days), datetime.min.time())
+    day = func.date(LLMUsage.created_at)
+    groups = (
+        db.query(
+            day, LLMUsage.source_name, LLMUsage.prompt_type, LLMUsage.model,
+            func.count(LLMUsage.id), func.sum(cast(LLMUsage.failed, Integer)),
+            func.sum(LLMUsage.input_tokens), func.sum(LLMUsage.output_tokens), func.sum(LLMUsage.latency_ms),
+        )
+        .filter(LLMUsage.created_at < cutoff)
+        .group_by(day, LLMUsage.source_name, LLMUsage.prompt_type, LLMUsage.model)
+        .all()
+    )
+    for row_day, source_name, prompt_type, model, calls, failures, tokens_in, tokens_out, latency in groups:
+        key = dict(day=_as_date(row_day), source_name=source_name or '', prompt_type=prompt_type, model=model)
+        daily = db.query(LLMUsageDaily).filter_by(**key).first()
+        if daily is None:
+            daily = LLMUsageDaily(**key, calls=0, failures=0, input_tokens=0, output_tokens=0, latency_ms=0)
+            db.add(daily)
+        daily.calls += calls or 0
+        daily.failures += failures or 0
+        daily.input_tokens += tokens_in or 0
+        daily.output_tokens += tokens_out or 0
+        daily.latency_ms += latency or 0
+    deleted = db.query(LLMUsage).filter(LLMUsage.created_at < cutoff).delete(synchronize_session=False)
+    db.commit()
+    return deleted or 0
+
+
+def _empty() -> dict:
+    return {"calls": 0, "failures": 0, "input_tokens": 0, "output_tokens": 0, "latency_ms": 0, "cost": 0.0, "priced": True}
+
+
+def _add(bucket: dict, calls, failures, tokens_in, tokens_out, latency, row_cost):
+    bucket["calls"] += calls or 0
+    bucket["failures"] += failures or 0
+    bucket["input_tokens"] += tokens_in or 0
+    bucket["output_tokens"] += tokens_out or 0
+    bucket["latency_ms"] += latency or 0
+    if row_cost is None:
+        bucket["priced"] = False
+    else:
+        bucket["cost"] += row_cost
+
+
+def usage_report(db: Session, hours: int = 24) -> dict:
+    """
+    مصرف چند ساعت اخیر به تفکیک منبع، نوع پرامپت و مدل، همراه با تعداد خبرهای منتشر شده هر منبع.
+    برای بازه‌های طولانی‌تر از LLM_USAGE_RAW_DAYS، روزهای تجمیع شده به طور کامل حساب می‌شوند.
+    """
+    since = datetime.utcnow() - timedelta(hours=hours)
+    price_table = prices()
+    raw = (
+        db.query(
+            LLMUsage.source_name, LLMUsage.prompt_type, LLMUsage.model,
+            func.count(LLMUsage.id), func.sum(cast(LLMUsage.failed, Integer)),
+            func.sum(LLMUsage.input_tokens), func.sum(LLMUsage.output_tokens), func.sum(LLMUsage.latency_ms),
+        )
+        .filter(LLMUsage.created_at >= since)
+        .group_by(LLMUsage.source_name, LLMUsage.prompt_type, LLMUsage.model)
+        .all()
+    )
+    daily = (
+        db.query(
+            LLMUsageDaily.source_name, LLMUsageDaily.prompt_type, LLMUsageDaily.model,
+            func.sum(LLMUsageDaily.calls), func.sum(LLMUsageDaily.failures),
+            func.sum(LLMUsageDaily.input_tokens), func.sum(LLMUsageDaily.output_tokens), func.sum(LLMUsageDaily.latency_ms),
+        )
+        .filter(LLMUsageDaily.day >= since.date())
+        .group_by(LLMUsageDaily.source_name, LLMUsageDaily.prompt_type, LLMUsageDaily.model)
+        .all()
+    )
+    total = _empty()
+    groups = {grouping: {} for grouping in GROUPINGS}
+    for source_name, prompt_type, model, calls, failures, tokens_in, tokens_out, latency in list(raw) + list(daily):
+        tokens_in, tokens_out = int(tokens_in or 0), int(tokens_out or 0)
+        row_cost = cost(model, tokens_in, tokens_out, price_table)
+        values = (int(calls or 0), int(failures or 0), tokens_in, tokens_out, int(latency or 0), row_cost)
+        _add(total, *values)
+        for grouping, key in zip(GROUPINGS, (source_name or '-', prompt_type, model)):
+            _add(groups[grouping].setdefault(key, _empty()), *values)
+    published = dict(
+        db.query(Article.source_name, func.count(ArticleTransition.id))
+        .join(Article, Article.id == ArticleTransition.article_id)
+        .filter(ArticleTransition.to_status == 'published', ArticleTransition.created_at >= since)
+        .group_by(Article.source_name)
+        .all()
+    )
+    for source_name, bucket in groups["source"].items():
+        bucket["published"] = int(published.get(source_name, 0))
+    return {"hours": hours, "total": total, **groups}
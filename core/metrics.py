@@ -0,0 +1,183 @@
+# core/metrics.py
+import os
+import time
+from contextlib import contextmanager
+from prometheus_client import Counter, Histogram, Gauge, CollectorRegistry, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client import REGISTRY
+
+# تمام سنجه‌های Prometheus پروژه در این ماژول تعریف می‌شوند.
+# برای مسیرهای پرتکرار، child هر برچسب یک بار ساخته و در dict نگه داشته می‌شود تا هر فراخوانی
+# فقط یک lookup باشد و شیء برچسب جدیدی ساخته نشود.
+
+PROMPT_TYPES = ("title", "score", "title_full", "content", "summary")
+PREFILTER_DECISIONS = ("archive", "accept", "llm")
+TRANSLATION_MEMORY_RESULTS = ("exact", "near", "miss")
+TELEGRAM_METHODS = ("send_photo", "send_message", "edit_message_caption", "edit_message_text")
+
+FEED_FETCH_SECONDS = Histogram(
+    "robopost_feed_fetch_seconds", "Duration of fetching and parsing one RSS feed", ["source"],
+    buckets=(0.25, 0.5, 1, 2, 5, 10, 20, 30, 60),
+)
+FEED_FETCH_TOTAL = Counter("robopost_feed_fetch_total", "RSS feed fetches by HTTP status", ["source", "status"])
+NEW_ARTICLES_TOTAL = Counter("robopost_new_articles_total", "New articles stored", ["source"])
+DUPLICATE_ARTICLES_TOTAL = Counter(
+    "robopost_duplicate_articles_total", "Near-duplicate articles attached to an existing story", ["source"]
+)
+PREFILTER_DECISIONS_TOTAL = Counter(
+    "robopost_prefilter_decisions_total", "Local headline prefilter decisions", ["decision"]
+)
+TRANSLATION_MEMORY_LOOKUPS_TOTAL = Counter(
+    "robopost_translation_memory_lookups_total", "Title translation memory lookups", ["result"]
+)
+NEW_ARTICLES_PER_FETCH = Histogram(
+    "robopost_new_articles_per_fetch", "New articles found in one feed fetch", buckets=(0, 1, 2, 5, 10, 20, 30)
+)
+
+LLM_REQUEST_SECONDS = Histogram(
+    "robopost_llm_request_seconds", "LLM call latency", ["prompt_type"],
+    buckets=(0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120),
+)
+LLM_FIRST_TOKEN_SECONDS = Histogram(
+    "robopost_llm_first_token_seconds", "Time to the first streamed LLM chunk", ["prompt_type"],
+    buckets=(0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30),
+)
+LLM_TOKENS_TOTAL = Counter("robopost_llm_tokens_total", "LLM tokens", ["prompt_type", "direction"])
+LLM_ERRORS_TOTAL = Counter("robopost_llm_errors_total", "Failed LLM calls", ["prompt_type"])
+LLM_FALLBACK_TOTAL = Counter(
+    "robopost_llm_fallback_total", "LLM calls sent to the fallback model by an open circuit", ["prompt_type"]
+)
+LLM_CIRCUIT_OPEN = Gauge(
+    "robopost_llm_circuit_open", "1 while the primary model of a prompt type is bypassed", ["prompt_type"],
+    multiprocess_mode="max",
+)
+
+TELEGRAM_REQUEST_SECONDS = Histogram(
+    "robopost_telegram_request_seconds", "Telegram Bot API call latency", ["method"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10),
+)
+TELEGRAM_RATE_LIMITED_TOTAL = Counter(
+    "robopost_telegram_rate_limited_total", "Telegram 429 (RetryAfter) responses", ["method"]
+)
+TELEGRAM_ERRORS_TOTAL = Counter("robopost_telegram_errors_total", "Failed Telegram calls", ["method"])
+
+TASK_RETRIES_TOTAL = Counter(
+    "robopost_task_retries_total", "Failed Celery task attempts by error class (core.retry)", ["task", "kind"]
+)
+
+DB_QUERY_SECONDS = Histogram(
+    "robopost_db_query_seconds", "SQL statement execution time",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+DB_POOL_CHECKOUT_SECONDS = Histogram(
+    "robopost_db_pool_checkout_seconds", "Time spent waiting for a pooled DB connection",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30),
+)
+
+CELERY_QUEUE_DEPTH = Gauge("robopost_celery_queue_depth", "Messages waiting in a Celery queue", ["queue"])
+STREAM_LAG = Gauge("robopost_stream_lag", "Entries not yet delivered to the listener group", ["stream"])
+STREAM_PENDING = Gauge("robopost_stream_pending", "Delivered but unacknowledged entries", ["stream", "consumer"])
+
+
+def _bind(metric, values):
+    return {value: metric.labels(value) for value in values}
+
+
+_LLM_SECONDS = _bind(LLM_REQUEST_SECONDS, PROMPT_TYPES)
+_LLM_ERRORS = _bind(LLM_ERRORS_TOTAL, PROMPT_TYPES)
+_LLM_FIRST_TOKEN = _bind(LLM_FIRST_TOKEN_SECONDS, PROMPT_TYPES)
+_LLM_FALLBACK = _bind(LLM_FALLBACK_TOTAL, PROMPT_TYPES)
+_LLM_CIRCUIT = _bind(LLM_CIRCUIT_OPEN, PROMPT_TYPES)
+_LLM_TOKENS_IN = {t: LLM_TOKENS_TOTAL.labels(t, "input") for t in PROMPT_TYPES}
+_LLM_TOKENS_OUT = {t: LLM_TOKENS_TOTAL.labels(t, "output") for t in PROMPT_TYPES}
+_TG_SECONDS = _bind(TELEGRAM_REQUEST_SECONDS, TELEGRAM_METHODS)
+_TG_429 = _bind(TELEGRAM_RATE_LIMITED_TOTAL, TELEGRAM_METHODS)
+_TG_ERRORS = _bind(TELEGRAM_ERRORS_TOTAL, TELEGRAM_METHODS)
+_PREFILTER = _bind(PREFILTER_DECISIONS_TOTAL, PREFILTER_DECISIONS)
+_TM_LOOKUPS = _bind(TRANSLATION_MEMORY_LOOKUPS_TOTAL, TRANSLATION_MEMORY_RESULTS)
+_FEED_SECONDS = {}
+_FEED_TOTAL = {}
+_NEW_ARTICLES = {}
+_DUPLICATES = {}
+_TASK_RETRIES = {}
+
+
+def _child(bound: dict, key, metric, *labels):
+    child = bound.get(key)
+    if child is None:
+        child = bound[key] = metric.labels(*labels)
+    return child
+
+
+def observe_feed_fetch(source: str, seconds: float, status, new_articles: int, duplicates: int = 0):
+    _child(_FEED_SECONDS, source, FEED_FETCH_SECONDS, source).observe(seconds)
+    _child(_FEED_TOTAL, (source, status), FEED_FETCH_TOTAL, source, str(status)).inc()
+    if new_articles:
+        _child(_NEW_ARTICLES, source, NEW_ARTICLES_TOTAL, source).inc(new_articles)
+    if duplicates:
+        _child(_DUPLICATES, source, DUPLICATE_ARTICLES_TOTAL, source).inc(duplicates)
+    NEW_ARTICLES_PER_FETCH.observe(new_articles)
+
+
+def observe_prefilter(decision: str):
+    _child(_PREFILTER, decision, PREFILTER_DECISIONS_TOTAL, decision).inc()
+
+
+def observe_translation_memory(result: str):
+    _child(_TM_LOOKUPS, result, TRANSLATION_MEMORY_LOOKUPS_TOTAL, result).inc()
+
+
+def observe_llm_call(prompt_type: str, seconds: float, input_tokens: int = 0, output_tokens: int = 0, failed: bool = False):
+    _child(_LLM_SECONDS, prompt_type, LLM_REQUEST_SECONDS, prompt_type).observe(seconds)
+    if failed:
+        _child(_LLM_ERRORS, prompt_type, LLM_ERRORS_TOTAL, prompt_type).inc()
+        return
+    if input_tokens:
+        _child(_LLM_TOKENS_IN, prompt_type, LLM_TOKENS_TOTAL, prompt_type, "input").inc(input_tokens)
+    if output_tokens:
+        _child(_LLM_TOKENS_OUT, prompt_type, LLM_TOKENS_TOTAL, prompt_type, "output").inc(output_tokens)
+
+
+def observe_llm_routing(prompt_type: str, fallback: bool, circuit_state: str = None):
+    if fallback:
+        _child(_LLM_FALLBACK, prompt_type, LLM_FALLBACK_TOTAL, prompt_type).inc()
+    if circuit_state is not None:
+        _child(_LLM_CIRCUIT, prompt_type, LLM_CIRCUIT_OPEN, prompt_type).set(0 if circuit_state == "closed" else 1)
+
+
+def observe_task_retry(task: str, kind: str):
+    _child(_TASK_RETRIES, (task, kind), TASK_RETRIES_TOTAL, task, kind).inc()
+
+
+def observe_llm_first_token(prompt_type: str, seconds: float):
+    _child(_LLM_FIRST_TOKEN, prompt_type, LLM_FIRST_TOKEN_SECONDS, prompt_type).observe(seconds)
+
+
+@contextmanager
+def track_telegram(method: str):
+    """زمان یک فراخوانی Bot API و خطاهای 429 آن را ثبت می‌کند."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        if type(e).__name__ == "RetryAfter":
+            _child(_TG_429, method, TELEGRAM_RATE_LIMITED_TOTAL, method).inc()
+        else:
+            _child(_TG_ERRORS, method, TELEGRAM_ERRORS_TOTAL, method).inc()
+        raise
+    finally:
+        _child(_TG_SECONDS, method, TELEGRAM_REQUEST_SECONDS, method).observe(time.perf_counter() - start)
+
+
+def metrics_registry():
+    """در worker های Celery (PROMETHEUS_MULTIPROC_DIR) سنجه‌های تمام پردازه‌های فرزند تجمیع می‌شوند."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def metrics_http_route(query: dict):
+    """مسیر /metrics برای core.http_server."""
+    return 200, CONTENT_TYPE_LATEST, generate_latest(metrics_registry())
@@ -0,0 +1,112 @@
+# core/pipeline_stats.py
+import json
+from datetime import datetime, timedelta
+from sqlalchemy.orm import Session
+from .database import SessionLocal
+from .db_models import Article, ArticleTransition
+from .state_machine import FETCH_STAGE
+
+# هر مرحله با یک گذار (from_status, to_status) پایان می‌یابد؛ مدت آن از گذار قبلی همان مقاله حساب می‌شود
+STAGES = {
+    (FETCH_STAGE, 'new'): 'fetch',
+    ('new', 'pending_initial_approval'): 'preprocess',
+    ('pending_initial_approval', 'approved'): 'admin_wait',
+    ('approved', 'pending_publication'): 'processing',
+    ('pending_publication', 'sent_for_publication'): 'final_approval',
+    ('sent_for_publication', 'publishing'): 'publish_wait',
+    ('publishing', 'published'): 'publish',
+}
+STAGE_ORDER = list(STAGES.values())
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    """صدک q را با درون‌یابی خطی از یک لیست مرتب شده محاسبه می‌کند."""
+    if not sorted_values:
+        return 0.0
+    if len(sorted_values) == 1:
+        return float(sorted_values[0])
+    rank = (len(sorted_values) - 1) * q / 100.0
+    low = int(rank)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+
+def stage_durations(rows, since: datetime = None) -> list:
+    """
+    از ردیف‌های (article_id, source_name, from_status, to_status, created_at) مرتب شده بر اساس
+    مقاله و زمان، لیست (stage, source_name, seconds) را برای مراحلی که پس از since تمام شده‌اند می‌سازد.
+    """
+    durations = []
+    previous = {}
+    for article_id, source_name, from_status, to_status, created_at in rows:
+        stage = STAGES.get((from_status, to_status))
+        prev = previous.get(article_id)
+        if stage and prev and prev[0] == from_status and (since is None or created_at >= since):
+            durations.append((stage, source_name, (created_at - prev[1]).total_seconds()))
+        previous[article_id] = (to_status, created_at)
+    return durations
+
+
+def summarize(durations) -> dict:
+    """صدک‌های p50/p95/p99 هر مرحله را به صورت کلی و به تفکیک منبع برمی‌گرداند."""
+    by_stage = {}
+    by_source = {}
+    for stage, source_name, seconds in durations:
+        by_stage.setdefault(stage, []).append(seconds)
+        by_source.setdefault(stage, {}).setdefault(source_name, []).append(seconds)
+
+    def _describe(values):
+        values = sorted(values)
+        result = {"count": len(values)}
+        for q in PERCENTILES:
+            result[f"p{q}"] = round(percentile(values, q), 3)
+        return result
+
+    return {
+        stage: {
+            **_describe(by_stage[stage]),
+            "sources": {name: _describe(vals) for name, vals in sorted(by_source[stage].items())},
+        }
+        for stage in STAGE_ORDER
+        if stage in by_stage
+    }
+
+
+def collect_pipeline_stats(db: Session, hours: int = 24) -> dict:
+    """تاخیر هر مرحله را برای گذارهای ثبت شده در چند ساعت اخیر محاسبه می‌کند."""
+    since = datetime.utcnow() - timedelta(hours=hours)
+    # مقالاتی که هر گذاری در این بازه داشته‌اند؛ کل تاریخچه آن‌ها برای محاسبه مرز مراحل لازم است
+    recent_ids = (
+        db.query(ArticleTransition.article_id)
+        .filter(ArticleTransition.created_at >= since)
+        .distinct()
+        .subquery()
+    )
+    rows = (
+        db.query(
+            ArticleTransition.article_id,
+            Article.source_name,
+            ArticleTransition.from_status,
+            ArticleTransition.to_status,
+            ArticleTransition.created_at,
+        )
+        .join(Article, Article.id == ArticleTransition.article_id)
+        .filter(ArticleTransition.article_id.in_(recent_ids.select()))
+        .order_by(ArticleTransition.article_id, ArticleTransition.created_at, ArticleTransition.id)
+        .all()
+    )
+    return {"hours": hours, "stages": summarize(stage_durations(rows, since))}
+
+
+def stats_http_route(query: dict):
+    """مسیر /stats سرور HTTP: خروجی JSON آمار مراحل (پارامتر اختیاری hours)."""
+    hours = query.get("hours", ["24"])[0]
+    if not hours.isdigit():
+        return 400, "application/json", json.dumps({"error": "hours must be a whole number"})
+    hours = int(hours)
+    db = SessionLocal()
+    try:
+        return 200, "application/json", json.dumps(collect_pipeline_stats(db, hours))
+    finally:
+        db.close()
@@ -0,0 +1,222 @@
+# core/prefilter.py
+import os
+import re
+import json
+import math
+import random
+import hashlib
+import logging
+from .config import settings
+from .redis_client import get_redis
+
+logger = logging.getLogger("NewsBot")
+
+# پیش‌فیلتر محلی عناوین پیش از امتیازدهی LLM:
+#  ۱. قوانین کلیدواژه‌ای هر منبع (فایل PREFILTER_RULES_PATH):
+#     {"*": {"archive": ["horoscope"], "review": ["breaking"]}, "<source name>": {"archive": ["sport"]}}
+#     عنوان شامل کلیدواژه archive بدون LLM بایگانی می‌شود و کلیدواژه review همیشه به LLM می‌رود.
+#  ۲. یک رگرسیون لجستیک روی n-gram های hash شده عنوان که از تایید/رد مدیران یاد می‌گیرد.
+#     وزن‌ها در Redis نگه داشته می‌شوند تا worker ها و bot (که با هر کلیک مدل را به‌روز می‌کند) یک مدل مشترک داشته باشند.
+# تا پیش از PREFILTER_MIN_SAMPLES نمونه آموزشی، مدل تصمیمی نمی‌گیرد و همه عناوین به LLM می‌روند.
+WEIGHTS_KEY = "prefilter:weights"
+SAMPLES_KEY = "prefilter:samples"
+BIAS = "bias"
+
+ARCHIVE = "archive"
+ACCEPT = "accept"
+LLM = "llm"
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+_rules = None
+_rules_mtime = None
+
+
+def features(title: str, source_name: str = "") -> list:
+    """اندیس‌های hash شده تک‌کلمه‌ها، جفت‌کلمه‌ها و نام منبع."""
+    tokens = _TOKEN_RE.findall((title or "").lower())
+    grams = [f"w:{t}" for t in tokens] + [f"b:{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    if source_name:
+        grams.append(f"s:{source_name}")
+    size = 1 << settings.PREFILTER_FEATURE_BITS
+    return sorted({
+        str(int.from_bytes(hashlib.blake2b(g.encode("utf-8"), digest_size=8).digest(), "big") % size)
+        for g in grams
+    })
+
+
+def _sigmoid(z: float) -> float:
+    if z < -30:
+        return 0.0
+    if z > 30:
+        return 1.0
+    return 1.0 / (1.0 + math.exp(-z))
+
+
+def load_rules() -> dict:
+    """فایل قوانین فقط در صورت تغییر mtime دوباره خوانده می‌شود."""
+    global _rules, _rules_mtime
+    path = settings.PREFILTER_RULES_PATH
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        _rules, _rules_mtime = {}, None
+        return _rules
+    if mtime != _rules_mtime:
+        try:
+            with open(path, encoding="utf-8") as f:
+                raw = json.load(f)
+            _rules = {
+                source: {kind: [kw.lower() for kw in rule.get(kind, ())] for kind in (ARCHIVE, "review")}
+                for source, rule in raw.items()
+            }
+        except (OSError, ValueError, AttributeError) as e:
+            logger.error(f"Invalid prefilter rules file {path}: {e}")
+            _rules = {}
+        _rules_mtime = mtime
+    return _rules
+
+
+def _matches(title: str, keywords: list) -> str:
+    text = f" {' '.join(_TOKEN_RE.findall(title.lower()))} "
+    for keyword in keywords:
+        if f" {' '.join(_TOKEN_RE.findall(keyword))} " in text:
+            return keyword
+    return None
+
+
+def probability(title: str, source_name: str = ""):
+    """احتمال تایید عنوان توسط مدیر؛ اگر مدل هنوز نمونه کافی ندیده باشد None."""
+    r = get_redis()
+    samples = int(r.get(SAMPLES_KEY) or 0)
+    if samples < settings.PREFILTER_MIN_SAMPLES:
+        return None
+    keys = features(title, source_name)
+    values = r.hmget(WEIGHTS_KEY, [BIAS] + keys)
+    return _sigmoid(sum(float(v) for v in values if v is not None))
+
+
+def decide(title: str, source_name: str = "") -> tuple:
+    """
+    (تصمیم، احتمال، دلیل) را برمی‌گرداند. تصمیم یکی از ARCHIVE (بدون LLM بایگانی شود)، ACCEPT (بدون LLM
+    امتیاز بگیرد) یا LLM (ناحیه نامطمئن) است. خطای Redis باعث توقف pipeline نمی‌شود و عنوان به LLM می‌رود.
+    """
+    rules = load_rules()
+    for scope in ("*", source_name):
+        rule = rules.get(scope)
+        if not rule:
+            continue
+        keyword = _matches(title, rule["review"])
+        if keyword:
+            return LLM, None, f"review keyword '{keyword}'"
+        keyword = _matches(title, rule[ARCHIVE])
+        if keyword:
+            return ARCHIVE, 0.0, f"archive keyword '{keyword}'"
+    try:
+        p = probability(title, source_name)
+    except Exception as e:
+        logger.warning(f"Prefilter model unavailable: {e}")
+        return LLM, None, "model unavailable"
+    if p is None:
+        return LLM, None, "model not trained"
+    if p < settings.PREFILTER_ARCHIVE_BELOW:
+        return ARCHIVE, p, f"p={p:.3f}"
+    if p >= settings.PREFILTER_ACCEPT_ABOVE:
+        return ACCEPT, p, f"p={p:.3f}"
+    return LLM, p, f"p={p:.3f}"
+
+
+def score_from_probability(p: float) -> int:
+    """امتیاز 0 تا 10 هم‌مقیاس با خروجی score_prompt برای عناوینی که بدون LLM پذیرفته می‌شوند."""
+    return max(0, min(10, round(p * 10)))
+
+
+def learn(title: str, source_name: str, approved: bool):
+    """یک گام SGD با تصمیم مدیر؛ HINCRBYFLOAT اتمیک است، پس به‌روزرسانی همزمان چند پردازه امن است."""
+    keys = features(title, source_name)
+    try:
+        r = get_redis()
+        values = r.hmget(WEIGHTS_KEY, [BIAS] + keys)
+        p = _sigmoid(sum(float(v) for v in values if v is not None))
+        step = settings.PREFILTER_LEARNING_RATE * ((1.0 if approved else 0.0) - p)
+        pipe = r.pipeline(transaction=False)
+        for key in [BIAS] + keys:
+            pipe.hincrbyfloat(WEIGHTS_KEY, key, step)
+        pipe.incr(SAMPLES_KEY)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Could not update prefilter model: {e}")
+
+
+def train(examples: list, epochs: int = 5, seed: int = 0) -> dict:
+    """آموزش دسته‌ای روی [(title, source_name, approved), ...]؛ وزن‌ها را برمی‌گرداند."""
+    rng = random.Random(seed)
+    data = [(features(title, source), 1.0 if approved else 0.0) for title, source, approved in examples]
+    weights = {BIAS: 0.0}
+    lr = settings.PREFILTER_LEARNING_RATE
+    for _ in range(epochs):
+        rng.shuffle(data)
+        for keys, label in data:
+            p = _sigmoid(weights[BIAS] + sum(weights.get(k, 0.0) for k in keys))
+            step = lr * (label - p)
+            weights[BIAS] += step
+            for k in keys:
+                weights[k] = weights.get(k, 0.0) + step
+    return weights
+
+
+def save_model(weights: dict, samples: int):
+    r = get_redis()
+    pipe = r.pipeline()
+    pipe.delete(WEIGHTS_KEY)
+    pipe.hset(WEIGHTS_KEY, mapping=weights)
+    pipe.set(SAMPLES_KEY, samples)
+    pipe.execute()
+
+
+def history_examples(db) -> list:
+    """تصمیم‌های اولیه مدیران از لاگ وضعیت‌ها (approved = 1، rejected = 0)."""
+    from .db_models import Article, ArticleTransition
+    rows = (
+        db.query(Article.original_title, Article.source_name, ArticleTransition.to_status)
+        .join(ArticleTransition, ArticleTransition.article_id == Article.id)
+        .filter(ArticleTransition.from_status == 'pending_initial_approval')
+        .filter(ArticleTransition.to_status.in_(['approved', 'rejected']))
+        .all()
+    )
+    return [(title, source, status == 'approved') for title, source, status in rows]
+
+
+def evaluate(weights: dict, examples: list) -> dict:
+    """سهم عناوین رد شده/تایید شده‌ای که با آستانه‌های فعلی بدون LLM تصمیم‌گیری می‌شوند."""
+    counts = {"examples": len(examples), "archived": 0, "archived_wrong": 0, "accepted": 0, "accepted_wrong": 0}
+    for title, source, approved in examples:
+        keys = features(title, source)
+        p = _sigmoid(weights.get(BIAS, 0.0) + sum(weights.get(k, 0.0) for k in keys))
+        if p < settings.PREFILTER_ARCHIVE_BELOW:
+            counts["archived"] += 1
+            counts["archived_wrong"] += approved
+        elif p >= settings.PREFILTER_ACCEPT_ABOVE:
+            counts["accepted"] += 1
+            counts["accepted_wrong"] += not approved
+    return counts
+
+
+if __name__ == "__main__":
+    import argparse
+    from .database import SessionLocal
+    parser = argparse.ArgumentParser(description="Train the local headline prefilter from admin decisions")
+    parser.add_argument("--epochs", type=int, default=5)
+    parser.add_argument("--holdout", type=float, default=0.2, help="share of history used only for evaluation")
+    parser.add_argument("--dry-run", action="store_true", help="evaluate without replacing the live model")
+    args = parser.parse_args()
+    db = SessionLocal()
+    try:
+        history = history_examples(db)
+    finally:
+        db.close()
+    random.Random(1).shuffle(history)
+    split = int(len(history) * (1 - args.holdout))
+    print(f"{len(history)} labelled headline(s); holdout: {evaluate(train(history[:split], args.epochs), history[split:])}")
+    if not args.dry_run:
+        save_model(train(history, args.epochs), len(history))
+        print("Model saved.")
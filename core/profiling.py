@@ -0,0 +1,203 @@
+# core/profiling.py
+import os
+import io
+import glob
+import json
+import random
+import pstats
+import cProfile
+import logging
+import threading
+from .config import settings
+from .redis_client import get_redis, on_event, publish_event
+
+logger = logging.getLogger("NewsBot")
+
+# پروفایل‌گیری اختیاری وظایف Celery: بخشی از اجراها (نرخ نمونه‌برداری) با cProfile اجرا شده و آمار
+# تجمیعی هر وظیفه در PROFILING_DIR ذخیره می‌شود. وقتی نرخ صفر است هیچ سیگنالی متصل نیست و
+# هزینه‌ای روی اجرای وظایف وجود ندارد. نرخ با متغیر محیطی یا دستور ادمین (/profile) تنظیم می‌شود.
+PROFILING_EVENT = "profiling"
+SAMPLE_RATE_KEY = "profiling:sample_rate"
+
+_rate = 0.0
+_connected = False
+_active = {}
+_stats = {}
+_samples = {}
+_lock = threading.Lock()
+
+
+def current_sample_rate() -> float:
+    return _rate
+
+
+def _task_filter() -> set:
+    return {name.strip() for name in settings.PROFILING_TASKS.split(",") if name.strip()}
+
+
+def apply_sample_rate(rate: float):
+    """نرخ را در پردازه جاری اعمال و سیگنال‌ها را فقط در صورت نیاز متصل می‌کند."""
+    global _rate, _connected
+    from celery.signals import task_prerun, task_postrun
+    _rate = max(0.0, min(1.0, rate))
+    if _rate > 0 and not _connected:
+        task_prerun.connect(_on_prerun, weak=False)
+        task_postrun.connect(_on_postrun, weak=False)
+        _connected = True
+    elif _rate == 0 and _connected:
+        task_prerun.disconnect(_on_prerun)
+        task_postrun.disconnect(_on_postrun)
+        _connected = False
+        _active.clear()
+
+
+def configured_sample_rate() -> float:
+    """نرخی که worker ها اعمال می‌کنند: مقدار Redis (تنظیم شده با دستور ادمین) یا در نبود آن مقدار تنظیمات."""
+    try:
+        value = get_redis().get(SAMPLE_RATE_KEY)
+    except Exception as e:
+        logger.warning(f"Could not read profiling sample rate: {e}")
+        value = None
+    return float(value) if value is not None else settings.PROFILING_SAMPLE_RATE
+
+
+def refresh(payload: str = ""):
+    """نرخ پردازه جاری را با configured_sample_rate همگام می‌کند."""
+    if payload == "clear":
+        with _lock:
+            _stats.clear()
+            _samples.clear()
+        return
+    rate = configured_sample_rate()
+    if rate != _rate:
+        logger.info(f"Task profiling sample rate set to {rate}")
+    apply_sample_rate(rate)
+
+
+def install():
+    """در هر پردازه worker (worker_process_init) فراخوانی می‌شود."""
+    on_event(PROFILING_EVENT, refresh)
+    refresh()
+
+
+def set_sample_rate(rate: float = None):
+    """نرخ نمونه‌برداری را برای تمام worker ها تغییر می‌دهد؛ None به مقدار تنظیمات برمی‌گرداند."""
+    r = get_redis()
+    if rate is None:
+        r.delete(SAMPLE_RATE_KEY)
+    else:
+        r.set(SAMPLE_RATE_KEY, max(0.0, min(1.0, rate)))
+    publish_event(PROFILING_EVENT)
+
+
+def _on_prerun(task_id=None, task=None, **kwargs):
+    if random.random() >= _rate:
+        return
+    names = _task_filter()
+    name = task.name.rsplit(".", 1)[-1]
+    if names and name not in names:
+        return
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # پروفایلر دیگری در همین پردازه فعال است (مثلا pool از نوع threads)
+        return
+    _active[task_id] = (name, profiler)
+
+
+def _on_postrun(task_id=None, **kwargs):
+    entry = _active.pop(task_id, None)
+    if entry is None:
+        return
+    name, profiler = entry
+    profiler.disable()
+    try:
+        _record(name, profiler)
+    except Exception as e:
+        logger.warning(f"Could not save profile for {name}: {e}")
+
+
+def _record(name: str, profiler: cProfile.Profile):
+    """آمار را با نمونه‌های قبلی همین وظیفه در این پردازه جمع کرده و روی دیسک می‌نویسد."""
+    with _lock:
+        stats = _stats.get(name)
+        if stats is None:
+            stats = _stats[name] = pstats.Stats(profiler)
+        else:
+            stats.add(profiler)
+        _samples[name] = _samples.get(name, 0) + 1
+        os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+        base = os.path.join(settings.PROFILING_DIR, f"{name}.{os.getpid()}")
+        stats.dump_stats(base + ".prof")
+        with open(base + ".json", "w", encoding="utf-8") as f:
+            json.dump({"task": name, "samples": _samples[name]}, f)
+
+
+def _profile_files() -> dict:
+    files = {}
+    for path in glob.glob(os.path.join(settings.PROFILING_DIR, "*.prof")):
+        name = os.path.basename(path).rsplit(".", 2)[0]
+        files.setdefault(name, []).append(path)
+    return files
+
+
+def hotspots(task: str = None, top: int = 15, sort: str = "tottime") -> dict:
+    """
+    آمار تمام پردازه‌ها را برای هر وظیفه ادغام کرده و پرهزینه‌ترین توابع را برمی‌گرداند:
+    {task: {"samples": n, "total_seconds": t, "rows": [(function, calls, tottime, cumtime), ...]}}
+    """
+    result = {}
+    key = 2 if sort == "tottime" else 3
+    for name, paths in sorted(_profile_files().items()):
+        if task and name != task:
+            continue
+        stats = pstats.Stats(*paths, stream=io.StringIO())
+        samples = 0
+        for path in paths:
+            try:
+                with open(path[:-5] + ".json", encoding="utf-8") as f:
+                    samples += json.load(f)["samples"]
+            except (OSError, ValueError, KeyError):
+                pass
+        rows = []
+        for (filename, line, func), (cc, nc, tt, ct, _callers) in stats.stats.items():
+            label = f"{os.path.basename(filename)}:{line}({func})" if line else func
+            rows.append((label, nc, tt, ct))
+        rows.sort(key=lambda row: row[key], reverse=True)
+        result[name] = {"samples": samples, "total_seconds": stats.total_tt, "rows": rows[:top]}
+    return result
+
+
+def format_report(report: dict) -> str:
+    if not report:
+        return "No profiles recorded."
+    lines = []
+    for name, info in report.items():
+        lines.append(f"{name}: {info['samples']} sample(s), {info['total_seconds']:.2f}s profiled")
+        lines.append(f"  {'tottime':>9} {'cumtime':>9} {'calls':>8}  function")
+        for label, calls, tottime, cumtime in info["rows"]:
+            lines.append(f"  {tottime:>9.3f} {cumtime:>9.3f} {calls:>8}  {label}")
+        lines.append("")
+    return "\n".join(lines).rstrip()
+
+
+def clear_profiles() -> int:
+    """فایل‌های پروفایل را حذف کرده و از تمام worker ها می‌خواهد آمار درون حافظه را هم پاک کنند."""
+    publish_event(PROFILING_EVENT, "clear")
+    removed = 0
+    for pattern in ("*.prof", "*.json"):
+        for path in glob.glob(os.path.join(settings.PROFILING_DIR, pattern)):
+            os.remove(path)
+            removed += 1
+    return removed
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Print the top hotspots of profiled Celery tasks")
+    parser.add_argument("task", nargs="?", default=None)
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument("--sort", choices=("tottime", "cumtime"), default="tottime")
+    args = parser.parse_args()
+    print(format_report(hotspots(args.task, args.top, args.sort)))
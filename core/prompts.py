@@ -0,0 +1,115 @@
+# core/prompts.py
+import os
+import re
+import time
+import hashlib
+import logging
+import threading
+from .config import settings
+from .redis_client import on_event, publish_event
+
+logger = logging.getLogger("NewsBot")
+
+# رجیستری پرامپت‌ها: فایل‌ها یک بار در هر پردازه خوانده و به قطعات ثابت/جای‌خالی ({name}) کامپایل می‌شوند.
+# حداکثر هر PROMPT_RELOAD_INTERVAL ثانیه mtime فایل‌ها بررسی و فقط فایل‌های تغییر یافته دوباره خوانده
+# می‌شوند؛ دستور /prompts reload با رویداد PROMPTS_EVENT همه پردازه‌ها را فورا به‌روز می‌کند.
+# نسخه هر پرامپت hash محتوای آن است و نسخه رجیستری (version()) روی مقاله ثبت می‌شود.
+PROMPTS_EVENT = "prompts"
+
+PROMPT_FILES = {
+    "score": "score_prompt.txt",
+    "title": "translate_prompt.txt",
+    "title_full": "title_translate_prompt.txt",
+    "content": "content_translate_prompt.txt",
+    "summary_fa": "prompt.txt",
+    "summary": "summary_prompt.txt",
+}
+
+_PLACEHOLDER_RE = re.compile(r"\{(\w+)\}")
+
+_templates = {}
+_mtimes = {}
+_version = ""
+_checked_at = 0.0
+_lock = threading.Lock()
+_subscribed = False
+
+
+def _compile(text: str) -> list:
+    """قطعه‌های زوج متن ثابت و قطعه‌های فرد نام جای‌خالی هستند."""
+    return _PLACEHOLDER_RE.split(text)
+
+
+def _hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:8]
+
+
+def reload(force: bool = False) -> bool:
+    """فایل‌های تغییر یافته را دوباره می‌خواند؛ True اگر محتوای پرامپتی عوض شده باشد."""
+    global _version, _checked_at
+    changed = False
+    with _lock:
+        for name, filename in PROMPT_FILES.items():
+            path = os.path.join(settings.PROMPTS_DIR, filename)
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                mtime = None
+            if not force and name in _templates and mtime == _mtimes.get(name):
+                continue
+            try:
+                with open(path, encoding="utf-8") as f:
+                    text = f.read().strip()
+            except OSError:
+                logger.warning(f"Prompt file {path} is missing; using an empty prompt.")
+                text = ""
+            entry = (_compile(text), _hash(text))
+            if _templates.get(name, (None, None))[1] != entry[1]:
+                changed = True
+                if name in _templates:
+                    logger.info(f"Prompt '{name}' reloaded (version {entry[1]}).")
+            _templates[name], _mtimes[name] = entry, mtime
+        _version = _hash("|".join(f"{name}:{_templates[name][1]}" for name in sorted(_templates)))
+        _checked_at = time.monotonic()
+    return changed
+
+
+def invalidate(_payload: str = ""):
+    global _checked_at
+    _mtimes.clear()
+    _checked_at = 0.0
+
+
+def _ensure_loaded():
+    global _subscribed
+    if not _subscribed:
+        on_event(PROMPTS_EVENT, invalidate)
+        _subscribed = True
+    if not _templates or time.monotonic() - _checked_at >= settings.PROMPT_RELOAD_INTERVAL:
+        reload()
+
+
+def render(name: str, **values) -> str:
+    """متن پرامپت با جای‌خالی‌های پر شده؛ جای‌خالی بدون مقدار همان‌طور باقی می‌ماند."""
+    _ensure_loaded()
+    parts = _templates[name][0]
+    return "".join(
+        part if i % 2 == 0 else str(values.get(part, f"{{{part}}}"))
+        for i, part in enumerate(parts)
+    )
+
+
+def version() -> str:
+    """نسخه مجموعه فعلی پرامپت‌ها."""
+    _ensure_loaded()
+    return _version
+
+
+def versions() -> dict:
+    """{name: version} برای گزارش دستور /prompts"""
+    _ensure_loaded()
+    return {name: entry[1] for name, entry in sorted(_templates.items())}
+
+
+def notify_prompts_changed():
+    publish_event(PROMPTS_EVENT)
@@ -0,0 +1,73 @@
+# core/publications.py
+from datetime import datetime
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from .config_cache import get_config
+from .db_models import Article, ArticlePublication
+
+# انتشار هر مقاله در هر کانال جداگانه پیگیری می‌شود: ردیف (مقاله، کانال) با وضعیت publishing ادعای
+# انتشار است (کلیک همزمان دو مدیر فقط یک بار منتشر می‌کند) و پس از ارسال published می‌شود.
+# مقاله با انتشار در اولین کانال به publishing و پس از انتشار در تمام کانال‌های فعال منبع (یا لغو بقیه)
+# به published می‌رود؛ تا آن زمان دکمه کانال‌های باقی‌مانده روی پیام مدیر می‌ماند.
+PUBLISHING = "publishing"
+PUBLISHED = "published"
+
+
+def claim(db: Session, article_id: int, channel_id: int) -> bool:
+    """انتشار در کانال را ادعا می‌کند؛ False اگر این کانال در حال انتشار یا منتشر شده باشد."""
+    db.add(ArticlePublication(article_id=article_id, channel_id=channel_id, status=PUBLISHING))
+    try:
+        db.commit()
+        return True
+    except IntegrityError:
+        db.rollback()
+        return False
+
+
+def release(db: Session, article_id: int, channel_id: int):
+    """ادعای انتشار ناموفق را حذف می‌کند تا retry یا مدیر دوباره آن را منتشر کند."""
+    (
+        db.query(ArticlePublication)
+        .filter_by(article_id=article_id, channel_id=channel_id, status=PUBLISHING)
+        .delete(synchronize_session=False)
+    )
+    db.commit()
+
+
+def mark_published(db: Session, article_id: int, channel_id: int):
+    (
+        db.query(ArticlePublication)
+        .filter_by(article_id=article_id, channel_id=channel_id)
+        .update({"status": PUBLISHED, "published_at": datetime.utcnow()}, synchronize_session=False)
+    )
+    db.commit()
+
+
+def channel_states(db: Session, article_id: int) -> dict:
+    """{channel_id: status} کانال‌هایی که انتشار مقاله در آن‌ها ادعا یا انجام شده است."""
+    return dict(
+        db.query(ArticlePublication.channel_id, ArticlePublication.status)
+        .filter(ArticlePublication.article_id == article_id)
+        .all()
+    )
+
+
+def pending_channels(db: Session, article: Article) -> list:
+    """کانال‌های فعال مرتبط با منبع مقاله که مقاله هنوز در آن‌ها منتشر نشده است."""
+    config = get_config()
+    channels = config.channels_for_source(config.get_source_by_name(article.source_name))
+    states = channel_states(db, article.id)
+    return [channel for channel in channels if channel.is_active and states.get(channel.id) != PUBLISHED]
+
+
+def publish_keyboard(article_id: int, channels: list) -> InlineKeyboardMarkup:
+    """یک دکمه انتشار برای هر کانال و دکمه لغو انتشار در کانال‌های باقی‌مانده."""
+    rows = [
+        [InlineKeyboardButton(
+            f"🚀 انتشار در {channel.name} ({channel.target_language_code})", callback_data=f"publish_{article_id}_{channel.id}"
+        )]
+        for channel in channels
+    ]
+    rows.append([InlineKeyboardButton("🗑️ لغو کلی", callback_data=f"discard_{article_id}")])
+    return InlineKeyboardMarkup(rows)
@@ -0,0 +1,160 @@
+# core/redis_client.py
+import os
+import threading
+import time
+import logging
+import uuid
+import redis
+from .config import settings
+
+logger = logging.getLogger("NewsBot")
+
+# کانال pub/sub مشترک برای اطلاع‌رسانی تغییرات بین تمام پردازه‌ها (worker، bot، listener)
+EVENTS_CHANNEL = "robopost_events"
+
+_client = None
+_client_pid = None
+_handlers = {}
+_listener_pid = None
+_listener_lock = threading.Lock()
+
+
+def get_redis() -> redis.Redis:
+    """یک کلاینت Redis مشترک برای هر پردازه برمی‌گرداند (پس از fork دوباره ساخته می‌شود)."""
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is None or _client_pid != pid:
+        _client = redis.Redis.from_url(settings.REDIS_URL)
+        _client_pid = pid
+    return _client
+
+
+def on_event(kind: str, handler):
+    """یک تابع را برای رویدادهای نوع kind ثبت کرده و شنونده pub/sub را راه‌اندازی می‌کند."""
+    _handlers.setdefault(kind, []).append(handler)
+    ensure_event_listener()
+
+
+def publish_event(kind: str, payload: str = ""):
+    """یک رویداد را برای تمام پردازه‌ها منتشر می‌کند و آن را در پردازه جاری هم اعمال می‌کند."""
+    _dispatch(kind, payload)
+    try:
+        get_redis().publish(EVENTS_CHANNEL, f"{kind}:{payload}")
+    except redis.RedisError as e:
+        logger.warning(f"Could not publish event {kind}: {e}")
+
+
+def _dispatch(kind: str, payload: str):
+    for handler in _handlers.get(kind, ()):
+        try:
+            handler(payload)
+        except Exception as e:
+            logger.error(f"Event handler for {kind} failed: {e}", exc_info=True)
+
+
+def _dispatch_all_reconnect():
+    # پیام‌هایی که هنگام قطع اتصال منتشر شده‌اند از دست رفته‌اند؛ همه handlerها با payload خالی اجرا می‌شوند
+    for kind in list(_handlers):
+        _dispatch(kind, "")
+
+
+def _listen_forever():
+    while True:
+        pubsub = None
+        try:
+            pubsub = redis.Redis.from_url(settings.REDIS_URL).pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(EVENTS_CHANNEL)
+            _dispatch_all_reconnect()
+            for message in pubsub.listen():
+                data = message.get("data")
+                if isinstance(data, bytes):
+                    data = data.decode()
+                kind, _, payload = str(data).partition(":")
+                _dispatch(kind, payload)
+        except Exception as e:
+            logger.warning(f"Event listener disconnected, reconnecting: {e}")
+            time.sleep(5)
+        finally:
+            if pubsub is not None:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+
+
+def ensure_event_listener():
+    """شنونده pub/sub را یک بار در هر پردازه (از جمله فرزندان fork شده Celery) اجرا می‌کند."""
+    global _listener_pid
+    pid = os.getpid()
+    if _listener_pid == pid:
+        return
+    with _listener_lock:
+        if _listener_pid == pid:
+            return
+        threading.Thread(target=_listen_forever, name="redis-events", daemon=True).start()
+        _listener_pid = pid
+
+
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def acquire_lock(name: str, ttl: int):
+    """یک قفل توزیع‌شده ساده می‌گیرد؛ در صورت موفقیت توکن قفل و در غیر این صورت None برمی‌گرداند."""
+    token = uuid.uuid4().hex
+    if get_redis().set(name, token, nx=True, ex=ttl):
+        return token
+    return None
+
+
+def release_lock(name: str, token: str) -> bool:
+    """قفل را فقط در صورتی آزاد می‌کند که هنوز متعلق به همین توکن باشد."""
+    if not token:
+        return False
+    return bool(get_redis().eval(_RELEASE_LOCK_SCRIPT, 1, name, token))
+
+
+_EXTEND_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('expire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+def extend_lock(name: str, token: str, ttl: int) -> bool:
+    """مهلت قفل را از همین لحظه ttl ثانیه می‌کند، فقط اگر قفل هنوز متعلق به همین توکن باشد."""
+    if not token:
+        return False
+    try:
+        return bool(get_redis().eval(_EXTEND_LOCK_SCRIPT, 1, name, token, ttl))
+    except redis.RedisError as e:
+        # تمدید ناموفق کار جاری را متوقف نمی‌کند؛ در بدترین حالت قفل با TTL قبلی منقضی می‌شود
+        logger.warning(f"Could not extend lock {name}: {e}")
+        return False
+
+
+def claim_once(key: str, ttl: int) -> bool:
+    """اولین فراخوانی برای یک کلید در بازه ttl ثانیه True و بقیه False برمی‌گردانند."""
+    return bool(get_redis().set(key, 1, nx=True, ex=ttl))
+
+
+def claim_dispatch(task_name: str, article_id: int) -> bool:
+    """
+    برای جلوگیری از ارسال دوباره یک وظیفه برای یک مقاله، یک کلید (task, article_id) با TTL ثبت می‌کند.
+    اگر همین وظیفه اخیرا برای این مقاله در صف قرار گرفته باشد False برمی‌گرداند.
+    """
+    return claim_once(f"dispatch:{task_name}:{article_id}", settings.DISPATCH_DEDUP_TTL)
+
+
+def release_dispatch(task_name: str, article_id: int):
+    """کلید claim_dispatch را حذف می‌کند؛ برای وقتی که وظیفه پس از claim در صف قرار نگرفت."""
+    get_redis().delete(f"dispatch:{task_name}:{article_id}")
+
+def add_stream_request(stream: str, fields: dict):
+    """یک درخواست به stream اضافه می‌کند و طول آن را به STREAM_MAXLEN محدود نگه می‌دارد."""
+    return get_redis().xadd(stream, fields, maxlen=settings.STREAM_MAXLEN, approximate=True)
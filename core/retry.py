@@ -0,0 +1,144 @@
+# core/retry.py
+import random
+import logging
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from .config import settings
+from .metrics import observe_task_retry
+
+logger = logging.getLogger("NewsBot")
+
+# سیاست مشترک retry وظایف Celery:
+#  - PERMANENT: خطاهایی که با تکرار درست نمی‌شوند (BadRequest/Forbidden تلگرام، 4xx، ورودی نامعتبر LLM،
+#    ValueError های خود pipeline) بدون retry بالا می‌روند.
+#  - RATE_LIMITED: 429 / RetryAfter / ResourceExhausted؛ اگر سرویس زمان انتظار را گفته باشد همان زمان
+#    به اضافه کمی jitter، وگرنه backoff با پایه بزرگ‌تر.
+#  - TRANSIENT: بقیه (قطع شبکه، timeout، 5xx)؛ backoff نمایی با equal jitter تا retry های همزمان
+#    چند worker (مثلا پس از قطعی یک سرویس) با هم برنگردند.
+# کلاس‌های خطا با نام شناخته می‌شوند تا این ماژول به telegram، requests یا google وابسته نباشد.
+PERMANENT = "permanent"
+RATE_LIMITED = "rate_limited"
+TRANSIENT = "transient"
+
+# پایه backoff برای 429 بدون Retry-After چند برابر پایه خطاهای گذرا است
+RATE_LIMITED_BASE_FACTOR = 4
+
+_KINDS_BY_NAME = {
+    # telegram.error
+    "RetryAfter": RATE_LIMITED,
+    "BadRequest": PERMANENT,
+    "Forbidden": PERMANENT,
+    "InvalidToken": PERMANENT,
+    "TimedOut": TRANSIENT,
+    "NetworkError": TRANSIENT,
+    # google.api_core.exceptions
+    "ResourceExhausted": RATE_LIMITED,
+    "TooManyRequests": RATE_LIMITED,
+    "InvalidArgument": PERMANENT,
+    "PermissionDenied": PERMANENT,
+    "Unauthenticated": PERMANENT,
+    "NotFound": PERMANENT,
+    "FailedPrecondition": PERMANENT,
+    # requests.exceptions
+    "InvalidURL": PERMANENT,
+    "MissingSchema": PERMANENT,
+    "InvalidSchema": PERMANENT,
+    # خطاهای داده و برنامه (مثلا "Newspaper parse failed" یا پاسخ مسدود شده LLM)
+    "ValueError": PERMANENT,
+    "TypeError": PERMANENT,
+    "KeyError": PERMANENT,
+    "AttributeError": PERMANENT,
+}
+
+
+def _status_code(exc):
+    """کد HTTP خطا: response.status_code در requests، code در google.api_core و urllib."""
+    response = getattr(exc, "response", None)
+    status = getattr(response, "status_code", None)
+    if status is None:
+        status = getattr(exc, "code", None)
+    return status if isinstance(status, int) and 400 <= status < 600 else None
+
+
+def _seconds(value):
+    """Retry-After به ثانیه از عدد، timedelta، یا هدر HTTP (ثانیه یا تاریخ)؛ None اگر قابل تفسیر نباشد."""
+    if value is None:
+        return None
+    if isinstance(value, timedelta):
+        return max(0.0, value.total_seconds())
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        when = parsedate_to_datetime(str(value))
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+def _retry_after(exc):
+    seconds = _seconds(getattr(exc, "retry_after", None))
+    if seconds is None:
+        headers = getattr(getattr(exc, "response", None), "headers", None) or getattr(exc, "headers", None)
+        if headers is not None:
+            try:
+                seconds = _seconds(headers.get("Retry-After"))
+            except AttributeError:
+                seconds = None
+    return seconds
+
+
+def classify(exc: BaseException):
+    """(نوع خطا، Retry-After به ثانیه یا None)؛ خطایی که با raise ... from ساخته شده بر اساس علت اصلی دسته‌بندی می‌شود."""
+    if exc.__cause__ is not None:
+        return classify(exc.__cause__)
+    status = _status_code(exc)
+    if status is not None:
+        if status == 429:
+            return RATE_LIMITED, _retry_after(exc)
+        if status < 500 and status != 408:
+            return PERMANENT, None
+        return TRANSIENT, None
+    for cls in type(exc).__mro__:
+        kind = _KINDS_BY_NAME.get(cls.__name__)
+        if kind is not None:
+            return kind, _retry_after(exc) if kind == RATE_LIMITED else None
+    return TRANSIENT, None
+
+
+def backoff(attempt: int, kind: str = TRANSIENT, retry_after: float = None, base: float = None) -> float:
+    """
+    ثانیه‌های انتظار پیش از تلاش attempt+1 (attempt از صفر).
+    equal jitter: نیمی از سقف نمایی ثابت و نیم دیگر تصادفی، پس تاخیر هیچ‌وقت از نصف سقف کمتر نیست
+    ولی retry های همزمان در بازه‌ای به پهنای نصف سقف پخش می‌شوند.
+    """
+    if kind == RATE_LIMITED and retry_after is not None:
+        return retry_after + random.uniform(0, max(1.0, retry_after * 0.25))
+    base = settings.RETRY_BASE_SECONDS if base is None else base
+    if kind == RATE_LIMITED:
+        base *= RATE_LIMITED_BASE_FACTOR
+    ceiling = min(settings.RETRY_MAX_SECONDS, base * 2 ** attempt)
+    return ceiling / 2 + random.uniform(0, ceiling / 2)
+
+
+def is_permanent(exc: BaseException) -> bool:
+    return classify(exc)[0] == PERMANENT
+
+
+def retry_task(task, exc: BaseException, base: float = None):
+    """
+    جایگزین task.retry(exc=exc) در بلوک except وظایف bind=True:
+        raise retry_task(self, e)
+    خطای دائمی همان‌جا دوباره raise می‌شود؛ بقیه با countdown حاصل از backoff زمان‌بندی می‌شوند و پس از
+    max_retries خود خطا بالا می‌رود.
+    """
+    kind, retry_after = classify(exc)
+    observe_task_retry(task.name, kind)
+    if kind == PERMANENT:
+        logger.warning(f"{task.name}: permanent error, not retrying: {exc!r}")
+        raise exc
+    countdown = backoff(task.request.retries, kind, retry_after, base)
+    return task.retry(exc=exc, countdown=countdown)
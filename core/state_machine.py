@@ -0,0 +1,68 @@
+# core/state_machine.py
+from datetime import datetime
+from sqlalchemy.orm import Session
+from .db_models import Article, ArticleTransition
+
+# گذارهای مجاز وضعیت مقاله؛ None یعنی ایجاد مقاله
+ALLOWED_TRANSITIONS = {
+    None: {'new', 'duplicate', 'archived_prefilter'},
+    'new': {'pending_initial_approval', 'failed'},
+    'pending_initial_approval': {'approved', 'rejected'},
+    'approved': {'pending_publication', 'failed'},
+    'pending_publication': {'sent_for_publication', 'failed', 'archived_unlinked'},
+    'sent_for_publication': {'publishing', 'discarded'},
+    'publishing': {'published', 'sent_for_publication'},
+}
+
+# تمام وضعیت‌های ممکن مقاله: ابتدا وضعیت‌های میانی به ترتیب pipeline و سپس وضعیت‌های پایانی
+ARTICLE_STATUSES = [s for s in ALLOWED_TRANSITIONS if s is not None] + sorted(
+    {s for targets in ALLOWED_TRANSITIONS.values() for s in targets} - set(ALLOWED_TRANSITIONS)
+)
+
+# مرحله دریافت از feed فقط در لاگ ثبت می‌شود و هیچ مقاله‌ای در این وضعیت ذخیره نمی‌شود
+FETCH_STAGE = 'fetching'
+
+
+class InvalidTransition(ValueError):
+    pass
+
+
+def _check(from_status, to_status):
+    if to_status not in ALLOWED_TRANSITIONS.get(from_status, ()):
+        raise InvalidTransition(f"Transition {from_status} -> {to_status} is not allowed.")
+
+
+def record_creation(db: Session, article: Article, started_at: datetime = None):
+    """
+    ایجاد یک مقاله جدید را در لاگ ثبت می‌کند (commit بر عهده فراخواننده است).
+    اگر started_at داده شود، زمان شروع دریافت آن مورد از feed هم به عنوان مرحله 'fetching' ثبت می‌شود.
+    """
+    _check(None, article.status)
+    if article.id is None:
+        db.flush()
+    if started_at is not None:
+        db.add(ArticleTransition(article_id=article.id, from_status=None, to_status=FETCH_STAGE, created_at=started_at))
+        db.add(ArticleTransition(article_id=article.id, from_status=FETCH_STAGE, to_status=article.status))
+    else:
+        db.add(ArticleTransition(article_id=article.id, from_status=None, to_status=article.status))
+
+
+def transition(db: Session, article_id: int, from_status: str, to_status: str, commit: bool = True, **values) -> bool:
+    """
+    وضعیت مقاله را به صورت اتمیک با UPDATE ... WHERE id=? AND status=? تغییر می‌دهد.
+    اگر وضعیت فعلی from_status نباشد (مثلا کلیک همزمان دو مدیر) هیچ تغییری نمی‌دهد و False برمی‌گرداند.
+    ستون‌های اضافی در values در همان UPDATE نوشته می‌شوند.
+    """
+    _check(from_status, to_status)
+    values['status'] = to_status
+    updated = (
+        db.query(Article)
+        .filter(Article.id == article_id, Article.status == from_status)
+        .update(values, synchronize_session='fetch')
+    )
+    if updated != 1:
+        return False
+    db.add(ArticleTransition(article_id=article_id, from_status=from_status, to_status=to_status))
+    if commit:
+        db.commit()
+    return True
@@ -0,0 +1,211 @@
+# core/tracing.py
+import os
+import sys
+import json
+import time
+import queue
+import threading
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from .config import settings
+
+logger = logging.getLogger("NewsBot")
+
+# ردیابی سبک و بدون وابستگی: هر مقاله یک trace دارد که شناسه آن از id مقاله ساخته می‌شود،
+# بنابراین هر پردازه‌ای (worker، bot، listener) که id مقاله را بداند می‌تواند به همان trace بپیوندد.
+# زمینه (trace_id, span_id) از طریق هدر Celery و contextvar بین وظایف منتقل می‌شود.
+
+TRACE_HEADER = "trace_context"
+FLUSH_INTERVAL = 1.0
+MAX_BATCH = 500
+
+_current = ContextVar("trace_context", default=None)
+_service_name = os.path.splitext(os.path.basename(sys.argv[0] or "robopost"))[0]
+_queue = None
+_exporter_pid = None
+_exporter_lock = threading.Lock()
+
+
+def tracing_enabled() -> bool:
+    return bool(settings.TRACE_EXPORT_PATH or settings.TRACE_COLLECTOR_URL)
+
+
+def set_service_name(name: str):
+    """نام سرویس (worker/bot/listener) که روی تمام span های این پردازه ثبت می‌شود."""
+    global _service_name
+    _service_name = name
+
+
+def article_trace_id(article_id: int) -> str:
+    return f"{article_id:032x}"
+
+
+def _new_span_id() -> str:
+    return os.urandom(8).hex()
+
+
+def current_context():
+    """(trace_id, span_id) فعال یا None."""
+    return _current.get()
+
+
+def inject_context() -> str:
+    ctx = _current.get()
+    return f"{ctx[0]}:{ctx[1]}" if ctx else None
+
+
+def extract_context(value: str):
+    if not value or ":" not in value:
+        return None
+    trace_id, span_id = value.split(":", 1)
+    return trace_id, span_id
+
+
+@contextmanager
+def span(name: str, trace_id: str = None, parent=None, **attributes):
+    """
+    یک span را اجرا می‌کند. بدون trace_id/parent، span فقط زیر یک trace فعال ثبت می‌شود؛
+    در غیر این صورت (و نیز وقتی ردیابی غیرفعال است) هزینه‌ای جز یک lookup ندارد.
+    """
+    ctx = parent or _current.get()
+    if trace_id and (ctx is None or ctx[0] != trace_id):
+        ctx = (trace_id, None)
+    if ctx is None or not tracing_enabled():
+        yield None
+        return
+    span_id = _new_span_id()
+    token = _current.set((ctx[0], span_id))
+    start = time.time()
+    error = None
+    try:
+        yield attributes
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current.reset(token)
+        export_span(name, ctx[0], span_id, ctx[1], start, time.time(), attributes, error)
+
+
+def start_span(name: str, parent=None, **attributes) -> dict:
+    """نسخه غیر context-manager برای سیگنال‌های Celery؛ با finish_span بسته می‌شود."""
+    ctx = parent or _current.get()
+    if ctx is None or not tracing_enabled():
+        return None
+    span_id = _new_span_id()
+    token = _current.set((ctx[0], span_id))
+    return {
+        "name": name, "trace_id": ctx[0], "span_id": span_id, "parent_id": ctx[1],
+        "start": time.time(), "attributes": attributes, "token": token,
+    }
+
+
+def finish_span(state: dict, error: str = None):
+    if not state:
+        return
+    try:
+        _current.reset(state["token"])
+    except ValueError:
+        # span در context دیگری باز شده است (مثلا سیگنال‌ها در thread متفاوت)
+        _current.set(None)
+    export_span(
+        state["name"], state["trace_id"], state["span_id"], state["parent_id"],
+        state["start"], time.time(), state["attributes"], error,
+    )
+
+
+def record_span(name: str, trace_id: str, start: float, end: float, parent_id: str = None, **attributes):
+    """یک span را که زمان شروع و پایان آن از قبل معلوم است (مثلا مرحله fetch یک مقاله) ثبت می‌کند."""
+    if tracing_enabled():
+        export_span(name, trace_id, _new_span_id(), parent_id, start, end, attributes, None)
+
+
+def export_span(name, trace_id, span_id, parent_id, start, end, attributes, error):
+    record = {
+        "trace_id": trace_id,
+        "span_id": span_id,
+        "parent_id": parent_id,
+        "name": name,
+        "service": _service_name,
+        "pid": os.getpid(),
+        "start": start,
+        "duration_ms": round((end - start) * 1000, 3),
+        "attributes": attributes or {},
+    }
+    if error:
+        record["error"] = error
+    _ensure_exporter().put(record)
+
+
+def _ensure_exporter() -> queue.Queue:
+    """برای هر پردازه (پس از fork) یک صف و یک thread خروجی جداگانه ساخته می‌شود."""
+    global _queue, _exporter_pid
+    pid = os.getpid()
+    if _queue is not None and _exporter_pid == pid:
+        return _queue
+    with _exporter_lock:
+        if _queue is None or _exporter_pid != pid:
+            _queue = queue.Queue()
+            _exporter_pid = pid
+            threading.Thread(target=_export_loop, args=(_queue,), name="trace-exporter", daemon=True).start()
+    return _queue
+
+
+def flush(timeout: float = 5.0):
+    """منتظر می‌ماند تا span های صف شده نوشته شوند (برای پایان پردازه و benchmark)."""
+    if _queue is None or _exporter_pid != os.getpid():
+        return
+    deadline = time.monotonic() + timeout
+    while _queue.unfinished_tasks and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+
+def _export_loop(q: queue.Queue):
+    while True:
+        batch = [q.get()]
+        deadline = time.monotonic() + FLUSH_INTERVAL
+        while len(batch) < MAX_BATCH:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(q.get(timeout=remaining))
+            except queue.Empty:
+                break
+        try:
+            _write_batch(batch)
+        except Exception as e:
+            logger.warning(f"Could not export {len(batch)} span(s): {e}")
+        finally:
+            for _ in batch:
+                q.task_done()
+
+
+def _write_batch(batch: list):
+    if settings.TRACE_EXPORT_PATH:
+        # هر خط یک span؛ نوشتن در حالت append بین پردازه‌ها امن است
+        lines = "".join(json.dumps(record, ensure_ascii=False, default=str) + "\n" for record in batch)
+        with open(settings.TRACE_EXPORT_PATH, "a", encoding="utf-8") as f:
+            f.write(lines)
+    if settings.TRACE_COLLECTOR_URL:
+        import requests
+        requests.post(settings.TRACE_COLLECTOR_URL, json=[_to_zipkin(record) for record in batch], timeout=5)
+
+
+def _to_zipkin(record: dict) -> dict:
+    """تبدیل به قالب Zipkin v2 (قابل دریافت توسط Zipkin و Jaeger)."""
+    span = {
+        "traceId": record["trace_id"],
+        "id": record["span_id"],
+        "name": record["name"],
+        "timestamp": int(record["start"] * 1_000_000),
+        "duration": max(int(record["duration_ms"] * 1000), 1),
+        "localEndpoint": {"serviceName": record["service"]},
+        "tags": {k: str(v) for k, v in record["attributes"].items()},
+    }
+    if record["parent_id"]:
+        span["parentId"] = record["parent_id"]
+    if record.get("error"):
+        span["tags"]["error"] = record["error"]
+    return span
@@ -0,0 +1,254 @@
+# core/translation_memory.py
+import re
+import time
+import hashlib
+import logging
+import threading
+import unicodedata
+from datetime import datetime
+from sqlalchemy.orm import Session
+from .config import settings
+from .db_models import TranslationMemory, GlossaryTerm
+from .redis_client import on_event, publish_event
+
+logger = logging.getLogger("NewsBot")
+
+# حافظه ترجمه و واژه‌نامه اسامی خاص:
+#  - عناوین منتشر شده (تایید نهایی مدیر) همراه با ترجمه‌شان ذخیره می‌شوند. عنوان تکراری (پس از نرمال‌سازی
+#    حروف، علائم و پسوند نام ناشر) یا عنوانی که فقط در اعداد متفاوت است بدون LLM ترجمه می‌شود.
+#  - اصطلاحات واژه‌نامه (ثبت شده با /glossary یا استخراج شده از ترجمه‌های منتشر شده) در پرامپت ترجمه
+#    قرار می‌گیرند تا اسامی همیشه یکسان ترجمه شوند.
+GLOSSARY_EVENT = "glossary"
+
+_PUBLISHER_SUFFIX_RE = re.compile(r"\s+[-–—|]\s+[^-–—|]{1,40}$")
+_NUMBER_RE = re.compile(r"\d+(?:[.,/]\d+)*")
+_PUNCT_RE = re.compile(r"[^\w#]+")
+_ENTITY_RE = re.compile(r"(?<![\w'’])([A-Z][\w'’.-]*(?:\s+(?:of|de|al|bin|[A-Z][\w'’.-]*))*)")
+_DIGITS = {"fa": "۰۱۲۳۴۵۶۷۸۹", "ar": "٠١٢٣٤٥٦٧٨٩"}
+_TO_ASCII = str.maketrans({d: str(i) for digits in _DIGITS.values() for i, d in enumerate(digits)})
+_TARGET_STOPWORDS = set("در و به از که با را این آن برای بر تا یک های ها است شد شده می the of and in to a for on".split())
+MAX_ENTITY_WORDS = 4
+
+_glossary = {}
+_glossary_loaded_at = 0.0
+_glossary_lock = threading.Lock()
+_subscribed = False
+
+
+def template(text: str) -> tuple:
+    """(قالب نرمال‌شده با # به جای اعداد، لیست اعداد با ارقام لاتین)"""
+    text = _PUBLISHER_SUFFIX_RE.sub("", unicodedata.normalize("NFKC", text or "").strip()).lower()
+    numbers = [n.translate(_TO_ASCII) for n in _NUMBER_RE.findall(text)]
+    return _PUNCT_RE.sub(" ", _NUMBER_RE.sub("#", text)).strip(), numbers
+
+
+def _hash(tmpl: str) -> str:
+    return hashlib.sha256(tmpl.encode("utf-8")).hexdigest()
+
+
+def _substitute(target: str, old: list, new: list):
+    """اعداد ترجمه قبلی را با اعداد عنوان جدید جایگزین می‌کند؛ اگر نگاشت مبهم باشد None."""
+    if len(old) != len(new):
+        return None
+    mapping = {}
+    for a, b in zip(old, new):
+        if mapping.setdefault(a, b) != b:
+            return None
+
+    def replace(match):
+        value = match.group(0)
+        ascii_value = value.translate(_TO_ASCII)
+        if ascii_value not in mapping:
+            raise KeyError(ascii_value)
+        replacement = mapping[ascii_value]
+        for digits in _DIGITS.values():
+            if any(ch in digits for ch in value):
+                return replacement.translate(str.maketrans("0123456789", digits))
+        return replacement
+
+    try:
+        result = _NUMBER_RE.sub(replace, target)
+    except KeyError:
+        return None
+    # تمام اعداد عنوان قبلی باید در ترجمه پیدا شده باشند، وگرنه ترجمه قابل اتکا نیست
+    found = {n.translate(_TO_ASCII) for n in _NUMBER_RE.findall(target)}
+    return result if found == set(mapping) else None
+
+
+def lookup(db: Session, text: str, source_language: str, target_language: str) -> tuple:
+    """(ترجمه، نوع تطابق) با نوع 'exact' یا 'near'؛ در صورت نبود (None, 'miss')."""
+    tmpl, numbers = template(text)
+    row = (
+        db.query(TranslationMemory)
+        .filter(
+            TranslationMemory.source_language == (source_language or ''),
+            TranslationMemory.target_language == target_language,
+            TranslationMemory.source_hash == _hash(tmpl),
+        )
+        .first()
+    )
+    if row is None:
+        return None, "miss"
+    old_numbers = template(row.source_text)[1]
+    if old_numbers == numbers:
+        result, kind = row.target_text, "exact"
+    else:
+        result, kind = _substitute(row.target_text, old_numbers, numbers), "near"
+        if result is None:
+            return None, "miss"
+    row.hits = (row.hits or 0) + 1
+    row.last_used_at = datetime.utcnow()
+    db.commit()
+    return result, kind
+
+
+def remember(db: Session, source_language: str, target_language: str, source_text: str, target_text: str):
+    """یک ترجمه تایید شده را ذخیره (یا جایگزین) کرده و اسامی خاص آن را برای واژه‌نامه بررسی می‌کند."""
+    if not source_text or not target_text or source_language == target_language:
+        return
+    source_language = source_language or ''
+    tmpl, _ = template(source_text)
+    key = _hash(tmpl)
+    row = (
+        db.query(TranslationMemory)
+        .filter(
+            TranslationMemory.source_language == source_language,
+            TranslationMemory.target_language == target_language,
+            TranslationMemory.source_hash == key,
+        )
+        .first()
+    )
+    if row is None:
+        row = TranslationMemory(
+            source_language=source_language, target_language=target_language, source_hash=key,
+            source_text=source_text, target_text=target_text, hits=0,
+        )
+        db.add(row)
+    else:
+        row.source_text, row.target_text = source_text, target_text
+    db.commit()
+    if _learn_terms(db, row):
+        publish_event(GLOSSARY_EVENT)
+
+
+def entities(text: str) -> list:
+    """دنباله‌های ۱ تا ۴ کلمه‌ای با حروف بزرگ؛ کلمه اول عنوان به تنهایی (حرف بزرگ آغاز جمله) حساب نمی‌شود."""
+    result = []
+    for match in _ENTITY_RE.finditer(text or ""):
+        phrase = match.group(1).strip(" .-'’")
+        words = phrase.split()
+        if not words or len(words) > MAX_ENTITY_WORDS or (match.start() == 0 and len(words) == 1):
+            continue
+        result.append(phrase)
+    return result
+
+
+def _ngrams(text: str, max_words: int) -> set:
+    words = [w for w in _PUNCT_RE.sub(" ", text).split()]
+    return {
+        " ".join(words[i:i + n])
+        for n in range(1, max_words + 1)
+        for i in range(len(words) - n + 1)
+        if not any(w in _TARGET_STOPWORDS for w in (words[i], words[i + n - 1]))
+    }
+
+
+def _escape_like(text: str) -> str:
+    # «_» در اسم‌ها (\w) در LIKE هر نویسه‌ای را می‌پذیرد و نتایج نامرتبط جای ده نمونه اخیر را می‌گیرند
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _learn_terms(db: Session, row: TranslationMemory) -> bool:
+    """
+    ترجمه یک اسم خاص = طولانی‌ترین عبارتی که در ترجمه تمام عناوین منتشر شده شامل آن اسم مشترک است
+    (حداقل GLOSSARY_MIN_OCCURRENCES عنوان). اصطلاحات ثبت شده توسط مدیر هرگز بازنویسی نمی‌شوند.
+    """
+    known = {
+        term.lower() for (term,) in db.query(GlossaryTerm.term).filter(
+            GlossaryTerm.source_language == row.source_language, GlossaryTerm.target_language == row.target_language,
+        ).all()
+    }
+    added = False
+    for entity in entities(row.source_text):
+        if entity.lower() in known:
+            continue
+        pattern = re.compile(rf"(?<!\w){re.escape(entity)}(?!\w)")
+        others = [
+            target for source, target in
+            db.query(TranslationMemory.source_text, TranslationMemory.target_text)
+            .filter(
+                TranslationMemory.source_language == row.source_language,
+                TranslationMemory.target_language == row.target_language,
+                TranslationMemory.id != row.id,
+                TranslationMemory.source_text.like(f"%{_escape_like(entity)}%", escape="\\"),
+            )
+            .order_by(TranslationMemory.id.desc())
+            .limit(10)
+            .all()
+            if pattern.search(source)
+        ]
+        if len(others) + 1 < settings.GLOSSARY_MIN_OCCURRENCES:
+            continue
+        common = _ngrams(row.target_text, MAX_ENTITY_WORDS + 1)
+        for target in others:
+            common &= _ngrams(target, MAX_ENTITY_WORDS + 1)
+        common = [c for c in common if len(c) >= 3]
+        if not common:
+            continue
+        translation = max(common, key=lambda c: (len(c.split()), len(c)))
+        db.add(GlossaryTerm(
+            source_language=row.source_language, target_language=row.target_language,
+            term=entity, translation=translation, learned=True,
+        ))
+        known.add(entity.lower())
+        added = True
+        logger.info(f"Learned glossary term {entity!r} -> {translation!r}")
+    if added:
+        db.commit()
+    return added
+
+
+def invalidate_glossary(_payload: str = ""):
+    global _glossary_loaded_at
+    _glossary_loaded_at = 0.0
+
+
+def _load_glossary(db: Session) -> dict:
+    global _glossary, _glossary_loaded_at, _subscribed
+    if not _subscribed:
+        on_event(GLOSSARY_EVENT, invalidate_glossary)
+        _subscribed = True
+    if time.monotonic() - _glossary_loaded_at < settings.CONFIG_CACHE_TTL:
+        return _glossary
+    with _glossary_lock:
+        if time.monotonic() - _glossary_loaded_at < settings.CONFIG_CACHE_TTL:
+            return _glossary
+        pairs = {}
+        for term in db.query(GlossaryTerm).all():
+            pairs.setdefault((term.source_language, term.target_language), {})[term.term.lower()] = (term.term, term.translation)
+        compiled = {}
+        for pair, terms in pairs.items():
+            alternation = "|".join(re.escape(t) for t in sorted(terms, key=len, reverse=True))
+            compiled[pair] = (re.compile(rf"(?<!\w)({alternation})(?!\w)", re.IGNORECASE), terms)
+        _glossary, _glossary_loaded_at = compiled, time.monotonic()
+    return _glossary
+
+
+def glossary_hint(db: Session, text: str, source_language: str, target_language: str) -> str:
+    """دستور پرامپت برای اصطلاحات واژه‌نامه که در متن آمده‌اند (رشته خالی اگر هیچ‌کدام نیامده باشد)."""
+    entry = _load_glossary(db).get((source_language or '', target_language))
+    if not entry:
+        return ""
+    pattern, terms = entry
+    found = {}
+    for match in pattern.finditer(text or ""):
+        term, translation = terms[match.group(1).lower()]
+        found[term] = translation
+    if not found:
+        return ""
+    lines = "\n".join(f"- {term} => {translation}" for term, translation in found.items())
+    return f"Always use these fixed translations for names and terms:\n{lines}\n\n"
+
+
+def notify_glossary_changed():
+    publish_event(GLOSSARY_EVENT)
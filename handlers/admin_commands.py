@@ -1,14 +1,22 @@
 # handlers/admin_commands.py
+import re
+import math
 from telegram import Update
 from telegram.ext import ContextTypes
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 
 from core.database import get_db
-from core.db_models import Source, Channel, Article
+from core.db_models import Source, Channel, Article, GlossaryTerm
+from core.config_cache import notify_config_changed
+from core.redis_client import add_stream_request
+from core.pipeline_stats import collect_pipeline_stats
+from core.state_machine import ARTICLE_STATUSES
+from core import profiling
+from core.translation_memory import notify_glossary_changed
+from core import prompts, llm_usage
 from utils import logger, escape_markdown
-import redis
-from core.config import settings
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """دستورات راهنما را برای ادمین ارسال می‌کند."""
@@ -26,7 +34,14 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "/link <source_id> <channel_id>\n"
         "/unlink <source_id> <channel_id>\n\n"
         "*عملیاتی:*\n"
-        "/status | /force_fetch"
+        "/status | /stats [hours] | /force_fetch\n"
+        "/usage [hours] [source|prompt_type|model]\n\n"
+        "*واژه‌نامه ترجمه:*\n"
+        "/glossary [list|add [src:tgt] <term> = <translation>|del <term>]\n"
+        "/prompts [reload]\n\n"
+        "*پروفایل‌گیری:*\n"
+        "/profile [rate|off|reset|clear]\n"
+        "/profile_report [task] [top]"
     )
     await update.message.reply_text(escape_markdown(help_text_raw))
 
@@ -52,6 +67,7 @@ async def add_source(update: Update, context: ContextTypes.DEFAULT_TYPE):
         new_source = Source(name=name, rss_url=rss_url)
         db.add(new_source)
         db.commit()
+        notify_config_changed()
         db.refresh(new_source)
         
         reply_text = f"✅ منبع خبری '{name}' با شناسه `{new_source.id}` اضافه شد."
@@ -93,6 +109,7 @@ async def remove_source(update: Update, context: ContextTypes.DEFAULT_TYPE):
         source_name = source.name
         db.delete(source)
         db.commit()
+        notify_config_changed()
         reply_text = f"🗑️ منبع خبری '{source_name}' با موفقیت حذف شد."
         await update.message.reply_text(escape_markdown(reply_text))
     except Exception as e:
@@ -138,6 +155,7 @@ async def add_channel(update: Update, context: ContextTypes.DEFAULT_TYPE):
         new_channel = Channel(name=name, telegram_channel_id=channel_id_str, target_language_code=lang, admin_group_id=int(admin_id_str))
         db.add(new_channel)
         db.commit()
+        notify_config_changed()
         db.refresh(new_channel)
         
         reply_text = f"✅ کانال '{name}' با شناسه `{new_channel.id}` پیکربندی شد."
@@ -175,6 +193,7 @@ async def remove_channel(update: Update, context: ContextTypes.DEFAULT_TYPE):
         channel_name = channel.name
         db.delete(channel)
         db.commit()
+        notify_config_changed()
         reply_text = f"🗑️ کانال '{channel_name}' با موفقیت حذف شد."
         await update.message.reply_text(escape_markdown(reply_text))
     except Exception as e:
@@ -232,6 +251,7 @@ async def link_source_to_channel(update: Update, context: ContextTypes.DEFAULT_T
         if source not in channel.sources:
             channel.sources.append(source)
             db.commit()
+            notify_config_changed()
             reply_text = f"✅ منبع '{source.name}' با موفقیت به کانال '{channel.name}' متصل شد."
             await update.message.reply_text(escape_markdown(reply_text))
         else:
@@ -267,6 +287,7 @@ async def unlink_source_from_channel(update: Update, context: ContextTypes.DEFAU
         if source in channel.sources:
             channel.sources.remove(source)
             db.commit()
+            notify_config_changed()
             reply_text = f"✅ اتصال منبع '{source.name}' از کانال '{channel.name}' حذف شد."
             await update.message.reply_text(escape_markdown(reply_text))
         else:
@@ -281,33 +302,232 @@ async def unlink_source_from_channel(update: Update, context: ContextTypes.DEFAU
     finally:
         db.close()
 
+# برچسب وضعیت‌ها در /status؛ وضعیت بدون برچسب با نام خودش نمایش داده می‌شود
+STATUS_LABELS = {
+    'new': "جدید",
+    'pending_initial_approval': "در انتظار تایید اولیه",
+    'approved': "در صف پردازش",
+    'pending_publication': "آماده انتشار",
+    'sent_for_publication': "در انتظار تایید نهایی",
+    'publishing': "در حال انتشار",
+    'published': "منتشر شده",
+    'rejected': "رد شده",
+    'discarded': "کنار گذاشته شده",
+    'failed': "پردازش ناموفق",
+    'duplicate': "تکراری",
+    'archived_prefilter': "بایگانی شده توسط پیش‌فیلتر",
+    'archived_unlinked': "بایگانی شده بدون کانال",
+}
+
 async def status(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """وضعیت کلی تعداد مقالات در حالت‌های مختلف را نمایش می‌دهد."""
     db: Session = next(get_db())
     try:
-        statuses = ['new', 'pending_initial_approval', 'approved', 'pending_publication', 'published', 'failed', 'rejected', 'discarded']
-        status_counts = {s: db.query(Article).filter(Article.status == s).count() for s in statuses}
-        
+        status_counts = dict(db.query(Article.status, func.count(Article.id)).group_by(Article.status).all())
+
         message = "📊 *وضعیت فعلی سیستم:*\n\n"
-        message += f"🔹 جدید: *{status_counts['new']}*\n"
-        message += f"🔹 در انتظار تایید اولیه: *{status_counts['pending_initial_approval']}*\n"
-        message += f"🔹 در صف پردازش: *{status_counts['approved']}*\n"
-        message += f"🔹 آماده انتشار: *{status_counts['pending_publication']}*\n"
-        message += f"🔹 منتشر شده: *{status_counts['published']}*\n"
-        message += f"🔹 رد شده: *{status_counts['rejected'] + status_counts['discarded']}*\n"
-        message += f"🔹 پردازش ناموفق: *{status_counts['failed']}*\n"
-        
+        for s in ARTICLE_STATUSES:
+            message += f"🔹 {escape_markdown(STATUS_LABELS.get(s, s))}: *{status_counts.get(s, 0)}*\n"
+
         await update.message.reply_text(message)
     finally:
         db.close()
 
+def _fmt_duration(seconds: float) -> str:
+    if seconds < 60:
+        return f"{seconds:.1f}s"
+    if seconds < 3600:
+        return f"{seconds / 60:.1f}m"
+    return f"{seconds / 3600:.1f}h"
+
+async def stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """صدک‌های تاخیر هر مرحله از pipeline را به صورت کلی و به تفکیک منبع نمایش می‌دهد."""
+    hours = int(context.args[0]) if context.args and context.args[0].isdigit() else 24
+    db: Session = next(get_db())
+    try:
+        result = collect_pipeline_stats(db, hours)
+        if not result["stages"]:
+            await update.message.reply_text(
+                "هنوز داده‌ای برای این بازه ثبت نشده است.",
+                parse_mode=None,
+            )
+            return
+
+        lines = [f"⏱ تاخیر مراحل در {hours} ساعت اخیر (p50 / p95 / p99):", ""]
+        for stage, info in result["stages"].items():
+            lines.append(
+                f"🔹 {stage} (n={info['count']}): "
+                f"{_fmt_duration(info['p50'])} / {_fmt_duration(info['p95'])} / {_fmt_duration(info['p99'])}"
+            )
+            for source_name, src in info["sources"].items():
+                lines.append(f"    • {source_name} (n={src['count']}): {_fmt_duration(src['p50'])} / {_fmt_duration(src['p95'])}")
+        # یک خط برای هر منبع در هر مرحله؛ محدودیت طول پیام تلگرام
+        await update.message.reply_text("\n".join(lines)[:4000], parse_mode=None)
+    finally:
+        db.close()
+
+async def profile(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """نرخ نمونه‌برداری پروفایل‌گیری وظایف را در تمام worker ها تنظیم می‌کند."""
+    arg = context.args[0].lower() if context.args else None
+    if arg is None:
+        # bot خودش پروفایل نمی‌شود؛ نرخی که worker ها از Redis می‌خوانند نمایش داده می‌شود
+        reply = f"نرخ فعلی پروفایل‌گیری worker ها: {profiling.configured_sample_rate()}\nاستفاده: /profile <0..1|off|reset|clear>"
+    elif arg == "clear":
+        removed = profiling.clear_profiles()
+        reply = f"🧹 {removed} فایل پروفایل حذف شد."
+    elif arg == "reset":
+        profiling.set_sample_rate(None)
+        reply = "نرخ پروفایل‌گیری به مقدار تنظیمات (PROFILING_SAMPLE_RATE) برگشت."
+    else:
+        try:
+            rate = 0.0 if arg == "off" else float(arg)
+            if not math.isfinite(rate):
+                raise ValueError(arg)
+        except ValueError:
+            await update.message.reply_text("فرمت اشتباه. استفاده صحیح: /profile <0..1|off|reset|clear>", parse_mode=None)
+            return
+        profiling.set_sample_rate(rate)
+        reply = "⏹ پروفایل‌گیری متوقف شد." if rate <= 0 else f"▶️ پروفایل‌گیری {rate:.0%} از اجرای وظایف فعال شد."
+    logger.info(f"Profiling command '{arg}' by admin {update.effective_user.id}")
+    await update.message.reply_text(reply, parse_mode=None)
+
+async def profile_report(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """پرهزینه‌ترین توابع وظایف پروفایل شده را نمایش می‌دهد."""
+    task = None
+    top = 10
+    for arg in context.args or []:
+        if arg.isdigit():
+            top = int(arg)
+        else:
+            task = arg
+    text = profiling.format_report(profiling.hotspots(task, top))
+    # محدودیت طول پیام تلگرام
+    await update.message.reply_text(text[:4000], parse_mode=None)
+
 async def force_fetch(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """جمع‌آوری فوری اخبار را از طریق Redis Streams اعلام می‌کند."""
     logger.info(f"Manual fetch triggered by admin {update.effective_user.id}")
-    r = redis.Redis.from_url(settings.REDIS_URL)
-    r.xadd("fetch_requests", {"trigger": "manual"})
+    add_stream_request("fetch_requests", {"trigger": "manual"})
     await update.message.reply_text(
         "✅ دستور جمع‌آوری فوری ارسال شد.",
         parse_mode=None,
     )
-    
\ No newline at end of file
+    
+GLOSSARY_USAGE = (
+    "استفاده:\n"
+    "/glossary list [src:tgt]\n"
+    "/glossary add [src:tgt] <term> = <translation>\n"
+    "/glossary del [src:tgt] <term>\n"
+    "جفت زبان پیش‌فرض en:fa است."
+)
+
+def _glossary_pair(args: list) -> tuple:
+    """جفت زبان اختیاری «src:tgt» در ابتدای آرگومان‌ها."""
+    if args and re.fullmatch(r"[a-z]{2}:[a-z]{2}", args[0].lower()):
+        source, target = args[0].lower().split(":")
+        return source, target, args[1:]
+    return "en", "fa", args
+
+async def glossary(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """مدیریت ترجمه ثابت اسامی خاص که در پرامپت‌های ترجمه قرار می‌گیرند."""
+    args = list(context.args or [])
+    action = args.pop(0).lower() if args else "list"
+    source, target, args = _glossary_pair(args)
+    db: Session = next(get_db())
+    try:
+        pair = (GlossaryTerm.source_language == source, GlossaryTerm.target_language == target)
+        if action == "list":
+            terms = db.query(GlossaryTerm).filter(*pair).order_by(GlossaryTerm.term).all()
+            if not terms:
+                reply = f"واژه‌نامه {source}:{target} خالی است."
+            else:
+                lines = [f"📖 واژه‌نامه {source}:{target} ({len(terms)} اصطلاح):"]
+                lines += [f"{'🤖' if t.learned else '✍️'} {t.term} => {t.translation}" for t in terms]
+                reply = "\n".join(lines)
+        elif action == "add" and "=" in " ".join(args):
+            term, translation = (part.strip() for part in " ".join(args).split("=", 1))
+            if not term or not translation:
+                await update.message.reply_text(GLOSSARY_USAGE, parse_mode=None)
+                return
+            row = db.query(GlossaryTerm).filter(*pair, GlossaryTerm.term == term).first()
+            if row is None:
+                db.add(GlossaryTerm(source_language=source, target_language=target, term=term, translation=translation))
+            else:
+                # اصطلاح ثبت شده توسط مدیر جایگزین اصطلاح یادگرفته شده می‌شود و دیگر بازنویسی نمی‌شود
+                row.translation, row.learned = translation, False
+            db.commit()
+            notify_glossary_changed()
+            reply = f"✅ {term} => {translation} ({source}:{target}) ثبت شد."
+        elif action == "del" and args:
+            term = " ".join(args)
+            deleted = db.query(GlossaryTerm).filter(*pair, GlossaryTerm.term == term).delete(synchronize_session=False)
+            db.commit()
+            if deleted:
+                notify_glossary_changed()
+            reply = f"🗑️ '{term}' حذف شد." if deleted else "این اصطلاح در واژه‌نامه یافت نشد."
+        else:
+            reply = GLOSSARY_USAGE
+        logger.info(f"Glossary command '{action}' by admin {update.effective_user.id}")
+        await update.message.reply_text(reply[:4000], parse_mode=None)
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Glossary command failed: {e}")
+        await update.message.reply_text("خطایی در به‌روزرسانی واژه‌نامه رخ داد.", parse_mode=None)
+    finally:
+        db.close()
+
+async def prompts_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """نسخه پرامپت‌ها را نمایش می‌دهد؛ با reload تمام پردازه‌ها فایل‌های پرامپت را فورا دوباره می‌خوانند."""
+    arg = context.args[0].lower() if context.args else None
+    if arg not in (None, "reload"):
+        await update.message.reply_text("فرمت اشتباه. استفاده صحیح: /prompts [reload]", parse_mode=None)
+        return
+    lines = []
+    if arg == "reload":
+        changed = prompts.reload(force=True)
+        prompts.notify_prompts_changed()
+        logger.info(f"Prompt reload requested by admin {update.effective_user.id}")
+        lines.append("🔄 پرامپت‌ها در تمام worker ها دوباره بارگذاری می‌شوند." + ("" if changed else " (تغییری در این پردازه دیده نشد)"))
+    lines.append(f"📝 نسخه پرامپت‌ها: {prompts.version()}")
+    lines += [f"• {name}: {version}" for name, version in prompts.versions().items()]
+    await update.message.reply_text("\n".join(lines), parse_mode=None)
+
+def _fmt_usage(bucket: dict) -> str:
+    tokens = f"{bucket['input_tokens']:,}/{bucket['output_tokens']:,} tok"
+    price = f"${bucket['cost']:.3f}" + ("" if bucket["priced"] else "+?")
+    avg = bucket["latency_ms"] / bucket["calls"] / 1000 if bucket["calls"] else 0
+    failures = f", {bucket['failures']} خطا" if bucket["failures"] else ""
+    return f"{bucket['calls']} فراخوانی{failures}, {tokens}, {price}, {avg:.1f}s"
+
+async def usage(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """مصرف token و هزینه LLM را به تفکیک منبع، نوع پرامپت و مدل نمایش می‌دهد."""
+    hours, groupings = 24, list(llm_usage.GROUPINGS)
+    for arg in context.args or []:
+        if arg.isdigit():
+            hours = int(arg)
+        elif arg in llm_usage.GROUPINGS:
+            groupings = [arg]
+        else:
+            await update.message.reply_text("فرمت اشتباه. استفاده صحیح: /usage [hours] [source|prompt_type|model]", parse_mode=None)
+            return
+    db: Session = next(get_db())
+    try:
+        report = llm_usage.usage_report(db, hours)
+        if not report["total"]["calls"]:
+            await update.message.reply_text("در این بازه فراخوانی LLM ثبت نشده است.", parse_mode=None)
+            return
+        lines = [f"💰 مصرف LLM در {hours} ساعت اخیر: {_fmt_usage(report['total'])}"]
+        for grouping in groupings:
+            lines += ["", f"🔹 به تفکیک {grouping}:"]
+            # پرهزینه‌ترین موارد اول؛ برای منابع هزینه هر خبر منتشر شده هم نمایش داده می‌شود
+            items = sorted(report[grouping].items(), key=lambda kv: (kv[1]["cost"], kv[1]["input_tokens"]), reverse=True)
+            for name, bucket in items:
+                line = f"• {name}: {_fmt_usage(bucket)}"
+                if grouping == "source":
+                    published = bucket["published"]
+                    per_post = f"${bucket['cost'] / published:.3f}" if published else "-"
+                    line += f" | {published} منتشر شده, {per_post} برای هر انتشار"
+                lines.append(line)
+        await update.message.reply_text("\n".join(lines)[:4000], parse_mode=None)
+    finally:
+        db.close()
@@ -5,8 +5,12 @@ from telegram.error import TelegramError
 from sqlalchemy.orm import Session
 from utils import escape_markdown, logger
 from core.database import get_db
-from core.db_models import Article, Channel
-from tasks import process_article_task, publish_article_task
+from core.db_models import Article
+from core.config_cache import get_config
+from core.state_machine import transition
+from core.tracing import span, article_trace_id
+from core import prefilter, publications
+from celery_app import task_signature
 
 async def edit_message_safely(query, new_text: str, **kwargs):
     try:
@@ -31,22 +35,30 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
             )
             return
 
-        if action == 'approve':
-            await handle_approve(query, article, db)
-        elif action == 'reject':
-            await handle_reject(query, article, db)
-        elif action == 'publish':
-            channel_id_to_publish = int(data_parts[2])
-            await handle_publish(query, article, channel_id_to_publish, context, db)
-        elif action == 'discard':
-            await handle_discard(query, article, db)
+        # کلیک مدیر به trace همان مقاله می‌پیوندد و وظایف ارسالی زیر این span قرار می‌گیرند
+        with span(f"bot.callback.{action}", trace_id=article_trace_id(article_id), user_id=query.from_user.id):
+            if action == 'approve':
+                await handle_approve(query, article, db)
+            elif action == 'reject':
+                await handle_reject(query, article, db)
+            elif action == 'publish':
+                channel_id_to_publish = int(data_parts[2])
+                await handle_publish(query, article, channel_id_to_publish, context, db)
+            elif action == 'discard':
+                await handle_discard(query, article, db)
     except Exception as e:
         logger.error(f"Error in button_callback for article {article.id}: {e}", exc_info=True)
     finally:
         db.close()
 
 async def handle_approve(query, article, db):
-    if article.status != 'pending_initial_approval':
+    # ذخیره اطلاعات پیام برای ویرایش در مرحله بعد، همراه با تغییر اتمیک وضعیت
+    approved = transition(
+        db, article.id, 'pending_initial_approval', 'approved',
+        admin_chat_id=query.message.chat_id,
+        admin_message_id=query.message.message_id,
+    )
+    if not approved:
         await edit_message_safely(
             query,
             "این مورد قبلا پردازش شده است.",
@@ -55,12 +67,8 @@ async def handle_approve(query, article, db):
         );
         return
     
-    # ذخیره اطلاعات پیام برای ویرایش در مرحله بعد
-    article.admin_chat_id = query.message.chat_id
-    article.admin_message_id = query.message.message_id
-    article.status = 'approved'; db.commit()
-    
-    process_article_task.delay(article.id)
+    task_signature("process_article_task", article.id).delay()
+    prefilter.learn(article.original_title, article.source_name, approved=True)
     
     await edit_message_safely(
         query,
@@ -72,7 +80,8 @@ async def handle_approve(query, article, db):
 
 async def handle_reject(query, article, db):
     """مقاله را رد کرده و پیام آن را از چت مدیر حذف می‌کند."""
-    if article.status != 'pending_initial_approval':
+    # ۱. وضعیت مقاله در دیتابیس به صورت اتمیک به 'rejected' تغییر می‌کند
+    if not transition(db, article.id, 'pending_initial_approval', 'rejected'):
         await edit_message_safely(
             query,
             "این مورد قبلا پردازش شده است.",
@@ -80,10 +89,7 @@ async def handle_reject(query, article, db):
             parse_mode=None,
         )
         return
-
-    # ۱. وضعیت مقاله در دیتابیس به 'rejected' تغییر می‌کند
-    article.status = 'rejected'
-    db.commit()
+    prefilter.learn(article.original_title, article.source_name, approved=False)
 
     # ۲. پیام مربوط به مقاله از چت حذف می‌شود
     try:
@@ -94,7 +100,8 @@ async def handle_reject(query, article, db):
         logger.warning(f"Could not delete message for rejected article {article.id}: {e}")
 
 async def handle_publish(query, article, channel_id, context, db):
-    if article.status != 'sent_for_publication':
+    # پس از انتشار در اولین کانال مقاله در وضعیت publishing می‌ماند تا کانال‌های باقی‌مانده هم منتشر شوند
+    if article.status not in ('sent_for_publication', 'publishing'):
         await edit_message_safely(
             query,
             "این مورد قبلا منتشر یا لغو شده است.",
@@ -103,7 +110,7 @@ async def handle_publish(query, article, channel_id, context, db):
         );
         return
 
-    channel = db.query(Channel).filter(Channel.id == channel_id).first()
+    channel = get_config().get_channel(channel_id)
     if not channel:
         await edit_message_safely(
             query,
@@ -113,11 +120,13 @@ async def handle_publish(query, article, channel_id, context, db):
         return
     
     try:
-        publish_article_task.delay(article.id, channel.id)
+        task_signature("publish_article_task", article.id, channel.id).delay()
+        # دکمه کانال‌های دیگر باقی می‌ماند تا مدیر بتواند در آن‌ها هم منتشر کند
+        remaining = [c for c in publications.pending_channels(db, article) if c.id != channel.id]
         await edit_message_safely(
             query,
-            "⏳ خبر برای انتشار در صف قرار گرفت.",
-            reply_markup=None,
+            f"⏳ خبر برای انتشار در {channel.name} در صف قرار گرفت.",
+            reply_markup=publications.publish_keyboard(article.id, remaining) if remaining else None,
             parse_mode=None,
         )
         logger.info(
@@ -131,7 +140,20 @@ async def handle_publish(query, article, channel_id, context, db):
         logger.error(f"Failed to queue article {article.id} for channel {channel.name}: {e}")
 
 async def handle_discard(query, article, db):
-    if article.status != 'sent_for_publication':
+    if transition(db, article.id, 'sent_for_publication', 'discarded'):
+        reply = "🗑️ انتشار برای این کانال لغو شد."
+    elif article.status == 'publishing' and publications.PUBLISHED in publications.channel_states(db, article.id).values():
+        # مقاله در بخشی از کانال‌ها منتشر شده؛ انتشار در بقیه کانال‌ها لغو و مقاله published می‌شود
+        if not transition(db, article.id, 'publishing', 'published'):
+            await edit_message_safely(
+                query,
+                "این مورد قبلا پردازش شده است.",
+                reply_markup=None,
+                parse_mode=None,
+            )
+            return
+        reply = "🗑️ انتشار در کانال‌های باقی‌مانده لغو شد."
+    else:
         await edit_message_safely(
             query,
             "این مورد قبلا پردازش شده است.",
@@ -140,12 +162,10 @@ async def handle_discard(query, article, db):
         );
         return
     
-    article.status = 'discarded'; db.commit()
     await edit_message_safely(
         query,
-        "🗑️ انتشار برای این کانال لغو شد.",
+        reply,
         reply_markup=None,
         parse_mode=None,
     )
     logger.info(f"Publication of article {article.id} discarded by {query.from_user.id}.")
-    
\ No newline at end of file
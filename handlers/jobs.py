@@ -5,20 +5,58 @@ from datetime import datetime, timedelta
 from utils import logger
 from core.database import get_db
 from core.db_models import Article
-from tasks import translate_title_task, score_title_task
+from core.config import settings
+from core.redis_client import claim_dispatch, release_dispatch
+from core.tracing import span, article_trace_id
+from core import dedup, llm_usage
+from celery_app import task_signature
+
+def _dispatch_once(task_name: str, article_id: int) -> bool:
+    """وظیفه را فقط در صورت claim موفق ارسال می‌کند؛ اگر ارسال به broker شکست بخورد claim آزاد می‌شود."""
+    if not claim_dispatch(task_name, article_id):
+        return False
+    try:
+        task_signature(task_name, article_id).delay()
+    except Exception:
+        # بدون آزاد کردن، مقاله تا پایان DISPATCH_DEDUP_TTL دوباره ارسال نمی‌شد
+        release_dispatch(task_name, article_id)
+        raise
+    return True
 
 def dispatch_preprocess_tasks():
-    """Dispatch translation and scoring tasks for new articles."""
+    """
+    Dispatch translation and scoring tasks for new articles.
+    handler stream preprocess_requests است؛ خطا دوباره raise می‌شود تا درخواست ack نشود و دوباره claim یا dead-letter شود.
+    مقالات با صفحه‌بندی keyset پیمایش می‌شوند و هر (وظیفه، مقاله) فقط یک بار در بازه DISPATCH_DEDUP_TTL ارسال می‌شود،
+    پس وظایفی که از chord مرحله fetch در صف هستند دوباره ارسال نمی‌شوند.
+    """
     db: Session = next(get_db())
+    dispatched = 0
     try:
-        articles = db.query(Article).filter(Article.status == 'new').all()
-        for article in articles:
-            if article.translated_title is None:
-                translate_title_task.delay(article.id)
-            if article.news_value_score is None:
-                score_title_task.delay(article.id)
+        last_id = 0
+        while True:
+            rows = (
+                db.query(Article.id, Article.translated_title, Article.news_value_score)
+                .filter(Article.status == 'new', Article.id > last_id)
+                .order_by(Article.id)
+                .limit(settings.PREPROCESS_SCAN_BATCH)
+                .all()
+            )
+            if not rows:
+                break
+            for article_id, translated_title, news_value_score in rows:
+                with span("article.redispatch_preprocess", trace_id=article_trace_id(article_id)):
+                    if translated_title is None and _dispatch_once("translate_title_task", article_id):
+                        dispatched += 1
+                    if news_value_score is None and _dispatch_once("score_title_task", article_id):
+                        dispatched += 1
+            last_id = rows[-1][0]
+        if dispatched:
+            logger.info(f"Dispatched {dispatched} preprocess task(s).")
     except Exception as e:
         logger.error(f"Failed to dispatch preprocess tasks: {e}")
+        # stream listener پیام را فقط پس از بازگشت موفق ack می‌کند؛ خطا باید بالا برود تا پیام معلق بماند
+        raise
     finally:
         db.close()
 
@@ -30,15 +68,36 @@ async def cleanup_db_job(context: ContextTypes.DEFAULT_TYPE):
     db: Session = next(get_db())
     try:
         now = datetime.utcnow()
-        deleted_rejected = db.query(Article).filter(Article.status.in_(['rejected', 'discarded', 'failed']), Article.created_at < now - timedelta(days=2)).delete(synchronize_session=False)
-        deleted_new = db.query(Article).filter(Article.status.in_(['new','pending_initial_approval']), Article.created_at < now - timedelta(days=1)).delete(synchronize_session=False)
-        deleted_published = db.query(Article).filter(Article.status == 'published', Article.created_at < now - timedelta(days=7)).delete(synchronize_session=False)
+        queries = [
+            db.query(Article).filter(Article.status.in_(['rejected', 'discarded', 'failed', 'duplicate', 'archived_prefilter']), Article.created_at < now - timedelta(days=2)),
+            db.query(Article).filter(Article.status.in_(['new','pending_initial_approval']), Article.created_at < now - timedelta(days=1)),
+            db.query(Article).filter(Article.status == 'published', Article.created_at < now - timedelta(days=7)),
+        ]
+        # مقالاتی که هنوز در پنجره تشخیص تکراری هستند از ایندکس dedup هم حذف می‌شوند
+        window_start = now - timedelta(hours=settings.DEDUP_WINDOW_HOURS)
+        indexed = [
+            article_id
+            for query in queries
+            for article_id, in query.filter(Article.created_at >= window_start).with_entities(Article.id)
+        ]
+        total_deleted = sum(query.delete(synchronize_session=False) or 0 for query in queries)
         db.commit()
-        total_deleted = (deleted_rejected or 0) + (deleted_new or 0) + (deleted_published or 0)
+        dedup.forget(indexed)
         if total_deleted > 0:
             logger.info(f"Successfully deleted {total_deleted} old articles.")
     except Exception as e:
         db.rollback(); logger.error(f"Failed to cleanup old articles: {e}")
     finally:
         db.close()
-        
\ No newline at end of file
+        
+async def rollup_llm_usage_job(context: ContextTypes.DEFAULT_TYPE):
+    """ردیف‌های خام قدیمی مصرف LLM را در جدول روزانه تجمیع می‌کند."""
+    db: Session = next(get_db())
+    try:
+        rolled = llm_usage.rollup(db)
+        if rolled:
+            logger.info(f"Rolled up {rolled} LLM usage row(s) into daily totals.")
+    except Exception as e:
+        db.rollback(); logger.error(f"Failed to roll up LLM usage: {e}")
+    finally:
+        db.close()
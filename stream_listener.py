@@ -1,55 +1,291 @@
 import os
-import redis
-from tasks import run_all_fetchers_task
+import json
+import time
+import signal
+import asyncio
+from dataclasses import dataclass
+import redis.asyncio as aioredis
+from redis.exceptions import ResponseError
+from celery_app import task_signature
 from handlers.jobs import dispatch_preprocess_tasks
 from utils import logger
 from core.config import settings
+from core.metrics import CELERY_QUEUE_DEPTH, STREAM_LAG, STREAM_PENDING, metrics_http_route
 
-STREAMS = ["fetch_requests", "preprocess_requests"]
 GROUP_NAME = "listener_group"
 CONSUMER_NAME = os.getenv("HOSTNAME", "listener")
+DEAD_LETTER_SUFFIX = ":dead"
+# مصرف‌کننده‌هایی که این مدت بیکار بوده و پیام معلقی ندارند (مثلا replica های قدیمی) حذف می‌شوند
+STALE_CONSUMER_IDLE_MS = 24 * 3600 * 1000
+READ_BLOCK_MS = 5000
+# صف‌های Celery که عمق آن‌ها در /metrics گزارش می‌شود
+CELERY_QUEUES = ["celery", "extraction"]
 
 
-def create_groups(r: redis.Redis):
-    for stream in STREAMS:
+@dataclass
+class StreamHandler:
+    stream: str
+    handler: object
+    concurrency: int = 1
+    coalesce: bool = True
+
+
+# stream ها و handler آن‌ها؛ برای افزودن یک stream جدید فقط register_stream فراخوانی می‌شود
+HANDLERS = {}
+
+
+def register_stream(stream: str, handler, concurrency: int = 1, coalesce: bool = True):
+    """
+    یک handler همگام (sync) برای یک stream ثبت می‌کند. handler لیست پیام‌های یک دسته را می‌گیرد
+    و در یک thread جداگانه اجرا می‌شود تا حلقه رویداد و stream های دیگر را مسدود نکند.
+    """
+    HANDLERS[stream] = StreamHandler(stream, handler, concurrency, coalesce)
+
+
+register_stream("fetch_requests", lambda entries: task_signature("run_all_fetchers_task").delay())
+register_stream("preprocess_requests", lambda entries: dispatch_preprocess_tasks())
+
+
+def _decode(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+
+class StreamListener:
+    """برای هر stream یک coroutine مصرف‌کننده با همزمانی محدود اجرا می‌کند."""
+
+    def __init__(self, r: aioredis.Redis, handlers: dict = None):
+        self.r = r
+        self.handlers = handlers if handlers is not None else HANDLERS
+        self.stopping = asyncio.Event()
+        self.semaphores = {name: asyncio.Semaphore(h.concurrency) for name, h in self.handlers.items()}
+        self.in_flight = set()
+        self.heartbeats = {}
+        self.health = {}
+
+    async def create_groups(self):
+        for stream in self.handlers:
+            try:
+                await self.r.xgroup_create(stream, GROUP_NAME, id="0", mkstream=True)
+            except ResponseError as e:
+                if "BUSYGROUP" in str(e):
+                    continue
+                raise
+
+    async def handle_stream_batch(self, stream_name: str, entries):
+        """
+        تمام پیام‌های یک دسته از یک stream را به یک dispatch تبدیل می‌کند.
+        پیام‌های تکراری در پنجره STREAM_COALESCE_WINDOW_MS (بین تمام replica ها) نادیده گرفته می‌شوند.
+        """
+        spec = self.handlers[stream_name]
+        window_key = f"coalesce:{stream_name}"
+        if spec.coalesce and not await self.r.set(window_key, 1, nx=True, px=settings.STREAM_COALESCE_WINDOW_MS):
+            logger.info(f"Coalesced {len(entries)} {stream_name} message(s) into a recent trigger.")
+            return
         try:
-            r.xgroup_create(stream, GROUP_NAME, id="0", mkstream=True)
-        except redis.exceptions.ResponseError as e:
-            if "BUSYGROUP" in str(e):
-                continue
+            await asyncio.to_thread(spec.handler, entries)
+        except Exception:
+            # تلاش مجدد همین پیام‌ها نباید به عنوان تکراری ادغام شود
+            if spec.coalesce:
+                await self.r.delete(window_key)
             raise
+        logger.info(f"Dispatched {stream_name} for {len(entries)} message(s).")
 
+    async def process_entries(self, stream_name: str, entries):
+        """یک دسته را پردازش و در صورت موفقیت ack می‌کند؛ در صورت خطا پیام‌ها معلق می‌مانند تا دوباره claim شوند."""
+        if not entries:
+            return
+        msg_ids = [msg_id for msg_id, _ in entries]
+        async with self.semaphores[stream_name]:
+            try:
+                await self.handle_stream_batch(stream_name, entries)
+                await self.r.xack(stream_name, GROUP_NAME, *msg_ids)
+            except Exception as exc:
+                logger.error(f"Failed processing {len(msg_ids)} message(s) from {stream_name}: {exc}", exc_info=True)
 
-def main():
-    logger.info("Starting Redis Stream listener...")
-    r = redis.Redis.from_url(settings.REDIS_URL)
-    create_groups(r)
+    def _spawn(self, stream_name: str, entries):
+        task = asyncio.create_task(self.process_entries(stream_name, entries))
+        self.in_flight.add(task)
+        task.add_done_callback(self.in_flight.discard)
+
+    async def consume(self, stream_name: str):
+        """حلقه مصرف یک stream؛ یک handler کند فقط stream خودش را کند می‌کند."""
+        semaphore = self.semaphores[stream_name]
+        while not self.stopping.is_set():
+            self.heartbeats[stream_name] = time.monotonic()
+            try:
+                # تا زمانی که ظرفیت آزاد نباشد پیام جدیدی خوانده نمی‌شود تا پیام‌ها بی‌دلیل معلق نمانند
+                if semaphore.locked():
+                    await asyncio.sleep(0.1)
+                    continue
+                msgs = await self.r.xreadgroup(
+                    GROUP_NAME,
+                    CONSUMER_NAME,
+                    streams={stream_name: ">"},
+                    count=settings.STREAM_BATCH_SIZE,
+                    block=READ_BLOCK_MS,
+                )
+                for _stream, entries in msgs or []:
+                    self._spawn(stream_name, entries)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.error(f"Stream listener error on {stream_name}: {exc}", exc_info=True)
+                await asyncio.sleep(1)
+
+    async def dead_letter(self, stream_name: str, msg_id, data: dict, deliveries: int):
+        """پیامی که بیش از حد مجاز تحویل شده را به stream مرده منتقل و ack می‌کند."""
+        fields = dict(data or {})
+        fields.update({"origin_id": msg_id, "deliveries": deliveries})
+        await self.r.xadd(stream_name + DEAD_LETTER_SUFFIX, fields, maxlen=settings.STREAM_MAXLEN, approximate=True)
+        await self.r.xack(stream_name, GROUP_NAME, msg_id)
+        logger.error(f"Moved {stream_name} message {msg_id} to dead-letter after {deliveries} deliveries.")
 
-    while True:
+    async def reclaim_pending(self, stream_name: str):
+        """پیام‌هایی که مصرف‌کننده‌ای (مثلا یک replica مرده) بیش از حد معلق نگه داشته را claim و دوباره پردازش می‌کند."""
+        _, claimed, _deleted = await self.r.xautoclaim(
+            stream_name,
+            GROUP_NAME,
+            CONSUMER_NAME,
+            min_idle_time=settings.STREAM_PENDING_IDLE_MS,
+            start_id="0-0",
+            count=settings.STREAM_BATCH_SIZE,
+        )
+        claimed = [(msg_id, data) for msg_id, data in claimed if data is not None]
+        if not claimed:
+            return
+        retry = []
+        for msg_id, data in claimed:
+            # تعداد تحویل دقیقا برای همین پیام خوانده می‌شود؛ پیمایش بازه‌ای همه پیام‌های معلق را پوشش نمی‌دهد
+            pending = await self.r.xpending_range(stream_name, GROUP_NAME, min=msg_id, max=msg_id, count=1)
+            count = pending[0]["times_delivered"] if pending else 1
+            if count > settings.STREAM_MAX_DELIVERIES:
+                await self.dead_letter(stream_name, msg_id, data, count)
+            else:
+                retry.append((msg_id, data))
+        if retry:
+            logger.warning(f"Reclaimed {len(retry)} pending message(s) from {stream_name}.")
+            self._spawn(stream_name, retry)
+
+    async def collect_stream_health(self) -> dict:
+        """lag و پیام‌های معلق هر گروه و هر مصرف‌کننده را جمع‌آوری می‌کند."""
+        health = {}
+        for stream_name in self.handlers:
+            groups = await self.r.xinfo_groups(stream_name)
+            group = next((g for g in groups if _decode(g["name"]) == GROUP_NAME), None)
+            consumers = await self.r.xinfo_consumers(stream_name, GROUP_NAME)
+            health[stream_name] = {
+                "length": await self.r.xlen(stream_name),
+                "lag": group.get("lag") if group else None,
+                "pending": group.get("pending") if group else None,
+                "consumers": {
+                    _decode(c["name"]): {"pending": c["pending"], "idle_ms": c["idle"]} for c in consumers
+                },
+            }
+        return health
+
+    async def run_maintenance(self):
+        """بازیابی پیام‌های معلق، حذف مصرف‌کننده‌های کهنه، محدودسازی طول stream ها و گزارش lag."""
+        for stream_name in self.handlers:
+            try:
+                await self.reclaim_pending(stream_name)
+                await self.r.xtrim(stream_name, maxlen=settings.STREAM_MAXLEN, approximate=True)
+                for consumer in await self.r.xinfo_consumers(stream_name, GROUP_NAME):
+                    name = _decode(consumer["name"])
+                    if name != CONSUMER_NAME and consumer["pending"] == 0 and consumer["idle"] > STALE_CONSUMER_IDLE_MS:
+                        await self.r.xgroup_delconsumer(stream_name, GROUP_NAME, name)
+                        logger.info(f"Removed stale consumer {name} from {stream_name}.")
+            except Exception as exc:
+                logger.error(f"Maintenance failed for {stream_name}: {exc}", exc_info=True)
         try:
-            msgs = r.xreadgroup(
-                GROUP_NAME,
-                CONSUMER_NAME,
-                streams={stream: ">" for stream in STREAMS},
-                count=1,
-                block=5000,
-            )
-            for stream, entries in msgs:
-                stream_name = stream.decode() if isinstance(stream, bytes) else stream
-                for msg_id, data in entries:
-                    try:
-                        if stream_name == "fetch_requests":
-                            run_all_fetchers_task.delay()
-                        elif stream_name == "preprocess_requests":
-                            dispatch_preprocess_tasks()
-                        r.xack(stream_name, GROUP_NAME, msg_id)
-                        logger.info(f"Processed {stream_name} message {msg_id}")
-                    except Exception as exc:
-                        logger.error(f"Failed processing {msg_id} from {stream_name}: {exc}", exc_info=True)
+            self.health = await self.collect_stream_health()
+            for queue in CELERY_QUEUES:
+                CELERY_QUEUE_DEPTH.labels(queue).set(await self.r.llen(queue))
+            for stream_name, info in self.health.items():
+                STREAM_LAG.labels(stream_name).set(info["lag"] or 0)
+                for consumer, c in info["consumers"].items():
+                    STREAM_PENDING.labels(stream_name, consumer).set(c["pending"])
+                per_consumer = ", ".join(f"{n}={c['pending']}" for n, c in info["consumers"].items())
+                logger.info(
+                    f"Stream {stream_name}: length={info['length']} lag={info['lag']} "
+                    f"pending={info['pending']} consumers[{per_consumer}]"
+                )
         except Exception as exc:
-            logger.error(f"Stream listener error: {exc}", exc_info=True)
+            logger.error(f"Could not collect stream health: {exc}", exc_info=True)
+
+    async def maintenance_loop(self):
+        while not self.stopping.is_set():
+            await self.run_maintenance()
+            try:
+                await asyncio.wait_for(self.stopping.wait(), timeout=settings.STREAM_MAINTENANCE_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    def is_healthy(self) -> bool:
+        # هر حلقه مصرف باید حداقل یک بار در دو برابر زمان block شده زنده بوده باشد
+        limit = 2 * READ_BLOCK_MS / 1000 + 1
+        now = time.monotonic()
+        return all(now - self.heartbeats.get(stream, 0) < limit for stream in self.handlers)
+
+    async def handle_health_request(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """پاسخ HTTP ساده برای GET /health (برای healthcheck داکر) و GET /metrics (Prometheus)."""
+        try:
+            request_line = (await reader.readline()).decode(errors="ignore").split()
+            path = request_line[1] if len(request_line) > 1 else "/"
+            if path.startswith("/metrics"):
+                _, content_type, body = metrics_http_route({})
+                status = "200 OK"
+            else:
+                healthy = self.is_healthy() and not self.stopping.is_set()
+                body = json.dumps(
+                    {"status": "ok" if healthy else "unhealthy", "consumer": CONSUMER_NAME, "streams": self.health},
+                    default=str,
+                ).encode()
+                content_type = "application/json"
+                status = "200 OK" if healthy else "503 Service Unavailable"
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\nContent-Length: {len(body)}\r\n"
+                f"Connection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def run(self):
+        await self.create_groups()
+        server = await asyncio.start_server(self.handle_health_request, "0.0.0.0", settings.LISTENER_HEALTH_PORT)
+        loops = [asyncio.create_task(self.consume(stream)) for stream in self.handlers]
+        loops.append(asyncio.create_task(self.maintenance_loop()))
+        try:
+            await self.stopping.wait()
+        finally:
+            logger.info("Shutting down stream listener...")
+            server.close()
+            for task in loops:
+                task.cancel()
+            await asyncio.gather(*loops, return_exceptions=True)
+            # handler های در حال اجرا تمام می‌شوند تا پیام‌ها ack شوند؛ بقیه معلق می‌مانند و بعدا claim می‌شوند
+            if self.in_flight:
+                await asyncio.wait(self.in_flight, timeout=settings.LISTENER_SHUTDOWN_TIMEOUT)
+            await server.wait_closed()
+
+
+async def main_async():
+    logger.info("Starting Redis Stream listener...")
+    r = aioredis.Redis.from_url(settings.REDIS_URL)
+    listener = StreamListener(r)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, listener.stopping.set)
+    try:
+        await listener.run()
+    finally:
+        await r.aclose()
+
+
+def main():
+    asyncio.run(main_async())
 
 
 if __name__ == "__main__":
     main()
-    
\ No newline at end of file
+
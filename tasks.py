@@ -1,10 +1,12 @@
 # tasks.py
-import feedparser
-import requests
+# feedparser، newspaper و requests فقط داخل وظایفی که از آن‌ها استفاده می‌کنند import می‌شوند
+# تا بارگذاری این ماژول (و پردازه‌هایی که آن را import می‌کنند) سبک بماند.
 import time
-from newspaper import Article as NewspaperArticle
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from celery.utils.log import get_task_logger
-from celery import chord
+from celery import chain, chord
 import asyncio
 from sqlalchemy.orm import Session
 from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup
@@ -12,44 +14,290 @@ from telegram.constants import ParseMode
 from utils import escape_markdown, escape_markdown_url
 from celery_app import celery_app
 from core.database import SessionLocal
-from core.db_models import Source, Article, Channel
-from core.config import settings    
+from core.db_models import Article, ArticleTranslation
+from core.config import settings
+from core.config_cache import get_config
+from core.redis_client import acquire_lock, release_lock, extend_lock, claim_dispatch, release_dispatch, add_stream_request
+from core.state_machine import transition, record_creation
+from core.metrics import (
+    observe_llm_call, observe_llm_first_token, observe_llm_routing, observe_feed_fetch, observe_prefilter, observe_translation_memory,
+    track_telegram,
+)
+from core.tracing import span, record_span, article_trace_id
+from core.retry import retry_task, is_permanent
+from core import dedup, prefilter, translation_memory, llm_router, llm_usage, prompts, publications
+from core.language import detect_language, source_language, language_name
+
+FETCH_CYCLE_LOCK = "lock:fetch_cycle"
+# زبان پیام‌های تایید مدیران و زبان‌هایی که متن آن‌ها راست‌به‌چپ نمایش داده می‌شود
+ADMIN_LANGUAGE = 'fa'
+RTL_LANGUAGES = {'fa', 'ar', 'he', 'ur'}
+HTTP_HEADERS = {'User-Agent': 'Mozilla/5.0'}
 
 logger = get_task_logger(__name__)
-_llm_model = None
+_llm_models = {}
+_vertex_initialized = False
 
-def get_llm_model():
-    """یک نمونه از مدل Gemini را در worker مقداردهی اولیه کرده و بازمی‌گرداند."""
-    global _llm_model
-    if _llm_model is None:
+def get_llm_model(model_name: str = None):
+    """یک نمونه از مدل Gemini (پیش‌فرض GEMINI_MODEL_NAME) را در worker مقداردهی اولیه کرده و بازمی‌گرداند."""
+    global _vertex_initialized
+    model_name = model_name or settings.GEMINI_MODEL_NAME
+    model = _llm_models.get(model_name)
+    if model is None:
         from google.oauth2 import service_account
         import vertexai
         from vertexai.generative_models import GenerativeModel
         try:
-            credentials = service_account.Credentials.from_service_account_file(settings.GOOGLE_APPLICATION_CREDENTIALS)
-            vertexai.init(project=settings.GOOGLE_PROJECT_ID, location=settings.GOOGLE_LOCATION, credentials=credentials)
-            _llm_model = GenerativeModel(settings.GEMINI_MODEL_NAME)
-            logger.info(f"Vertex AI Model ({settings.GEMINI_MODEL_NAME}) initialized in worker.")
+            if not _vertex_initialized:
+                credentials = service_account.Credentials.from_service_account_file(settings.GOOGLE_APPLICATION_CREDENTIALS)
+                vertexai.init(project=settings.GOOGLE_PROJECT_ID, location=settings.GOOGLE_LOCATION, credentials=credentials)
+                _vertex_initialized = True
+            model = _llm_models[model_name] = GenerativeModel(model_name)
+            logger.info(f"Vertex AI Model ({model_name}) initialized in worker.")
         except Exception as e:
             logger.critical(f"FATAL: Could not initialize Vertex AI Model in worker: {e}", exc_info=True)
-    return _llm_model
+    return model
+
+def _download_html(url: str) -> str:
+    import requests
+    with span("http.article_page", url=url):
+        response = requests.get(url, headers=HTTP_HEADERS, timeout=15)
+    response.raise_for_status()
+    return response.text
+
+def _extract_signature(article_id: int, html: str):
+    # HTML می‌تواند بزرگ باشد؛ پیام صف extraction فشرده ارسال می‌شود
+    return extract_article_task.si(article_id, html).set(compression='zlib')
+
+def _target_languages(source_name: str) -> set:
+    """زبان‌های مقصد کانال‌های فعال متصل به منبع (پیش‌فرض فارسی)."""
+    config = get_config()
+    channels = config.channels_for_source(config.get_source_by_name(source_name))
+    return {c.target_language_code for c in channels if c.is_active} or {'fa'}
 
-def get_prompt(filename: str) -> str:
-    """محتوای یک فایل پرامپت را می‌خواند."""
+def _needs_translation(article: Article) -> bool:
+    """آیا عنوان پیش‌نمایش مدیران باید ترجمه شود (خبر نه به زبان مدیران است و نه به زبان تمام کانال‌ها)."""
+    if article.language == ADMIN_LANGUAGE:
+        return False
+    return not article.language or _target_languages(article.source_name) != {article.language}
+
+def _summary_prompt(language: str, text: str) -> str:
+    if language == 'fa':
+        instructions = prompts.render('summary_fa')
+    else:
+        instructions = prompts.render('summary', language=language_name(language))
+    return f"{instructions}\n---\n{text}"
+
+def _remembered_title(db: Session, article: Article, language: str):
+    """ترجمه عنوان از حافظه ترجمه (عنوان تکراری یا فقط با اعداد متفاوت)؛ None اگر پیدا نشود."""
+    if not settings.TRANSLATION_MEMORY_ENABLED:
+        return None
     try:
-        with open(filename, "r", encoding="utf-8") as f: return f.read().strip()
-    except FileNotFoundError: return ""
+        title, result = translation_memory.lookup(db, article.original_title, article.language, language)
+    except Exception as e:
+        logger.warning(f"Translation memory lookup failed for article {article.id}: {e}")
+        db.rollback()
+        return None
+    observe_translation_memory(result)
+    return title
 
-def _call_llm(prompt_text: str):
-    """یک تابع داخلی امن برای فراخوانی Gemini که وظیفه Celery نیست."""
-    llm = get_llm_model()
-    if not llm: raise ConnectionError("LLM model is not available.")
+def _glossary_hint(db: Session, text: str, source_language: str, language: str) -> str:
     try:
-        response = llm.generate_content(prompt_text)
-        return response.text.strip()
+        return translation_memory.glossary_hint(db, text, source_language, language)
     except Exception as e:
-        logger.error(f"LLM call failed: {e}")
-        raise
+        logger.warning(f"Glossary unavailable: {e}")
+        return ""
+
+def _preview_language(languages: list) -> str:
+    """زبان نسخه‌ای که در پیام تایید نهایی مدیران نمایش داده می‌شود."""
+    return ADMIN_LANGUAGE if ADMIN_LANGUAGE in languages else languages[0]
+
+def _stream_preview(chat_id: int, message_id: int, has_photo: bool):
+    """
+    تابعی برمی‌گرداند که خلاصه در حال تولید را در پیام مدیر نمایش می‌دهد. ویرایش‌ها حداقل با فاصله
+    LLM_STREAM_EDIT_INTERVAL انجام می‌شوند (محدودیت ویرایش پیام در تلگرام) و پس از RetryAfter تا پایان
+    مهلت اعلام شده متوقف می‌مانند. خطای ویرایش فقط لاگ می‌شود و تولید خلاصه را متوقف نمی‌کند.
+    """
+    limit = 1024 if has_photo else 4096
+    state = {"next_edit": 0.0, "last": None}
+
+    def update(title: str, summary: str, final: bool = False):
+        now = time.monotonic()
+        # ویرایش پایانی فقط یک ثانیه (حد ویرایش هر چت) صبر می‌کند تا متن کامل پیش از ترجمه متن دیده شود
+        wait = state["next_edit"] - now - (settings.LLM_STREAM_EDIT_INTERVAL - 1.0 if final else 0.0)
+        if wait > 0:
+            if not final:
+                return
+            time.sleep(wait)
+        footer = "⏳ در حال تکمیل ترجمه..." if final else "✍️ در حال نوشتن خلاصه..."
+        budget = limit - len(title) - len(footer) - 64
+        if len(summary) > budget:
+            summary = summary[:max(budget, 0)] + "…"
+        text = (
+            f"*{escape_markdown(title)}*\n\n"
+            f"{escape_markdown(summary if final else summary + ' ▌')}\n\n"
+            f"{escape_markdown(footer)}"
+        )
+        if text == state["last"]:
+            return
+        edit = _edit_caption if has_photo else _edit_text
+        try:
+            _run_in_new_loop(edit(settings.TELEGRAM_BOT_TOKEN, chat_id, message_id, text, None))
+            state["last"] = text
+            state["next_edit"] = time.monotonic() + settings.LLM_STREAM_EDIT_INTERVAL
+        except Exception as e:
+            retry_after = getattr(e, "retry_after", None)
+            if retry_after is not None:
+                retry_after = retry_after.total_seconds() if hasattr(retry_after, "total_seconds") else float(retry_after)
+                state["next_edit"] = time.monotonic() + max(retry_after, settings.LLM_STREAM_EDIT_INTERVAL)
+            else:
+                state["next_edit"] = time.monotonic() + settings.LLM_STREAM_EDIT_INTERVAL
+            logger.warning(f"Streaming preview edit failed for message {message_id}: {e}")
+
+    return update
+
+def _build_translation(original_title: str, original_content: str, source_language: str,
+                       language: str, known_title: str = None, glossary: str = "", on_summary=None) -> dict:
+    """
+    عنوان و خلاصه مقاله را برای یک زبان مقصد می‌سازد. در thread اجرا می‌شود، پس به session
+    دیتابیس دست نمی‌زند. اگر خبر از قبل به همین زبان باشد فقط خلاصه‌سازی انجام می‌شود.
+    ترجمه متن کامل در translate_content_task و پس از ارسال تایید نهایی انجام می‌شود (content=None)، پس
+    خلاصه در هر دو حالت از متن اصلی (همراه واژه‌نامه) ساخته می‌شود. با on_summary (حالت streaming) هر
+    بخش تولید شده خلاصه به on_summary(title, summary) داده می‌شود.
+    """
+    if language == source_language:
+        title, content = original_title, original_content
+    else:
+        names = {"from_language": language_name(source_language), "to_language": language_name(language)}
+        title = known_title or _call_llm(
+            f"{glossary}{prompts.render('title_full', **names)}\n\n{original_title}", "title_full",
+        )
+        content = None
+    summary_prompt = glossary + _summary_prompt(language, original_content)
+    if on_summary is None:
+        return {"title": title, "content": content, "summary": _call_llm(summary_prompt, "summary")}
+    summary = _call_llm(summary_prompt, "summary", on_text=lambda text: on_summary(title, text))
+    on_summary(title, summary, final=True)
+    return {"title": title, "content": content, "summary": summary}
+
+def _translate_content(original_content: str, source_language: str, language: str, glossary: str = "") -> str:
+    names = {"from_language": language_name(source_language), "to_language": language_name(language)}
+    return _call_llm(f"{glossary}{prompts.render('content', **names)}\n\n{original_content}", "content")
+
+def _warm_models(prompt_types):
+    # مدل‌ها پیش از اجرای thread ها مقداردهی می‌شوند تا هر مدل فقط یک بار ساخته شود
+    for prompt_type in prompt_types:
+        for model_name in (llm_router.primary_model(prompt_type), llm_router.fallback_model(prompt_type)):
+            if model_name:
+                get_llm_model(model_name)
+
+def _translate_for_channels(db: Session, article: Article) -> list:
+    """
+    برای هر زبان مقصد متمایز کانال‌های منبع (نه هر کانال) یک ترجمه می‌سازد؛ زبان‌ها به صورت موازی
+    پردازش می‌شوند و ترجمه‌های ذخیره شده در تلاش‌های قبلی دوباره ساخته نمی‌شوند.
+    """
+    languages = sorted(_target_languages(article.source_name))
+    done = {
+        language for (language,) in
+        db.query(ArticleTranslation.language).filter(ArticleTranslation.article_id == article.id).all()
+    }
+    pending = [language for language in languages if language not in done]
+    if pending:
+        _warm_models(("title_full", "summary"))
+        # عنوان فارسی مرحله تایید اولیه دوباره ترجمه نمی‌شود؛ برای زبان‌های دیگر حافظه ترجمه بررسی می‌شود.
+        # حافظه ترجمه و واژه‌نامه در همین thread خوانده می‌شوند، چون session دیتابیس بین thread ها مشترک نیست.
+        admin_title = article.translated_title if article.translated_title != article.original_title else None
+        inputs = {}
+        for language in pending:
+            if language == article.language:
+                inputs[language] = (None, "")
+                continue
+            known_title = admin_title if language == ADMIN_LANGUAGE and admin_title else _remembered_title(db, article, language)
+            text = f"{article.original_title}\n{article.original_content}"
+            inputs[language] = (known_title, _glossary_hint(db, text, article.language, language))
+        # در حالت streaming خلاصه نسخه پیش‌نمایش همزمان با تولید در پیام مدیر نمایش داده می‌شود
+        streaming = {}
+        preview_language = _preview_language(languages)
+        if settings.LLM_STREAMING_ENABLED and preview_language in pending and article.admin_chat_id and article.admin_message_id:
+            streaming[preview_language] = _stream_preview(
+                article.admin_chat_id, article.admin_message_id, bool(article.image_url),
+            )
+        errors = []
+        with ThreadPoolExecutor(max_workers=min(len(pending), settings.TRANSLATION_PARALLELISM)) as pool:
+            futures = {
+                language: pool.submit(
+                    contextvars.copy_context().run, _build_translation,
+                    article.original_title, article.original_content, article.language, language, *inputs[language],
+                    on_summary=streaming.get(language),
+                )
+                for language in pending
+            }
+            for language, future in futures.items():
+                try:
+                    db.add(ArticleTranslation(article_id=article.id, language=language, **future.result()))
+                except Exception as e:
+                    errors.append(e)
+        db.commit()
+        if errors:
+            raise errors[0]
+    return languages
+
+def _call_llm(prompt_text: str, prompt_type: str, on_text=None):
+    """
+    یک تابع داخلی امن برای فراخوانی Gemini که وظیفه Celery نیست.
+    با on_text پاسخ به صورت stream دریافت و متن تجمیع شده پس از هر بخش به on_text داده می‌شود.
+    """
+    # مدل بر اساس نوع پرامپت و وضعیت circuit breaker آن انتخاب می‌شود (core/llm_router.py)
+    model_name = llm_router.choose(prompt_type)
+    fallback = model_name != llm_router.primary_model(prompt_type)
+    # هر خروجی پس از choose() در breaker ثبت می‌شود؛ وگرنه فراخوانی آزمایشی half-open هرگز پایان نمی‌یابد
+    # و تمام فراخوانی‌های بعدی به مدل جایگزین می‌روند
+    recorded = False
+    try:
+        llm = get_llm_model(model_name)
+        if not llm: raise ConnectionError(f"LLM model {model_name} is not available.")
+        with span(
+            "llm.generate", prompt_type=prompt_type, model=model_name, fallback=fallback,
+            prompt_chars=len(prompt_text), stream=on_text is not None,
+        ) as attrs:
+            start = time.perf_counter()
+            try:
+                if on_text is None:
+                    response = llm.generate_content(prompt_text)
+                    text = response.text.strip()
+                else:
+                    response, parts = None, []
+                    for response in llm.generate_content(prompt_text, stream=True):
+                        if not parts:
+                            first_token = time.perf_counter() - start
+                            observe_llm_first_token(prompt_type, first_token)
+                            if attrs is not None:
+                                attrs.update(first_token_seconds=round(first_token, 3))
+                        parts.append(response.text)
+                        on_text("".join(parts).strip())
+                    text = "".join(parts).strip()
+            except Exception as e:
+                elapsed = time.perf_counter() - start
+                observe_llm_call(prompt_type, elapsed, failed=True)
+                observe_llm_routing(prompt_type, fallback, llm_router.record(model_name, prompt_type, elapsed, failed=True))
+                recorded = True
+                llm_usage.record(prompt_type, model_name, 0, 0, elapsed, failed=True)
+                logger.error(f"LLM call to {model_name} failed: {e}")
+                raise
+            usage = getattr(response, "usage_metadata", None)
+            input_tokens = getattr(usage, "prompt_token_count", 0) or 0
+            output_tokens = getattr(usage, "candidates_token_count", 0) or 0
+            elapsed = time.perf_counter() - start
+            observe_llm_call(prompt_type, elapsed, input_tokens, output_tokens)
+            observe_llm_routing(prompt_type, fallback, llm_router.record(model_name, prompt_type, elapsed))
+            recorded = True
+            llm_usage.record(prompt_type, model_name, input_tokens, output_tokens, elapsed)
+            if attrs is not None:
+                attrs.update(input_tokens=input_tokens, output_tokens=output_tokens)
+    finally:
+        if not recorded:
+            observe_llm_routing(prompt_type, fallback, llm_router.record(model_name, prompt_type, 0, failed=True))
+    return text
 
 # Helper utilities for running Telegram API calls with a fresh event loop
 def _run_in_new_loop(coro):
@@ -66,47 +314,51 @@ def _run_in_new_loop(coro):
         asyncio.set_event_loop(None)
 
 async def _send_photo(token, admin_id, url, caption, markup):
-    async with Bot(token=token) as bot:
-        msg = await bot.send_photo(
-            chat_id=admin_id,
-            photo=url,
-            caption=caption,
-            parse_mode=ParseMode.MARKDOWN_V2,
-            reply_markup=markup,
-        )
+    async with Bot(token=token, base_url=settings.TELEGRAM_API_BASE_URL) as bot:
+        with track_telegram("send_photo"), span("telegram.send_photo", chat_id=admin_id):
+            msg = await bot.send_photo(
+                chat_id=admin_id,
+                photo=url,
+                caption=caption,
+                parse_mode=ParseMode.MARKDOWN_V2,
+                reply_markup=markup,
+            )
         return msg
 
 async def _send_text(token, admin_id, text, markup):
-    async with Bot(token=token) as bot:
-        msg = await bot.send_message(
-            chat_id=admin_id,
-            text=text,
-            parse_mode=ParseMode.MARKDOWN_V2,
-            reply_markup=markup,
-        )
+    async with Bot(token=token, base_url=settings.TELEGRAM_API_BASE_URL) as bot:
+        with track_telegram("send_message"), span("telegram.send_message", chat_id=admin_id):
+            msg = await bot.send_message(
+                chat_id=admin_id,
+                text=text,
+                parse_mode=ParseMode.MARKDOWN_V2,
+                reply_markup=markup,
+            )
         return msg
 
 async def _edit_caption(token, chat_id, message_id, caption, markup):
-    async with Bot(token=token) as bot:
-        msg = await bot.edit_message_caption(
-            chat_id=chat_id,
-            message_id=message_id,
-            caption=caption,
-            parse_mode=ParseMode.MARKDOWN_V2,
-            reply_markup=markup,
-        )
+    async with Bot(token=token, base_url=settings.TELEGRAM_API_BASE_URL) as bot:
+        with track_telegram("edit_message_caption"), span("telegram.edit_message_caption", chat_id=chat_id):
+            msg = await bot.edit_message_caption(
+                chat_id=chat_id,
+                message_id=message_id,
+                caption=caption,
+                parse_mode=ParseMode.MARKDOWN_V2,
+                reply_markup=markup,
+            )
         return msg
 
 async def _edit_text(token, chat_id, message_id, text, markup):
-    async with Bot(token=token) as bot:
-        msg = await bot.edit_message_text(
-            chat_id=chat_id,
-            message_id=message_id,
-            text=text,
-            parse_mode=ParseMode.MARKDOWN_V2,
-            reply_markup=markup,
-            disable_web_page_preview=True,
-        )
+    async with Bot(token=token, base_url=settings.TELEGRAM_API_BASE_URL) as bot:
+        with track_telegram("edit_message_text"), span("telegram.edit_message_text", chat_id=chat_id):
+            msg = await bot.edit_message_text(
+                chat_id=chat_id,
+                message_id=message_id,
+                text=text,
+                parse_mode=ParseMode.MARKDOWN_V2,
+                reply_markup=markup,
+                disable_web_page_preview=True,
+            )
         return msg
 
 
@@ -115,19 +367,24 @@ async def _edit_text(token, chat_id, message_id, text, markup):
 @celery_app.task
 def run_all_fetchers_task():
     logger.info("Scheduler triggered: Fetching all active sources.")
-    db: Session = SessionLocal()
+    # فقط یک چرخه fetch در کل سیستم اجرا می‌شود؛ قفل توسط callback همان chord آزاد می‌شود.
+    # هر وظیفه fetch و حلقه انتظار callback مهلت قفل را تمدید می‌کنند تا چرخه طولانی قفل را از دست ندهد.
+    lock_token = acquire_lock(FETCH_CYCLE_LOCK, settings.FETCH_CYCLE_LOCK_TTL)
+    if not lock_token:
+        logger.info("A fetch cycle is already running. Skipping this trigger.")
+        return
     try:
-        active_sources = db.query(Source).filter(Source.is_active == True).all()
+        active_sources = get_config().active_sources()
         if not active_sources:
             logger.info("No active sources to fetch.")
-            db.close()
+            release_lock(FETCH_CYCLE_LOCK, lock_token)
             return
 
         # ۱. یک گروه از وظایف fetch ایجاد می‌شود
-        header = [fetch_source_task.s(source.id) for source in active_sources]
+        header = [fetch_source_task.s(source.id, lock_token) for source in active_sources]
 
         # ۲. وظیفه ناظر به عنوان callback تعریف می‌شود
-        callback = wait_for_processing_and_notify_task.s()
+        callback = wait_for_processing_and_notify_task.s(lock_token)
 
         # ۳. از chord استفاده می‌شود تا پس از اتمام تمام وظایف گروه header، وظیفه callback اجرا شود
         chord(header)(callback)
@@ -135,12 +392,10 @@ def run_all_fetchers_task():
         logger.info(f"یک chord با {len(header)} وظیفه fetch ایجاد شد. Callback منتظر پردازش خواهد ماند.")
 
     except Exception as e:
+        release_lock(FETCH_CYCLE_LOCK, lock_token)
         logger.error(f"Error creating fetcher chord: {e}", exc_info=True)
-    finally:
-        if db.is_active:
-            db.close()
 
-@celery_app.task(bind=True, autoretry_for=(Exception,), max_retries=2, countdown=60, rate_limit="15/m")
+@celery_app.task(bind=True, max_retries=2, rate_limit="15/m")
 def send_initial_approval_task(self, _results, article_id: int):
     """Send translated headline to admins for approval with a fallback to text-only."""
     db: Session = SessionLocal()
@@ -168,7 +423,7 @@ def send_initial_approval_task(self, _results, article_id: int):
         reply_markup = InlineKeyboardMarkup(keyboard)
 
         any_success = False
-        primary_message_sent = False
+        primary_message = None
         
         for admin_id in settings.admin_ids_list:
             sent_message = None
@@ -213,57 +468,57 @@ def send_initial_approval_task(self, _results, article_id: int):
             if sent_message:
                 any_success = True
                 # فقط اطلاعات اولین پیام موفق را ذخیره می‌کند
-                if not primary_message_sent:
-                    article.admin_chat_id = sent_message.chat_id
-                    article.admin_message_id = sent_message.message_id
-                    primary_message_sent = True
+                if primary_message is None:
+                    primary_message = sent_message
                 
                 logger.info(f"تایید اولیه برای مقاله {article.id} به مدیر {admin_id} ارسال شد.")
         
         # در نهایت، وضعیت مقاله را بر اساس موفقیت در ارسال، به‌روزرسانی می‌کند
         if any_success:
-            article.status = 'pending_initial_approval'
+            transition(
+                db, article.id, 'new', 'pending_initial_approval',
+                admin_chat_id=primary_message.chat_id,
+                admin_message_id=primary_message.message_id,
+            )
         else:
-            article.status = 'failed'
+            transition(db, article.id, 'new', 'failed')
             logger.error(f"تایید اولیه برای مقاله {article.id} به هیچ مدیری ارسال نشد. وضعیت به failed تغییر کرد.")
-        
-        db.commit()
 
     except Exception as e:
         if db.is_active:
             db.rollback()
         logger.error(f"خطای جدی در send_initial_approval_task برای مقاله {article_id}: {e}", exc_info=True)
-        # تلاش نهایی برای اطمینان از اینکه مقاله در وضعیت new گیر نمی‌کند
-        try:
+        # خطای گذرا مقاله را در وضعیت new نگه می‌دارد تا retry دوباره آن را ارسال کند؛
+        # پس از خطای دائمی یا آخرین تلاش، مقاله failed می‌شود تا در new گیر نکند
+        if is_permanent(e) or self.request.retries >= self.max_retries:
             db_recovery = SessionLocal()
-            db_recovery.query(Article).filter(Article.id == article_id, Article.status == 'new').update({'status': 'failed'})
-            db_recovery.commit()
-        except Exception as db_err:
-            logger.error(f"امکان تغییر وضعیت مقاله {article_id} به failed وجود نداشت: {db_err}")
-            db_recovery.rollback()
-        finally:
-            db_recovery.close()
-        raise self.retry(exc=e)
+            try:
+                transition(db_recovery, article_id, 'new', 'failed')
+            except Exception as db_err:
+                logger.error(f"امکان تغییر وضعیت مقاله {article_id} به failed وجود نداشت: {db_err}")
+                db_recovery.rollback()
+            finally:
+                db_recovery.close()
+        raise retry_task(self, e)
     finally:
         if db.is_active:
             db.close()
             
-@celery_app.task(bind=True, autoretry_for=(Exception,), max_retries=2, countdown=60, rate_limit="15/m")
+@celery_app.task(bind=True, max_retries=2, rate_limit="15/m")
 def send_final_approval_task(self, article_id: int):
     """Edit admin message with processed article for publication."""
     db: Session = SessionLocal()
-    article = db.query(Article).filter(Article.id == article_id).first()
     try:
+        article = db.query(Article).filter(Article.id == article_id).first()
         if not article or article.status != 'pending_publication' or not article.admin_chat_id or not article.admin_message_id:
             if article and article.status == 'pending_publication':
-                article.status = 'failed'
-                db.commit()
+                transition(db, article.id, 'pending_publication', 'failed')
             return
 
-        source = db.query(Source).filter(Source.name == article.source_name).first()
-        if not source or not source.channels:
-            article.status = 'archived_unlinked'
-            db.commit()
+        config = get_config()
+        channels = config.channels_for_source(config.get_source_by_name(article.source_name))
+        if not channels:
+            transition(db, article.id, 'pending_publication', 'archived_unlinked')
             return
 
         final_caption = (
@@ -272,17 +527,7 @@ def send_final_approval_task(self, article_id: int):
             f"منبع: [{escape_markdown(article.source_name)}]({escape_markdown_url(article.original_url)})"
         )
 
-        keyboard_rows = []
-        for channel in source.channels:
-            if channel.is_active:
-                button = InlineKeyboardButton(
-                    f"🚀 انتشار در {channel.name}", callback_data=f"publish_{article.id}_{channel.id}"
-                )
-                keyboard_rows.append([button])
-        keyboard_rows.append([
-            InlineKeyboardButton("🗑️ لغو کلی", callback_data=f"discard_{article.id}")
-        ])
-        reply_markup = InlineKeyboardMarkup(keyboard_rows)
+        reply_markup = publications.publish_keyboard(article.id, [channel for channel in channels if channel.is_active])
 
         if article.image_url:
             try:
@@ -326,131 +571,349 @@ def send_final_approval_task(self, article_id: int):
                     )
                 )
         logger.info("Final approval sent")
-        article.status = 'sent_for_publication'
-        db.commit()
+        transition(db, article.id, 'pending_publication', 'sent_for_publication')
 
     except Exception as e:
         if db.is_active:
             db.rollback()
         logger.error(f"Failed to send final approval for article {article_id}: {e}", exc_info=True)
-        raise self.retry(exc=e)
+        raise retry_task(self, e)
     finally:
         db.close()
 
-@celery_app.task(autoretry_for=(requests.RequestException,), max_retries=3, countdown=60)
-def fetch_source_task(source_id: int):
+def _entry_languages(feed, entries) -> list:
+    """
+    زبان هر مطلب به صورت محلی تشخیص داده می‌شود؛ مطالب مبهم (مثلا عنوان خیلی کوتاه) زبان منبع را می‌گیرند:
+    تگ language فید یا در نبود آن زبان اکثریت مطالب همین fetch.
+    """
+    detected = [detect_language(f"{entry.title} {entry.get('summary', '')}") for entry in entries]
+    default_language = source_language(feed.feed.get('language'), detected)
+    return [language or default_language for language in detected]
+
+
+def _ingest_entry(db: Session, source, entry, entry_language: str):
+    """
+    یک مطلب فید را ذخیره می‌کند و وضعیت مقاله ساخته شده را برمی‌گرداند
+    ('new'، 'duplicate' یا 'archived_prefilter')؛ برای مطلبی که قبلا ذخیره شده None برمی‌گرداند.
+    """
+    if db.query(Article).filter(Article.original_url == entry.link).first():
+        return None
+    started_at = datetime.utcnow()
+    entry_start = time.time()
+    # همان خبر از منبع دیگری با آدرس متفاوت: به مقاله اصلی متصل می‌شود و وارد pipeline نمی‌شود
+    fingerprint, match = 0, None
+    if settings.DEDUP_ENABLED:
+        fingerprint = dedup.simhash(entry.title, entry.get('summary', ''))
+        match = dedup.find_canonical(fingerprint)
+        if match and not db.query(Article.id).filter(Article.id == match[0]).first():
+            # مقاله اصلی پاک شده ولی ایندکس هنوز به آن اشاره می‌کند؛ مطلب یک مقاله جدید است
+            dedup.forget([match[0]])
+            match = None
+    if match:
+        canonical_id, distance = match
+        article = Article(
+            source_name=source.name,
+            original_url=entry.link,
+            original_title=entry.title,
+            status='duplicate',
+            canonical_article_id=canonical_id,
+        )
+        db.add(article)
+        record_creation(db, article, started_at=started_at)
+        db.commit()
+        logger.info(f"DUPLICATE from {source.name} of article {canonical_id} (distance {distance}): {entry.title}")
+        return 'duplicate'
+    # پیش‌فیلتر محلی: عناوین با اطمینان کم‌ارزش بدون هیچ فراخوانی LLM بایگانی می‌شوند
+    decision, probability = prefilter.LLM, None
+    if settings.PREFILTER_ENABLED:
+        decision, probability, reason = prefilter.decide(entry.title, source.name)
+        observe_prefilter(decision)
+    if decision == prefilter.ARCHIVE:
+        article = Article(
+            source_name=source.name,
+            original_url=entry.link,
+            original_title=entry.title,
+            status='archived_prefilter',
+        )
+        db.add(article)
+        record_creation(db, article, started_at=started_at)
+        db.commit()
+        # نسخه‌های همین خبر از منابع دیگر هم به این مقاله متصل می‌شوند و دوباره بررسی نمی‌شوند
+        dedup.index_article(article.id, fingerprint)
+        logger.info(f"PREFILTERED from {source.name} ({reason}): {entry.title}")
+        return 'archived_prefilter'
+    # فقط دانلود در این worker انجام می‌شود؛ تجزیه HTML به صف extraction سپرده می‌شود
+    html = None
+    try:
+        html = _download_html(entry.link)
+    except Exception:
+        pass
+    article = Article(
+        source_name=source.name,
+        original_url=entry.link,
+        original_title=entry.title,
+        language=entry_language,
+        status='new',
+        news_value_score=prefilter.score_from_probability(probability) if decision == prefilter.ACCEPT else None,
+    )
+    db.add(article)
+    record_creation(db, article, started_at=started_at)
+    db.commit()
+    dedup.index_article(article.id, fingerprint)
+    logger.info(f"NEW ARTICLE from {source.name}: {entry.title}")
+    # از اینجا به بعد وظایف این مقاله زیر trace خود مقاله ردیابی می‌شوند
+    trace_id = article_trace_id(article.id)
+    record_span("article.fetch", trace_id, entry_start, time.time(), source=source.name, url=entry.link)
+    with span("article.dispatch_preprocess", trace_id=trace_id, article_id=article.id):
+        # کلیدهای dispatch ثبت می‌شوند تا dispatch_preprocess_tasks همین وظایف را دوباره ارسال نکند
+        claimed = ['translate_title_task']
+        header = [translate_title_task.s(article.id)]
+        if article.news_value_score is None:
+            claimed.append('score_title_task')
+            header.append(score_title_task.s(article.id))
+        if html:
+            # تصویر مقاله پیش از ارسال برای تایید اولیه استخراج می‌شود
+            header.append(_extract_signature(article.id, html))
+        for task_name in claimed:
+            claim_dispatch(task_name, article.id)
+        try:
+            chord(header)(send_initial_approval_task.s(article.id))
+        except Exception:
+            # chord در صف قرار نگرفت؛ dispatch_preprocess_tasks باید بتواند این وظایف را دوباره ارسال کند
+            for task_name in claimed:
+                release_dispatch(task_name, article.id)
+            raise
+    return 'new'
+
+
+# requests.RequestException زیرکلاس OSError است؛ برای autoretry نیازی به import کردن requests نیست
+@celery_app.task(autoretry_for=(OSError,), max_retries=3, countdown=60)
+def fetch_source_task(source_id: int, lock_token: str = None):
+    import feedparser
+    extend_lock(FETCH_CYCLE_LOCK, lock_token, settings.FETCH_CYCLE_LOCK_TTL)
+    source = get_config().get_source(source_id)
+    if not source: return
     db: Session = SessionLocal()
-    source = db.query(Source).filter(Source.id == source_id).first()
-    if not source: db.close(); return
     try:
         logger.info(f"Fetching: {source.name}")
-        headers = {'User-Agent': 'Mozilla/5.0'}
-        feed = feedparser.parse(source.rss_url)
-        for entry in feed.entries[:30]:
-            if not db.query(Article).filter(Article.original_url == entry.link).first():
-                top_image = None
-                try:
-                    temp_article = NewspaperArticle(entry.link, language='en')
-                    temp_article.download(input_html=requests.get(entry.link, headers=headers, timeout=15).text)
-                    temp_article.parse()
-                    top_image = temp_article.top_image
-                except Exception:
-                    pass
-                article = Article(
-                    source_name=source.name,
-                    original_url=entry.link,
-                    original_title=entry.title,
-                    image_url=top_image,
-                    status='new',
-                )
-                db.add(article)
-                db.commit()
-                logger.info(f"NEW ARTICLE from {source.name}: {entry.title}")
-                header = [translate_title_task.s(article.id), score_title_task.s(article.id)]
-                chord(header)(send_initial_approval_task.s(article.id))
+        fetch_start = time.perf_counter()
+        with span("http.feed", source=source.name, url=source.rss_url):
+            feed = feedparser.parse(source.rss_url)
+        fetch_seconds = time.perf_counter() - fetch_start
+        new_articles = 0
+        duplicates = 0
+        entries = feed.entries[:30]
+        for entry, entry_language in zip(entries, _entry_languages(feed, entries)):
+            # خطای یک مطلب (مثلا مطلب بدون link یا خطای پایگاه داده) بقیه مطالب همین فید را از بین نمی‌برد
+            try:
+                outcome = _ingest_entry(db, source, entry, entry_language)
+            except Exception as e:
+                db.rollback()
+                logger.error(f"Failed to ingest entry {entry.get('link')} from {source.name}: {e}")
+                continue
+            if outcome == 'new':
+                new_articles += 1
+            elif outcome == 'duplicate':
+                duplicates += 1
+        observe_feed_fetch(source.name, fetch_seconds, feed.get('status', 0), new_articles, duplicates)
     except Exception as e:
         logger.error(f"Failed to fetch source {source_id}: {e}")
     finally:
         db.close()
 
-@celery_app.task(bind=True, autoretry_for=(Exception,), max_retries=2, countdown=180)
-def process_article_task(self, article_id: int):
-    """وظیفه اصلی پردازش مقاله پس از تایید اولیه."""
+@celery_app.task(bind=True, max_retries=2)
+def process_article_task(self, article_id: int, extracted: bool = False):
+    """
+    وظیفه اصلی پردازش مقاله پس از تایید اولیه.
+    اگر متن مقاله هنوز استخراج نشده باشد، HTML دانلود و به صف extraction فرستاده می‌شود و این وظیفه
+    پس از آن با extracted=True دوباره اجرا می‌شود.
+    """
     logger.info(f"Starting full processing for article_id: {article_id}")
     db: Session = SessionLocal()
-    article = db.query(Article).filter(Article.id == article_id).first()
+    article = None
     try:
-        if not article: return
+        article = db.query(Article).filter(Article.id == article_id).first()
+        if not article or article.status != 'approved': return
         
         # 1. دانلود محتوا
         if not article.original_content:
+            if extracted:
+                raise ValueError("Newspaper parse failed: no text extracted.")
             try:
-                news_article = NewspaperArticle(article.original_url, language='en')
-                news_article.download(); news_article.parse()
-                if not news_article.text: raise ValueError("Newspaper download failed.")
-                article.original_content = news_article.text
-                if not article.image_url: article.image_url = news_article.top_image
-                db.commit()
+                html = _download_html(article.original_url)
             except Exception as e:
-                raise ValueError(f"Newspaper parse failed: {e}")
+                # علت اصلی (مثلا 404 یا timeout) نوع retry را تعیین می‌کند
+                raise ValueError(f"Newspaper download failed: {e}") from e
+            chain(_extract_signature(article.id, html), process_article_task.si(article.id, extracted=True)).delay()
+            return
         
-        # 2. ترجمه عنوان
-        title_prompt = f"Translate the following English title to fluent Persian. Return only the translated text:\n\n{article.original_title}"
-        article.translated_title = _call_llm(title_prompt)
-
-        # 3. ترجمه محتوای کامل
-        content_prompt = f"Translate the following English article content to fluent and natural Persian. Return only the translated text:\n\n{article.original_content}"
-        translated_content = _call_llm(content_prompt)
-        article.translated_content = translated_content
+        # 2. ترجمه و خلاصه‌سازی برای هر زبان مقصد؛ خبری که از قبل به زبان مقصد است فقط خلاصه می‌شود
+        with llm_usage.attribute(article.id, article.source_name):
+            languages = _translate_for_channels(db, article)
 
-        # 4. خلاصه‌سازی محتوای ترجمه شده
-        summary_prompt = f"{get_prompt('prompt.txt')}\n---\n{translated_content}"
-        article.summary = _call_llm(summary_prompt)
+        # 3. نسخه زبان مدیران (یا اولین زبان) در خود مقاله برای پیش‌نمایش تایید نهایی نگه داشته می‌شود
+        preview_language = _preview_language(languages)
+        preview = (
+            db.query(ArticleTranslation)
+            .filter(ArticleTranslation.article_id == article.id, ArticleTranslation.language == preview_language)
+            .first()
+        )
+        article.translated_title = preview.title
+        article.translated_content = preview.content
+        article.summary = preview.summary
+        article.prompt_version = prompts.version()
 
-        # 5. تغییر وضعیت نهایی
-        article.status = 'pending_publication'
-        db.commit()
+        # 4. تغییر وضعیت نهایی
+        if not transition(db, article.id, 'approved', 'pending_publication'):
+            logger.warning(f"Article {article.id} left 'approved' while processing. Skipping final approval.")
+            return
         logger.info(f"Article {article.id} processed successfully. Ready for final approval.")
         send_final_approval_task.delay(article.id)
+        # پیش‌نمایش و انتشار فقط عنوان و خلاصه را لازم دارند؛ متن کامل پس از ارسال تایید نهایی ترجمه می‌شود
+        translate_content_task.delay(article.id)
     except Exception as e:
         logger.error(f"Critical error processing article {article_id}: {e}", exc_info=True)
-        if article: article.status = 'failed'; db.commit()
-        raise self.retry(exc=e)
+        if db.is_active:
+            db.rollback()
+        # فقط پس از خطای دائمی یا آخرین تلاش مقاله failed می‌شود تا retry ها بتوانند آن را پردازش کنند
+        if article and (is_permanent(e) or self.request.retries >= self.max_retries):
+            transition(db, article_id, 'approved', 'failed')
+        # ترجمه کامل سنگین‌تر از بقیه وظایف است؛ پایه backoff آن سه برابر است
+        raise retry_task(self, e, base=settings.RETRY_BASE_SECONDS * 3)
+    finally:
+        db.close()
+
+
+@celery_app.task(bind=True, max_retries=2)
+def translate_content_task(self, article_id: int):
+    """
+    متن کامل مقاله را برای نسخه‌هایی از هر زبان که هنوز متن ندارند ترجمه می‌کند. پس از ارسال تایید نهایی
+    اجرا می‌شود تا مدیر منتظر طولانی‌ترین فراخوانی LLM نماند؛ زبان‌ها به صورت موازی ترجمه می‌شوند.
+    """
+    db: Session = SessionLocal()
+    try:
+        article = db.query(Article).filter(Article.id == article_id).first()
+        if not article or not article.original_content:
+            return
+        pending = (
+            db.query(ArticleTranslation)
+            .filter(ArticleTranslation.article_id == article.id, ArticleTranslation.content.is_(None))
+            .all()
+        )
+        if not pending:
+            return
+        _warm_models(("content",))
+        text = f"{article.original_title}\n{article.original_content}"
+        glossaries = {row.language: _glossary_hint(db, text, article.language, row.language) for row in pending}
+        errors = []
+        with llm_usage.attribute(article.id, article.source_name):
+            with ThreadPoolExecutor(max_workers=min(len(pending), settings.TRANSLATION_PARALLELISM)) as pool:
+                futures = {
+                    row: pool.submit(
+                        contextvars.copy_context().run, _translate_content,
+                        article.original_content, article.language, row.language, glossaries[row.language],
+                    )
+                    for row in pending
+                }
+                for row, future in futures.items():
+                    try:
+                        row.content = future.result()
+                    except Exception as e:
+                        errors.append(e)
+        languages = sorted(
+            language for (language,) in
+            db.query(ArticleTranslation.language).filter(ArticleTranslation.article_id == article.id).all()
+        )
+        preview_language = _preview_language(languages)
+        for row in pending:
+            if row.language == preview_language and row.content is not None:
+                article.translated_content = row.content
+        db.commit()
+        if errors:
+            raise errors[0]
+        logger.info(f"Translated content of article {article.id} into {len(pending)} language(s).")
+    except Exception as e:
+        logger.error(f"Failed to translate content of article {article_id}: {e}", exc_info=True)
+        if db.is_active:
+            db.rollback()
+        raise retry_task(self, e, base=settings.RETRY_BASE_SECONDS * 3)
     finally:
         db.close()
 
 
-@celery_app.task(bind=True, autoretry_for=(Exception,), max_retries=2, countdown=60)
+@celery_app.task
+def extract_article_task(article_id: int, html: str):
+    """
+    HTML مقاله را در worker صف extraction تجزیه کرده و متن و تصویر را ذخیره می‌کند.
+    خطا در استخراج نباید chord تایید اولیه را متوقف کند، پس فقط لاگ می‌شود.
+    """
+    from core.extraction import extract_article
+    db: Session = SessionLocal()
+    try:
+        article = db.query(Article).filter(Article.id == article_id).first()
+        if not article:
+            return
+        with span("extract.parse", html_bytes=len(html)):
+            result = extract_article(html, article.original_url, article.language)
+        if result["text"] and not article.original_content:
+            article.original_content = result["text"]
+        if result["image"] and not article.image_url:
+            article.image_url = result["image"]
+        db.commit()
+    except Exception as e:
+        if db.is_active:
+            db.rollback()
+        logger.warning(f"Extraction failed for article {article_id}: {e}")
+    finally:
+        db.close()
+
+
+@celery_app.task(bind=True, max_retries=2)
 def translate_title_task(self, article_id: int):
     """Translate only the article title and store it."""
     db: Session = SessionLocal()
-    article = db.query(Article).filter(Article.id == article_id).first()
     try:
+        article = db.query(Article).filter(Article.id == article_id).first()
         if not article or article.translated_title:
             return
+        if not _needs_translation(article):
+            article.translated_title = article.original_title
+            db.commit()
+            logger.info(f"Article {article_id} is already in {article.language}; title translation skipped")
+            return
+        remembered = _remembered_title(db, article, ADMIN_LANGUAGE)
+        if remembered:
+            article.translated_title = remembered
+            db.commit()
+            logger.info(f"Title for article {article_id} answered from translation memory")
+            return
 
-        prompt = f"{get_prompt('translate_prompt.txt')}\n{article.original_title}"
-        article.translated_title = _call_llm(prompt)
+        glossary = _glossary_hint(db, article.original_title, article.language, ADMIN_LANGUAGE)
+        prompt = f"{glossary}{prompts.render('title')}\n{article.original_title}"
+        with llm_usage.attribute(article.id, article.source_name):
+            article.translated_title = _call_llm(prompt, "title")
+        article.prompt_version = prompts.version()
         db.commit()
         logger.info(f"Translated title for article {article_id}")
     except Exception as e:
         logger.error(f"Failed to translate title for article {article_id}: {e}")
-        raise self.retry(exc=e)
+        raise retry_task(self, e)
     finally:
         db.close()
 
 
-@celery_app.task(bind=True, autoretry_for=(Exception,), max_retries=2, countdown=60)
+@celery_app.task(bind=True, max_retries=2)
 def score_title_task(self, article_id: int):
     """Score the article headline and store it."""
     db: Session = SessionLocal()
-    article = db.query(Article).filter(Article.id == article_id).first()
     try:
+        article = db.query(Article).filter(Article.id == article_id).first()
         if not article or article.news_value_score is not None:
             return
 
-        prompt = f"{get_prompt('score_prompt.txt')}\n{article.original_title}"
-        result = _call_llm(prompt)
+        prompt = f"{prompts.render('score')}\n{article.original_title}"
+        with llm_usage.attribute(article.id, article.source_name):
+            result = _call_llm(prompt, "score")
         try:
             article.news_value_score = int(result)
         except (ValueError, TypeError):
@@ -459,25 +922,57 @@ def score_title_task(self, article_id: int):
         logger.info(f"Scored title for article {article_id}")
     except Exception as e:
         logger.error(f"Failed to score title for article {article_id}: {e}")
-        raise self.retry(exc=e)
+        raise retry_task(self, e)
     finally:
         db.close()
 
 
-@celery_app.task(bind=True, autoretry_for=(Exception,), max_retries=2, countdown=60, rate_limit="15/m")
+@celery_app.task(bind=True, max_retries=2, rate_limit="15/m")
 def publish_article_task(self, article_id: int, channel_id: int):
-    """Send the article to a channel and update admin message."""
+    """
+    Send the article to one channel and update the admin message.
+    مقاله پس از انتشار در تمام کانال‌های فعال منبع published می‌شود (core/publications.py)؛
+    تا آن زمان دکمه کانال‌های باقی‌مانده روی پیام مدیر می‌ماند.
+    """
     db: Session = SessionLocal()
-    article = db.query(Article).filter(Article.id == article_id).first()
-    channel = db.query(Channel).filter(Channel.id == channel_id).first()
-    if not article or not channel or article.status != 'sent_for_publication':
-        db.close()
-        return
+    claimed = False
     try:
+        article = db.query(Article).filter(Article.id == article_id).first()
+        channel = get_config().get_channel(channel_id)
+        if not article or not channel or article.status not in ('sent_for_publication', 'publishing'):
+            return
+        # ادعای اتمیک انتشار در این کانال؛ کلیک همزمان دو مدیر فقط یک بار منتشر می‌کند
+        if not publications.claim(db, article_id, channel_id):
+            return
+        claimed = True
+        # انتشار در اولین کانال مقاله را به publishing می‌برد؛ کانال‌های بعدی در همان وضعیت ادامه می‌دهند
+        if not transition(db, article_id, 'sent_for_publication', 'publishing'):
+            db.refresh(article)
+            if article.status != 'publishing':
+                # مقاله در این فاصله لغو شده است
+                publications.release(db, article_id, channel_id)
+                claimed = False
+                return
+        # نسخه زبان کانال؛ اگر کانال پس از پردازش متصل شده باشد نسخه پیش‌نمایش منتشر می‌شود
+        variant = (
+            db.query(ArticleTranslation)
+            .filter(ArticleTranslation.article_id == article.id, ArticleTranslation.language == channel.target_language_code)
+            .first()
+        )
+        if variant:
+            title, summary, language = variant.title, variant.summary, variant.language
+        else:
+            logger.warning(f"No {channel.target_language_code} translation for article {article.id}; publishing the preview text.")
+            translated = sorted(
+                language for (language,) in
+                db.query(ArticleTranslation.language).filter(ArticleTranslation.article_id == article.id).all()
+            )
+            title, summary = article.translated_title, article.summary
+            language = _preview_language(translated) if translated else ADMIN_LANGUAGE
         final_caption = (
-            "\u200F"
-            f"*{escape_markdown(article.translated_title)}*\n\n"
-            f"{escape_markdown(article.summary)}\n\n"
+            ("\u200F" if language in RTL_LANGUAGES else "")
+            + f"*{escape_markdown(title)}*\n\n"
+            f"{escape_markdown(summary)}\n\n"
             f"\u200E {escape_markdown(channel.telegram_channel_id)}"
         )
 
@@ -501,93 +996,96 @@ def publish_article_task(self, article_id: int, channel_id: int):
                 )
             )
 
-        article.status = 'published'
-        db.commit()
+        publications.mark_published(db, article.id, channel.id)
+        remaining = publications.pending_channels(db, article)
+        if not remaining:
+            transition(db, article.id, 'publishing', 'published')
+        if variant and settings.TRANSLATION_MEMORY_ENABLED:
+            # عنوان منتشر شده ترجمه تایید شده مدیر است و در حافظه ترجمه ذخیره می‌شود
+            try:
+                translation_memory.remember(db, article.language, variant.language, article.original_title, variant.title)
+            except Exception as e:
+                db.rollback()
+                logger.warning(f"Could not store translation memory for article {article.id}: {e}")
 
         success_msg = escape_markdown(f"🚀 با موفقیت در کانال {channel.name} منتشر شد.")
-        try:
-            if article.image_url:
-                _run_in_new_loop(
-                    _edit_caption(
-                        settings.TELEGRAM_BOT_TOKEN,
-                        article.admin_chat_id,
-                        article.admin_message_id,
-                        success_msg,
-                        None,
-                    )
-                )
-            else:
-                _run_in_new_loop(
-                    _edit_text(
-                        settings.TELEGRAM_BOT_TOKEN,
-                        article.admin_chat_id,
-                        article.admin_message_id,
-                        success_msg,
-                        None,
-                    )
-                )
-        except Exception:
-            _run_in_new_loop(
-                _send_text(
-                    settings.TELEGRAM_BOT_TOKEN,
-                    article.admin_chat_id,
-                    success_msg,
-                    None,
-                )
-            )
-
+        _notify_admin_message(article, success_msg, publications.publish_keyboard(article.id, remaining) if remaining else None)
         logger.info(f"Article {article.id} published to {channel.name}")
     except Exception as e:
         if db.is_active:
             db.rollback()
+        if not claimed:
+            # خطا پیش از ادعای انتشار (مثلا در دسترس نبودن دیتابیس)؛ پیامی برای ویرایش در دست نیست
+            logger.error(f"Failed to load article {article_id} for publication: {e}")
+            raise retry_task(self, e)
+        # ادعای این کانال حذف می‌شود تا retry یا مدیر بتواند دوباره آن را منتشر کند؛ اگر در هیچ کانال دیگری
+        # منتشر یا در حال انتشار نباشد، مقاله هم به وضعیت قبل برمی‌گردد
+        publications.release(db, article_id, channel_id)
+        if not publications.channel_states(db, article_id):
+            transition(db, article_id, 'publishing', 'sent_for_publication')
         error_msg = escape_markdown(f"⚠️ خطا در انتشار به کانال {channel.name}: {e}")
-        try:
-            if article.image_url:
-                _run_in_new_loop(
-                    _edit_caption(
-                        settings.TELEGRAM_BOT_TOKEN,
-                        article.admin_chat_id,
-                        article.admin_message_id,
-                        error_msg,
-                        None,
-                    )
-                )
-            else:
-                _run_in_new_loop(
-                    _edit_text(
-                        settings.TELEGRAM_BOT_TOKEN,
-                        article.admin_chat_id,
-                        article.admin_message_id,
-                        error_msg,
-                        None,
-                    )
+        remaining = publications.pending_channels(db, article)
+        _notify_admin_message(article, error_msg, publications.publish_keyboard(article.id, remaining) if remaining else None)
+        logger.error(f"Failed to publish article {article.id} to channel {channel.name}: {e}")
+        raise retry_task(self, e)
+    finally:
+        db.close()
+
+
+def _notify_admin_message(article: Article, text: str, reply_markup):
+    """پیام مدیر را ویرایش می‌کند و اگر ویرایش ممکن نباشد پیام جدیدی می‌فرستد."""
+    try:
+        if article.image_url:
+            _run_in_new_loop(
+                _edit_caption(
+                    settings.TELEGRAM_BOT_TOKEN,
+                    article.admin_chat_id,
+                    article.admin_message_id,
+                    text,
+                    reply_markup,
                 )
-        except Exception:
+            )
+        else:
             _run_in_new_loop(
-                _send_text(
+                _edit_text(
                     settings.TELEGRAM_BOT_TOKEN,
                     article.admin_chat_id,
-                    error_msg,
-                    None,
+                    article.admin_message_id,
+                    text,
+                    reply_markup,
                 )
             )
-        logger.error(f"Failed to publish article {article.id} to channel {channel.name}: {e}")
-        raise self.retry(exc=e)
-    finally:
-        db.close()
+    except Exception:
+        _run_in_new_loop(
+            _send_text(
+                settings.TELEGRAM_BOT_TOKEN,
+                article.admin_chat_id,
+                text,
+                reply_markup,
+            )
+        )
 
 # اینجا اضافه شد        
 @celery_app.task(bind=True)
-def wait_for_processing_and_notify_task(self, results):
+def wait_for_processing_and_notify_task(self, results, lock_token: str = None):
     """
     منتظر می‌ماند تا تمام مقالات با وضعیت 'new' پردازش شوند، سپس به مدیران اطلاع می‌دهد.
+    در پایان، قفل چرخه fetch را آزاد می‌کند.
     """
+    try:
+        _wait_for_new_articles_and_notify(lock_token)
+    finally:
+        release_lock(FETCH_CYCLE_LOCK, lock_token)
+
+
+def _wait_for_new_articles_and_notify(lock_token: str = None):
     logger.info("تمام fetcher ها کار خود را تمام کردند. شروع به نظارت برای اتمام پردازش مقالات 'new'.")
 
     max_tries = 5
     tries = 0
 
     while tries < max_tries:
+        extend_lock(FETCH_CYCLE_LOCK, lock_token, settings.FETCH_CYCLE_LOCK_TTL)
         db: Session = SessionLocal()  # <--- نشست جدید در هر بار تکرار حلقه ایجاد می‌شود
         try:
             new_articles_count = db.query(Article).filter(Article.status == 'new').count()
@@ -616,4 +1114,9 @@ def wait_for_processing_and_notify_task(self, results):
         tries += 1
         time.sleep(10)
 
-    logger.warning(f"زمان انتظار برای پردازش مقالات 'new' به پایان رسید.")
\ No newline at end of file
+    logger.warning(f"زمان انتظار برای پردازش مقالات 'new' به پایان رسید.")
+    # مقالاتی که هنوز ترجمه یا نمره ندارند (مثلا وظیفه‌ای که گم شده) از طریق stream دوباره dispatch می‌شوند
+    try:
+        add_stream_request("preprocess_requests", {"trigger": "stalled"})
+    except Exception as e:
+        logger.warning(f"Could not request preprocess re-dispatch: {e}")
\ No newline at end of file
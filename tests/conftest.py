@@ -0,0 +1,67 @@
+import importlib
+import os
+import sys
+import types
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+
+@pytest.fixture
+def reimport(monkeypatch):
+    """
+    ماژول را از نو import می‌کند تا stub های همین تست را ببیند؛ ماژول قبلی (و attribute بسته والد)
+    پس از تست برگردانده می‌شود تا تست‌های دیگر نسخه‌ای که به stub ها بسته شده را نبینند.
+    """
+    def _reimport(name):
+        parent, _, child = name.rpartition(".")
+        if parent and parent in sys.modules:
+            monkeypatch.delattr(sys.modules[parent], child, raising=False)
+        monkeypatch.delitem(sys.modules, name, raising=False)
+        return importlib.import_module(name)
+
+    return _reimport
+
+
+@pytest.fixture
+def sqlite_db(monkeypatch, reimport):
+    """core.db_models واقعی روی یک پایگاه SQLite درون حافظه؛ core.database با یک stub جایگزین می‌شود."""
+    # test_eventloop ماژول sqlalchemy.orm را با یک stub جایگزین می‌کند
+    if not hasattr(sys.modules.get("sqlalchemy.orm"), "sessionmaker"):
+        monkeypatch.delitem(sys.modules, "sqlalchemy.orm", raising=False)
+
+    import sqlalchemy.dialects
+    from sqlalchemy import create_engine, Text
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.ext.declarative import declarative_base
+    from sqlalchemy.pool import StaticPool
+
+    mysql_dialect = types.ModuleType("sqlalchemy.dialects.mysql")
+    mysql_dialect.LONGTEXT = Text
+    monkeypatch.setitem(sys.modules, "sqlalchemy.dialects.mysql", mysql_dialect)
+    monkeypatch.setattr(sqlalchemy.dialects, "mysql", mysql_dialect, raising=False)
+
+    Base = declarative_base()
+    engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    database = types.ModuleType("core.database")
+    database.Base = Base
+    database.engine = engine
+    database.SessionLocal = sessionmaker(bind=engine)
+
+    def get_db():
+        db = database.SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    database.get_db = get_db
+    monkeypatch.setitem(sys.modules, "core.database", database)
+    models = reimport("core.db_models")
+    Base.metadata.create_all(bind=engine)
+
+    db = database.SessionLocal()
+    yield types.SimpleNamespace(session=db, models=models, SessionLocal=database.SessionLocal)
+    db.close()
+    engine.dispose()
@@ -0,0 +1,59 @@
+import importlib
+import os
+import sys
+import types
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+
+@pytest.fixture
+def config_cache(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    config = types.ModuleType("core.config")
+    config.settings = types.SimpleNamespace(REDIS_URL="redis://fake", CONFIG_CACHE_TTL=300)
+    monkeypatch.setitem(sys.modules, "core.config", config)
+    database = types.ModuleType("core.database")
+    database.SessionLocal = lambda: None
+    monkeypatch.setitem(sys.modules, "core.database", database)
+    models = types.ModuleType("core.db_models")
+    models.Source = models.Channel = models.source_channel_map = object
+    monkeypatch.setitem(sys.modules, "core.db_models", models)
+    for name in ("core.config_cache", "core.redis_client"):
+        monkeypatch.delitem(sys.modules, name, raising=False)
+
+    redis_client = importlib.import_module("core.redis_client")
+    server = fakeredis.FakeRedis()
+    monkeypatch.setattr(redis_client, "get_redis", lambda: server)
+    # thread شنونده pub/sub اجرا نمی‌شود؛ پیام‌های پردازه‌های دیگر با _dispatch شبیه‌سازی می‌شوند
+    monkeypatch.setattr(redis_client, "ensure_event_listener", lambda: None)
+    module = importlib.import_module("core.config_cache")
+    monkeypatch.setattr(module, "ensure_event_listener", lambda: None)
+    loads = []
+
+    def load():
+        loads.append(1)
+        return module.ConfigSnapshot([], [])
+
+    monkeypatch.setattr(module, "_load", load)
+    yield module, redis_client, loads
+    for name in ("core.config_cache", "core.redis_client"):
+        sys.modules.pop(name, None)
+
+
+def test_snapshot_is_cached_until_a_config_event(config_cache):
+    module, redis_client, loads = config_cache
+    first = module.get_config()
+    assert module.get_config() is first
+    assert len(loads) == 1
+
+    # تغییر در همین پردازه (دستور ادمین)
+    module.notify_config_changed()
+    second = module.get_config()
+    assert second is not first and len(loads) == 2
+
+    # رویدادی که از پردازه دیگری از طریق pub/sub می‌رسد
+    redis_client._dispatch(module.CONFIG_EVENT, "")
+    assert module.get_config() is not second and len(loads) == 3
+    assert module.get_config() is module.get_config() and len(loads) == 3
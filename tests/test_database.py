@@ -0,0 +1,70 @@
+import importlib
+import os
+import sys
+import types
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+
+@pytest.fixture
+def database(monkeypatch, tmp_path):
+    # test_eventloop ماژول sqlalchemy.orm را با یک stub جایگزین می‌کند
+    if not hasattr(sys.modules.get("sqlalchemy.orm"), "sessionmaker"):
+        monkeypatch.delitem(sys.modules, "sqlalchemy.orm", raising=False)
+    config = types.ModuleType("core.config")
+    config.settings = types.SimpleNamespace(
+        DATABASE_URL=f"sqlite:///{tmp_path / 'pool.db'}", DB_POOL_SIZE=2, DB_MAX_OVERFLOW=1,
+        DB_POOL_RECYCLE=1800, DB_POOL_PRE_PING=True, DB_POOL_TIMEOUT=1,
+        TRACE_EXPORT_PATH="", TRACE_COLLECTOR_URL="",
+    )
+    monkeypatch.setitem(sys.modules, "core.config", config)
+    monkeypatch.delitem(sys.modules, "core.database", raising=False)
+    module = importlib.import_module("core.database")
+    yield module
+    module.engine.dispose()
+    sys.modules.pop("core.database", None)
+
+
+def test_server_databases_get_a_sized_timed_pool(database):
+    assert database._engine_kwargs("sqlite:///bench.db") == {}
+    kwargs = database._engine_kwargs("mysql+mysqlconnector://user@db/robopost")
+    assert kwargs["poolclass"] is database.TimedQueuePool
+    assert (kwargs["pool_size"], kwargs["max_overflow"], kwargs["pool_timeout"]) == (2, 1, 1)
+    assert kwargs["pool_pre_ping"] and kwargs["pool_recycle"] == 1800
+
+    from sqlalchemy import create_engine
+    from sqlalchemy.exc import TimeoutError as PoolTimeout
+    engine = create_engine(database.settings.DATABASE_URL, poolclass=database.TimedQueuePool,
+                           pool_size=2, max_overflow=1, pool_timeout=0.1)
+    before = database.pool_metrics.checkouts
+    connections = [engine.connect() for _ in range(3)]
+    # pool_size + max_overflow اتصال همزمان؛ بعدی پس از pool_timeout خطا می‌دهد
+    with pytest.raises(PoolTimeout):
+        engine.connect()
+    for connection in connections:
+        connection.close()
+    assert database.pool_metrics.checkouts - before == 4
+    assert database.pool_metrics.checkout_wait_max >= 0.1
+    engine.dispose()
+
+
+def test_forked_child_gets_a_fresh_pool_without_closing_inherited_connections(database):
+    from sqlalchemy import text
+    with database.engine.connect() as connection:
+        connection.execute(text("select 1"))
+    inherited_pool = database.engine.pool
+    inherited = inherited_pool.connect()
+    inherited_dbapi = inherited.dbapi_connection
+
+    database.dispose_engine_after_fork()
+
+    assert database.engine.pool is not inherited_pool
+    # اتصال والد دست نخورده می‌ماند و فرزند اتصال جدید خودش را باز می‌کند
+    assert inherited_dbapi.execute("select 1").fetchone() == (1,)
+    connects = database.pool_metrics.connects
+    with database.engine.connect() as connection:
+        connection.execute(text("select 1"))
+    assert database.pool_metrics.connects == connects + 1
+    inherited.close()
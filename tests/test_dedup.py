@@ -0,0 +1,75 @@
+import importlib
+import os
+import sys
+import types
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+SETTINGS = types.SimpleNamespace(DEDUP_MAX_DISTANCE=8, DEDUP_WINDOW_HOURS=48, DEDUP_LEAD_WORDS=40)
+LEAD = (
+    "<p>Officials said on Tuesday that the central bank will raise interest rates by half a point "
+    "to fight inflation, the largest increase in two decades, amid growing pressure from markets.</p>"
+)
+REWORDED_LEAD = (
+    "The central bank will raise interest rates by half a point to fight inflation, officials said "
+    "Tuesday, the largest increase in two decades."
+)
+OTHER_LEAD = (
+    "The central bank said it would hold interest rates steady on Tuesday as inflation eased, "
+    "surprising markets that expected a cut."
+)
+
+
+@pytest.fixture
+def dedup(monkeypatch):
+    # core.config واقعی به متغیرهای محیطی نیاز دارد؛ stub فقط برای این تست و بدون ماندن در sys.modules
+    stub = types.ModuleType("core.config")
+    stub.settings = SETTINGS
+    monkeypatch.setitem(sys.modules, "core.config", stub)
+    for name in ("core.dedup", "core.redis_client"):
+        monkeypatch.delitem(sys.modules, name, raising=False)
+    module = importlib.import_module("core.dedup")
+    yield module
+    for name in ("core.dedup", "core.redis_client"):
+        sys.modules.pop(name, None)
+
+
+def test_syndicated_copies_are_near_duplicates(dedup):
+    original = dedup.simhash("Central bank raises interest rates by half a point", LEAD)
+    suffixed = dedup.simhash("Central bank raises interest rates by half a point - Reuters", LEAD)
+    reworded = dedup.simhash("Central bank raises rates by half point to fight inflation", REWORDED_LEAD)
+    other = dedup.simhash("Central bank holds interest rates steady", OTHER_LEAD)
+    assert suffixed == original
+    assert dedup.hamming(original, reworded) <= SETTINGS.DEDUP_MAX_DISTANCE
+    assert dedup.hamming(original, other) > SETTINGS.DEDUP_MAX_DISTANCE
+
+
+def test_fingerprints_within_distance_share_a_band(dedup):
+    base = dedup.simhash("Central bank raises interest rates", LEAD)
+    # هشت بیت متفاوت در هشت باند مختلف؛ باند نهم باید یکسان بماند
+    near = base
+    for band in range(8):
+        near ^= 1 << (band * 7)
+    assert dedup.hamming(base, near) == 8
+    assert len(dedup.bands(base)) == SETTINGS.DEDUP_MAX_DISTANCE + 1
+    assert any(x == y for x, y in zip(dedup.bands(base), dedup.bands(near)))
+
+
+def test_forgotten_articles_are_no_longer_canonical(dedup, monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeRedis()
+    monkeypatch.setattr(dedup, "get_redis", lambda: server)
+    original = dedup.simhash("Central bank raises interest rates by half a point", LEAD)
+    reworded = dedup.simhash("Central bank raises rates by half point to fight inflation", REWORDED_LEAD)
+    dedup.index_article(1, original)
+    dedup.index_article(2, reworded)
+    assert dedup.find_canonical(original) == (1, 0)
+
+    # cleanup_db_job مقاله ۱ را پاک کرده است؛ نزدیک‌ترین مقاله باقی‌مانده برگردانده می‌شود
+    dedup.forget([1, 99])
+    assert dedup.find_canonical(original)[0] == 2
+    dedup.forget([2])
+    assert dedup.find_canonical(original) is None
+    assert not server.keys(f"{dedup.ARTICLE_PREFIX}:*")
@@ -4,6 +4,8 @@ import sys
 import types
 from unittest.mock import AsyncMock, patch
 
+import pytest
+
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 dummy = types.ModuleType("dummy")
@@ -18,6 +20,7 @@ sys.modules.setdefault("newspaper", newspaper)
 
 celery = types.ModuleType("celery")
 celery.chord = lambda *a, **k: None
+celery.chain = lambda *a, **k: None
 sys.modules.setdefault("celery", celery)
 
 celery_utils = types.ModuleType("celery.utils.log")
@@ -68,13 +71,21 @@ core_db_models_mod = types.ModuleType("core.db_models")
 core_db_models_mod.Source = object
 core_db_models_mod.Article = object
 core_db_models_mod.Channel = object
+core_db_models_mod.source_channel_map = object
+core_db_models_mod.ArticleTransition = object
+core_db_models_mod.ArticleTranslation = object
+core_db_models_mod.TranslationMemory = object
+core_db_models_mod.GlossaryTerm = object
+core_db_models_mod.LLMUsage = object
+core_db_models_mod.LLMUsageDaily = object
+core_db_models_mod.ArticlePublication = object
 sys.modules.setdefault("core.db_models", core_db_models_mod)
 
 core_config_mod = types.ModuleType("core.config")
-core_config_mod.settings = types.SimpleNamespace(TELEGRAM_BOT_TOKEN="", admin_ids_list=[])
+core_config_mod.settings = types.SimpleNamespace(TELEGRAM_BOT_TOKEN="", TELEGRAM_API_BASE_URL="", admin_ids_list=[])
 sys.modules.setdefault("core.config", core_config_mod)
 
-from tasks import _run_in_new_loop, _send_text, _send_photo, _edit_text, _edit_caption
+from tasks import _run_in_new_loop, _send_text, _send_photo, _edit_text, _edit_caption, _entry_languages
 
 async def dummy():
     return "ok"
@@ -134,3 +145,107 @@ def test_edit_caption_helper_runs(mock_bot_cls):
     mock_context.edit_message_caption.assert_awaited_once()
     mock_bot.__aenter__.assert_awaited_once()
     mock_bot.__aexit__.assert_awaited_once()
+
+def test_build_translation_only_summarizes_same_language():
+    calls = []
+
+    def fake_llm(prompt, prompt_type):
+        calls.append(prompt_type)
+        return f"<{prompt_type}>"
+
+    with patch('tasks._call_llm', side_effect=fake_llm), patch('tasks.prompts.render', return_value="Summarize"):
+        from tasks import _build_translation
+        same = _build_translation("Title", "Body", "en", "en")
+        assert same == {"title": "Title", "content": "Body", "summary": "<summary>"}
+        assert calls == ["summary"]
+
+        calls.clear()
+        # متن کامل در translate_content_task ترجمه می‌شود و منتظر آن نمی‌ماند
+        other = _build_translation("Title", "Body", "en", "fa", known_title="عنوان")
+        assert other == {"title": "عنوان", "content": None, "summary": "<summary>"}
+        assert calls == ["summary"]
+
+        calls.clear()
+        from tasks import _translate_content
+        assert _translate_content("Body", "en", "fa") == "<content>"
+        assert calls == ["content"]
+
+
+def test_build_translation_streams_summary_from_original_content():
+    seen = []
+
+    def fake_llm(prompt, prompt_type, on_text=None):
+        if on_text is None:
+            return f"<{prompt_type}>"
+        assert prompt.endswith("Body")
+        for partial in ("خلا", "خلاصه"):
+            on_text(partial)
+        return "خلاصه"
+
+    def on_summary(title, summary, final=False):
+        seen.append((title, summary, final))
+
+    with patch('tasks._call_llm', side_effect=fake_llm), patch('tasks.prompts.render', return_value="Summarize"):
+        from tasks import _build_translation
+        result = _build_translation("Title", "Body", "en", "fa", known_title="عنوان", on_summary=on_summary)
+    assert result == {"title": "عنوان", "content": None, "summary": "خلاصه"}
+    assert seen == [("عنوان", "خلا", False), ("عنوان", "خلاصه", False), ("عنوان", "خلاصه", True)]
+
+
+def test_build_translation_uses_the_same_summary_prompt_with_and_without_streaming():
+    prompts_seen = {}
+
+    def fake_llm(prompt, prompt_type, on_text=None):
+        if prompt_type == "summary":
+            prompts_seen[on_text is not None] = prompt
+        return f"<{prompt_type}>"
+
+    with patch('tasks._call_llm', side_effect=fake_llm), patch('tasks.prompts.render', return_value="Summarize"):
+        from tasks import _build_translation
+        args = ("Title", "Body", "en", "fa", "عنوان", "Glossary: X = ایکس\n")
+        _build_translation(*args)
+        _build_translation(*args, on_summary=lambda *a, **k: None)
+    assert prompts_seen[False] == prompts_seen[True]
+    assert prompts_seen[False].startswith("Glossary") and prompts_seen[False].endswith("Body")
+
+
+def test_unavailable_model_is_recorded_as_a_failed_call():
+    with patch('tasks.llm_router.choose', return_value="pro"), patch('tasks.llm_router.primary_model', return_value="pro"), \
+            patch('tasks.llm_router.record', return_value="open") as record, patch('tasks.get_llm_model', return_value=None), \
+            patch('tasks.observe_llm_routing'):
+        from tasks import _call_llm
+        with pytest.raises(ConnectionError):
+            _call_llm("prompt", "summary")
+    record.assert_called_once_with("pro", "summary", 0, failed=True)
+
+
+def test_stream_preview_throttles_edits():
+    edits = []
+    with patch('tasks._run_in_new_loop', side_effect=lambda coro: edits.append(coro.close())), \
+            patch('tasks.settings') as settings:
+        settings.LLM_STREAM_EDIT_INTERVAL = 60.0
+        from tasks import _stream_preview
+        update = _stream_preview(1, 2, has_photo=True)
+        update("عنوان", "بخش اول")
+        update("عنوان", "بخش اول و دوم")
+        assert len(edits) == 1
+
+
+class FeedDict(dict):
+    """مثل FeedParserDict: کلیدها به صورت attribute هم خوانده می‌شوند."""
+    __getattr__ = dict.__getitem__
+
+
+def test_ambiguous_entries_take_the_feed_or_majority_language():
+    entries = [
+        FeedDict(title="Central bank raises interest rates for the first time in a decade"),
+        FeedDict(title="Apple earnings", summary=""),
+        FeedDict(title="La banque centrale relève ses taux pour la première fois depuis dix ans"),
+        FeedDict(title="Le gouvernement annonce un plan pour les hôpitaux et les écoles"),
+    ]
+    # تگ language فید بر اکثریت مطالب مقدم است
+    feed = FeedDict(feed=FeedDict(language="de-DE"))
+    assert _entry_languages(feed, entries) == ["en", "de", "fr", "fr"]
+    # بدون تگ، مطلب مبهم زبان اکثریت مطالب همین fetch را می‌گیرد
+    feed = FeedDict(feed=FeedDict())
+    assert _entry_languages(feed, entries) == ["en", "fr", "fr", "fr"]
@@ -0,0 +1,41 @@
+import importlib
+import os
+import sys
+import types
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+
+@pytest.fixture
+def redis_client(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    config = types.ModuleType("core.config")
+    config.settings = types.SimpleNamespace(REDIS_URL="redis://fake")
+    monkeypatch.setitem(sys.modules, "core.config", config)
+    monkeypatch.delitem(sys.modules, "core.redis_client", raising=False)
+    module = importlib.import_module("core.redis_client")
+    server = fakeredis.FakeRedis()
+    monkeypatch.setattr(module, "get_redis", lambda: server)
+    yield module, server
+    sys.modules.pop("core.redis_client", None)
+
+
+def test_lock_is_extended_only_by_its_owner_and_released_at_the_end(redis_client):
+    module, server = redis_client
+    token = module.acquire_lock("fetch_cycle", 10)
+    assert token and module.acquire_lock("fetch_cycle", 10) is None
+
+    # چرخه طولانی مهلت قفل را تمدید می‌کند؛ توکن دیگر یا خالی اثری ندارد
+    assert not module.extend_lock("fetch_cycle", "other", 600)
+    assert not module.extend_lock("fetch_cycle", None, 600)
+    assert server.ttl("fetch_cycle") <= 10
+    assert module.extend_lock("fetch_cycle", token, 600)
+    assert server.ttl("fetch_cycle") > 10
+
+    assert not module.release_lock("fetch_cycle", "other")
+    assert module.release_lock("fetch_cycle", token)
+    # پس از آزاد شدن، تمدید قفل دیگر آن را زنده نمی‌کند و چرخه بعدی قفل را می‌گیرد
+    assert not module.extend_lock("fetch_cycle", token, 600)
+    assert module.acquire_lock("fetch_cycle", 10)
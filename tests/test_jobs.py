@@ -0,0 +1,113 @@
+import asyncio
+import contextlib
+import sys
+import types
+from datetime import datetime, timedelta
+
+import pytest
+
+
+@pytest.fixture
+def jobs(monkeypatch, sqlite_db, reimport):
+    fakeredis = pytest.importorskip("fakeredis")
+    config = types.ModuleType("core.config")
+    config.settings = types.SimpleNamespace(
+        REDIS_URL="redis://fake", PREPROCESS_SCAN_BATCH=2, DISPATCH_DEDUP_TTL=600,
+        DEDUP_MAX_DISTANCE=8, DEDUP_WINDOW_HOURS=96, DEDUP_LEAD_WORDS=40,
+    )
+    monkeypatch.setitem(sys.modules, "core.config", config)
+    tracing = types.ModuleType("core.tracing")
+    tracing.span = lambda *a, **k: contextlib.nullcontext()
+    tracing.article_trace_id = str
+    monkeypatch.setitem(sys.modules, "core.tracing", tracing)
+    monkeypatch.setitem(sys.modules, "core.llm_usage", types.ModuleType("core.llm_usage"))
+    telegram_ext = types.ModuleType("telegram.ext")
+    telegram_ext.ContextTypes = types.SimpleNamespace(DEFAULT_TYPE=object)
+    monkeypatch.setitem(sys.modules, "telegram.ext", telegram_ext)
+
+    sent, broken = [], set()
+
+    class Signature:
+        def __init__(self, name, article_id):
+            self.name, self.article_id = name, article_id
+
+        def delay(self):
+            if (self.name, self.article_id) in broken:
+                raise ConnectionError("broker unavailable")
+            sent.append((self.name, self.article_id))
+
+    celery_app = types.ModuleType("celery_app")
+    celery_app.task_signature = Signature
+    monkeypatch.setitem(sys.modules, "celery_app", celery_app)
+    # تست‌های دیگر utils را با stub جایگزین می‌کنند
+    if "utils" in sys.modules and not getattr(sys.modules["utils"], "__file__", None):
+        monkeypatch.delitem(sys.modules, "utils")
+
+    redis_client = reimport("core.redis_client")
+    server = fakeredis.FakeRedis()
+    monkeypatch.setattr(redis_client, "get_redis", lambda: server)
+    reimport("core.dedup")
+    module = reimport("handlers.jobs")
+    return module, sqlite_db, sent, broken
+
+
+def test_new_articles_are_paged_by_id_and_dispatched_once(jobs):
+    module, db, sent, broken = jobs
+    Article = db.models.Article
+    for i in range(5):
+        db.session.add(Article(source_name="BBC", original_url=f"https://bbc.test/{i}", original_title=f"t{i}", status="new"))
+    db.session.add(Article(source_name="BBC", original_url="https://bbc.test/old", original_title="old", status="approved"))
+    db.session.commit()
+    db.session.get(Article, 2).translated_title = "done"
+    db.session.get(Article, 3).news_value_score = 7
+    db.session.commit()
+
+    # با PREPROCESS_SCAN_BATCH=2 پیمایش سه صفحه دارد و هیچ مقاله‌ای جا نمی‌افتد
+    module.dispatch_preprocess_tasks()
+    assert sorted(sent) == sorted(
+        [("translate_title_task", i) for i in (1, 3, 4, 5)] + [("score_title_task", i) for i in (1, 2, 4, 5)]
+    )
+
+    sent.clear()
+    module.dispatch_preprocess_tasks()
+    assert sent == []
+
+
+def test_failed_publish_releases_the_claim_so_the_next_run_retries(jobs):
+    module, db, sent, broken = jobs
+    db.session.add(db.models.Article(source_name="BBC", original_url="https://bbc.test/1", original_title="t", status="new"))
+    db.session.commit()
+
+    broken.add(("score_title_task", 1))
+    with pytest.raises(ConnectionError):
+        module.dispatch_preprocess_tasks()
+    assert sent == [("translate_title_task", 1)]
+
+    broken.clear()
+    module.dispatch_preprocess_tasks()
+    assert sent == [("translate_title_task", 1), ("score_title_task", 1)]
+
+
+def test_cleanup_removes_deleted_articles_from_the_dedup_index(jobs):
+    module, db, sent, broken = jobs
+    Article, now = db.models.Article, datetime.utcnow()
+    rows = [
+        ("rejected", now - timedelta(days=3), "Central bank raises interest rates by half a point"),
+        ("new", now - timedelta(hours=30), "Parliament approves the new budget after long debate"),
+        ("new", now - timedelta(hours=2), "Storm closes schools and airports across the north"),
+    ]
+    fingerprints = []
+    for i, (status, created_at, title) in enumerate(rows):
+        db.session.add(Article(source_name="BBC", original_url=f"https://bbc.test/{i}", original_title=title,
+                               status=status, created_at=created_at))
+        fingerprints.append(module.dedup.simhash(title))
+    db.session.commit()
+    for article_id, fingerprint in enumerate(fingerprints, start=1):
+        module.dedup.index_article(article_id, fingerprint)
+
+    asyncio.run(module.cleanup_db_job(None))
+
+    assert [a.id for a in db.session.query(Article).all()] == [3]
+    assert module.dedup.find_canonical(fingerprints[0]) is None
+    assert module.dedup.find_canonical(fingerprints[1]) is None
+    assert module.dedup.find_canonical(fingerprints[2]) == (3, 0)
@@ -0,0 +1,22 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from core.language import detect_language, normalize_code, source_language
+
+
+def test_detects_script_and_common_words():
+    assert detect_language("Central bank raises interest rates for the first time in a decade") == "en"
+    assert detect_language("<p>La banque centrale relève ses taux pour la première fois depuis dix ans</p>") == "fr"
+    assert detect_language("بانک مرکزی نرخ بهره را برای نخستین بار در یک دهه افزایش داد") == "fa"
+    assert detect_language("البنك المركزي يرفع أسعار الفائدة لأول مرة منذ عقد") == "ar"
+    assert detect_language("Центральный банк повысил ключевую ставку") == "ru"
+
+
+def test_ambiguous_entries_fall_back_to_the_source_language():
+    assert detect_language("Apple earnings") is None
+    assert normalize_code("en-US") == "en"
+    assert source_language("fa-IR", ["en"]) == "fa"
+    assert source_language("", [None, "de", "de", "en"]) == "de"
+    assert source_language(None, [None]) == "en"
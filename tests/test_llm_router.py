@@ -0,0 +1,57 @@
+import os
+import sys
+import types
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+
+@pytest.fixture
+def router(monkeypatch):
+    config = types.ModuleType("core.config")
+    config.settings = types.SimpleNamespace(
+        GEMINI_MODEL_NAME="flash", LLM_MODELS="score=lite,summary=pro", LLM_FALLBACK_MODEL="",
+        LLM_BREAKER_WINDOW=10, LLM_BREAKER_MIN_CALLS=4, LLM_BREAKER_ERROR_RATE=0.5,
+        LLM_BREAKER_P95_SECONDS="summary=30,*=10", LLM_BREAKER_COOLDOWN=60,
+    )
+    monkeypatch.setitem(sys.modules, "core.config", config)
+    sys.modules.pop("core.llm_router", None)
+    import core.llm_router as router
+    yield router
+    sys.modules.pop("core.llm_router", None)
+
+
+def test_models_are_selected_per_prompt_type(router):
+    assert router.choose("score") == "lite"
+    assert router.choose("summary") == "pro"
+    assert router.choose("content") == "flash"
+    assert router.fallback_model("content") is None
+    assert router.configured_models() == {"flash", "lite", "pro"}
+
+
+def test_slow_primary_opens_circuit_until_probe_succeeds(router, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(router.time, "monotonic", lambda: now[0])
+    for _ in range(3):
+        assert router.record("pro", "summary", 5.0) == router.CLOSED
+    assert router.record("pro", "summary", 45.0) == router.OPEN
+    assert router.choose("summary") == "flash"
+
+    now[0] += 61
+    assert router.choose("summary") == "pro"    # فراخوانی آزمایشی
+    assert router.choose("summary") == "flash"  # همزمان با آزمایش، بقیه به مدل جایگزین می‌روند
+    assert router.record("pro", "summary", 4.0) == router.CLOSED
+    assert router.choose("summary") == "pro"
+
+
+def test_error_rate_opens_circuit_and_failed_probe_reopens(router, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(router.time, "monotonic", lambda: now[0])
+    for failed in (False, True, False, True):
+        state = router.record("lite", "score", 1.0, failed=failed)
+    assert state == router.OPEN
+    now[0] += 61
+    assert router.choose("score") == "lite"
+    assert router.record("lite", "score", 1.0, failed=True) == router.OPEN
+    assert router.choose("score") == "flash"
@@ -0,0 +1,55 @@
+import os
+import sys
+import types
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+core_database_mod = types.ModuleType("core.database")
+core_database_mod.SessionLocal = lambda: None
+sys.modules.setdefault("core.database", core_database_mod)
+
+core_db_models_mod = types.ModuleType("core.db_models")
+core_db_models_mod.Article = object
+core_db_models_mod.ArticleTransition = object
+sys.modules.setdefault("core.db_models", core_db_models_mod)
+
+from core.pipeline_stats import percentile, stage_durations, summarize, stats_http_route
+
+
+def test_percentile_interpolates():
+    values = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10]
+    assert percentile(values, 50) == 5.5
+    assert percentile(values, 99) == 9.91
+    assert percentile([], 95) == 0.0
+    assert percentile([7], 95) == 7.0
+
+
+def test_stage_durations_follow_article_history():
+    t0 = datetime(2026, 1, 1, 12, 0, 0)
+    rows = [
+        (1, "src", None, "fetching", t0),
+        (1, "src", "fetching", "new", t0 + timedelta(seconds=2)),
+        (1, "src", "new", "pending_initial_approval", t0 + timedelta(seconds=12)),
+        (1, "src", "pending_initial_approval", "approved", t0 + timedelta(seconds=72)),
+        (2, "other", None, "new", t0),
+        (2, "other", "new", "failed", t0 + timedelta(seconds=5)),
+    ]
+    durations = stage_durations(rows)
+    assert durations == [
+        ("fetch", "src", 2.0),
+        ("preprocess", "src", 10.0),
+        ("admin_wait", "src", 60.0),
+    ]
+
+    summary = summarize(durations)
+    assert list(summary) == ["fetch", "preprocess", "admin_wait"]
+    assert summary["admin_wait"]["p95"] == 60.0
+    assert summary["admin_wait"]["sources"]["src"]["count"] == 1
+    # مراحلی که قبل از بازه گزارش تمام شده‌اند حساب نمی‌شوند
+    assert stage_durations(rows, since=t0 + timedelta(seconds=30)) == [("admin_wait", "src", 60.0)]
+
+
+def test_stats_route_rejects_invalid_hours():
+    status, _content_type, _body = stats_http_route({"hours": ["abc"]})
+    assert status == 400
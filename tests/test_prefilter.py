@@ -0,0 +1,68 @@
+import importlib
+import json
+import os
+import random
+import sys
+import types
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+        self.hashes = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def hmget(self, key, fields):
+        return [self.hashes.get(key, {}).get(f) for f in fields]
+
+
+@pytest.fixture
+def prefilter(monkeypatch, tmp_path):
+    stub = types.ModuleType("core.config")
+    stub.settings = types.SimpleNamespace(
+        PREFILTER_RULES_PATH=str(tmp_path / "rules.json"), PREFILTER_MIN_SAMPLES=10,
+        PREFILTER_ARCHIVE_BELOW=0.05, PREFILTER_ACCEPT_ABOVE=0.95, PREFILTER_LEARNING_RATE=0.1,
+        PREFILTER_FEATURE_BITS=18,
+    )
+    monkeypatch.setitem(sys.modules, "core.config", stub)
+    for name in ("core.prefilter", "core.redis_client"):
+        monkeypatch.delitem(sys.modules, name, raising=False)
+    module = importlib.import_module("core.prefilter")
+    redis = FakeRedis()
+    monkeypatch.setattr(module, "get_redis", lambda: redis)
+    module.fake_redis = redis
+    yield module
+    for name in ("core.prefilter", "core.redis_client"):
+        sys.modules.pop(name, None)
+
+
+def test_rules_run_before_the_model(prefilter):
+    with open(prefilter.settings.PREFILTER_RULES_PATH, "w", encoding="utf-8") as f:
+        json.dump({"*": {"archive": ["horoscope"], "review": ["breaking"]}, "Sport Daily": {"archive": ["transfer rumour"]}}, f)
+    assert prefilter.decide("Your weekly Horoscope", "BBC")[0] == prefilter.ARCHIVE
+    assert prefilter.decide("Breaking: horoscope writer arrested", "BBC")[0] == prefilter.LLM
+    assert prefilter.decide("Latest transfer rumour roundup", "Sport Daily")[0] == prefilter.ARCHIVE
+    assert prefilter.decide("Latest transfer rumour roundup", "BBC") == (prefilter.LLM, None, "model not trained")
+
+
+def test_trained_model_only_decides_confident_headlines(prefilter):
+    rng = random.Random(3)
+    good = ["election", "ceasefire", "parliament", "sanctions", "summit"]
+    bad = ["celebrity", "gossip", "recipe", "outfit", "viral"]
+    examples = [(f"{rng.choice(good)} talks {rng.choice(good)} news", "wire", True) for _ in range(200)]
+    examples += [(f"{rng.choice(bad)} photos {rng.choice(bad)} news", "wire", False) for _ in range(200)]
+    weights = prefilter.train(examples, epochs=5)
+    counts = prefilter.evaluate(weights, examples)
+    assert counts["archived"] > 150 and counts["archived_wrong"] == 0
+    assert counts["accepted_wrong"] == 0
+
+    prefilter.fake_redis.values[prefilter.SAMPLES_KEY] = b"400"
+    prefilter.fake_redis.hashes[prefilter.WEIGHTS_KEY] = {k: str(v).encode() for k, v in weights.items()}
+    assert prefilter.decide("celebrity gossip photos news", "wire")[0] == prefilter.ARCHIVE
+    assert prefilter.decide("Unrelated headline about weather", "wire")[0] == prefilter.LLM
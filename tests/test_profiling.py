@@ -0,0 +1,67 @@
+import sys
+import types
+
+import pytest
+
+
+@pytest.fixture
+def profiling(monkeypatch, tmp_path, reimport):
+    fakeredis = pytest.importorskip("fakeredis")
+    config = types.ModuleType("core.config")
+    config.settings = types.SimpleNamespace(
+        REDIS_URL="redis://fake", PROFILING_SAMPLE_RATE=0.0, PROFILING_TASKS="", PROFILING_DIR=str(tmp_path),
+    )
+    monkeypatch.setitem(sys.modules, "core.config", config)
+    # test_eventloop ماژول celery را با یک stub جایگزین می‌کند
+    for name in [n for n in sys.modules if n == "celery" or n.startswith("celery.")]:
+        if not getattr(sys.modules[name], "__file__", None):
+            monkeypatch.delitem(sys.modules, name)
+    redis_client = reimport("core.redis_client")
+    server = fakeredis.FakeRedis()
+    monkeypatch.setattr(redis_client, "get_redis", lambda: server)
+    monkeypatch.setattr(redis_client, "ensure_event_listener", lambda: None)
+    module = reimport("core.profiling")
+    monkeypatch.setattr(module, "get_redis", lambda: server)
+    module.install()
+    yield module, config.settings
+    # سیگنال‌های celery سراسری‌اند؛ نباید به تست‌های بعدی نشت کنند
+    module.apply_sample_rate(0)
+
+
+class FakeTask:
+    def __init__(self, name):
+        self.name = name
+
+
+def run_task(name):
+    from celery.signals import task_prerun, task_postrun
+    task = FakeTask(f"tasks.{name}")
+    task_prerun.send(sender=task, task_id="1", task=task)
+    sum(i * i for i in range(10_000))
+    task_postrun.send(sender=task, task_id="1", task=task)
+
+
+def test_sampler_connects_only_while_the_rate_is_positive(profiling):
+    module, settings = profiling
+    from celery.signals import task_prerun
+    receivers = len(task_prerun.receivers)
+    run_task("fetch_source_task")
+    assert module.hotspots() == {}
+
+    # دستور ادمین از طریق Redis و رویداد pub/sub به همه پردازه‌ها می‌رسد
+    module.set_sample_rate(1.0)
+    assert module.current_sample_rate() == 1.0
+    assert len(task_prerun.receivers) == receivers + 1
+    run_task("fetch_source_task")
+    report = module.hotspots()
+    assert report["fetch_source_task"]["samples"] == 1 and report["fetch_source_task"]["rows"]
+
+    module.set_sample_rate(0)
+    assert len(task_prerun.receivers) == receivers
+    run_task("fetch_source_task")
+    assert module.hotspots()["fetch_source_task"]["samples"] == 1
+
+    # حذف مقدار Redis به نرخ تنظیمات برمی‌گردد
+    settings.PROFILING_SAMPLE_RATE = 0.5
+    module.set_sample_rate(None)
+    assert module.current_sample_rate() == 0.5
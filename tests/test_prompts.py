@@ -0,0 +1,41 @@
+import os
+import sys
+import types
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+
+@pytest.fixture
+def registry(monkeypatch, tmp_path):
+    config = types.ModuleType("core.config")
+    config.settings = types.SimpleNamespace(PROMPTS_DIR=str(tmp_path), PROMPT_RELOAD_INTERVAL=0)
+    monkeypatch.setitem(sys.modules, "core.config", config)
+    redis_client = types.ModuleType("core.redis_client")
+    redis_client.on_event = lambda *a: None
+    redis_client.publish_event = lambda *a: None
+    monkeypatch.setitem(sys.modules, "core.redis_client", redis_client)
+    sys.modules.pop("core.prompts", None)
+    import core.prompts as prompts
+    (tmp_path / "summary_prompt.txt").write_text("Summarize in {language}. Keep {braces} as is.\n", encoding="utf-8")
+    yield prompts, tmp_path
+    sys.modules.pop("core.prompts", None)
+
+
+def test_render_fills_placeholders_and_missing_files_are_empty(registry):
+    prompts, _ = registry
+    assert prompts.render("summary", language="German") == "Summarize in German. Keep {braces} as is."
+    assert prompts.render("score") == ""
+
+
+def test_changed_file_is_reloaded_with_a_new_version(registry):
+    prompts, tmp_path = registry
+    before = prompts.versions()["summary"], prompts.version()
+    path = tmp_path / "summary_prompt.txt"
+    path.write_text("Briefly summarize in {language}.", encoding="utf-8")
+    os.utime(path, (1, 1))  # mtime متفاوت حتی روی فایل‌سیستم‌هایی با دقت زمانی کم
+
+    assert prompts.render("summary", language="French") == "Briefly summarize in French."
+    assert (prompts.versions()["summary"], prompts.version()) != before
+    assert prompts.reload() is False
@@ -0,0 +1,74 @@
+import os
+import sys
+import types
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+
+def setup_db(monkeypatch):
+    # test_eventloop ماژول sqlalchemy.orm را با یک stub جایگزین می‌کند
+    if not hasattr(sys.modules.get("sqlalchemy.orm"), "sessionmaker"):
+        sys.modules.pop("sqlalchemy.orm", None)
+
+    from sqlalchemy import create_engine, Text
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.ext.declarative import declarative_base
+    from sqlalchemy.pool import StaticPool
+
+    mysql_dialect = types.ModuleType("sqlalchemy.dialects.mysql")
+    mysql_dialect.LONGTEXT = Text
+    sys.modules["sqlalchemy.dialects.mysql"] = mysql_dialect
+    import sqlalchemy.dialects as _dials
+    _dials.mysql = mysql_dialect
+
+    Base = declarative_base()
+    engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    core_database_mod = types.ModuleType("core.database")
+    core_database_mod.Base = Base
+    core_database_mod.SessionLocal = sessionmaker(bind=engine)
+    sys.modules["core.database"] = core_database_mod
+
+    channels = [
+        types.SimpleNamespace(id=1, name="fa", target_language_code="fa", is_active=True),
+        types.SimpleNamespace(id=2, name="en", target_language_code="en", is_active=True),
+        types.SimpleNamespace(id=3, name="old", target_language_code="de", is_active=False),
+    ]
+    snapshot = types.SimpleNamespace(
+        get_source_by_name=lambda name: name,
+        channels_for_source=lambda source: channels if source == "BBC" else [],
+    )
+    config_cache = types.ModuleType("core.config_cache")
+    config_cache.get_config = lambda: snapshot
+    monkeypatch.setitem(sys.modules, "core.config_cache", config_cache)
+
+    sys.modules.pop("core.db_models", None)
+    sys.modules.pop("core.publications", None)
+    import core.publications as publications  # type: ignore
+    import core.db_models as models  # type: ignore
+
+    Base.metadata.create_all(bind=engine)
+    return core_database_mod.SessionLocal(), publications, models
+
+
+def test_each_channel_is_claimed_once_and_tracked_until_all_are_published(monkeypatch):
+    db, publications, models = setup_db(monkeypatch)
+    article = models.Article(source_name="BBC", original_url="https://bbc.test/1", original_title="t", status="publishing")
+    db.add(article)
+    db.commit()
+
+    assert publications.claim(db, article.id, 1)
+    assert not publications.claim(db, article.id, 1)
+    assert [c.id for c in publications.pending_channels(db, article)] == [1, 2]
+
+    publications.mark_published(db, article.id, 1)
+    assert [c.id for c in publications.pending_channels(db, article)] == [2]
+
+    # ادعای ناموفق آزاد می‌شود تا retry دوباره آن را بگیرد؛ کانال منتشر شده آزاد نمی‌شود
+    assert publications.claim(db, article.id, 2)
+    publications.release(db, article.id, 2)
+    publications.release(db, article.id, 1)
+    assert publications.channel_states(db, article.id) == {1: publications.PUBLISHED}
+    assert publications.claim(db, article.id, 2)
+    publications.mark_published(db, article.id, 2)
+    assert publications.pending_channels(db, article) == []
+    sys.modules.pop("core.publications", None)
@@ -0,0 +1,84 @@
+import os
+import sys
+import types
+from datetime import timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+
+@pytest.fixture
+def retry(monkeypatch):
+    config = types.ModuleType("core.config")
+    config.settings = types.SimpleNamespace(RETRY_BASE_SECONDS=10.0, RETRY_MAX_SECONDS=100.0)
+    monkeypatch.setitem(sys.modules, "core.config", config)
+    sys.modules.pop("core.retry", None)
+    import core.retry as retry
+    yield retry
+    sys.modules.pop("core.retry", None)
+
+
+# کلاس‌هایی هم‌نام خطاهای telegram / requests؛ طبقه‌بندی فقط به نام و کد وضعیت نگاه می‌کند
+class NetworkError(Exception):
+    pass
+
+
+class BadRequest(NetworkError):
+    pass
+
+
+class TimedOut(NetworkError):
+    pass
+
+
+class RetryAfter(NetworkError):
+    def __init__(self, retry_after):
+        super().__init__("Flood control exceeded")
+        self.retry_after = retry_after
+
+
+class HTTPError(OSError):
+    def __init__(self, status, headers=None):
+        super().__init__(f"HTTP {status}")
+        self.response = types.SimpleNamespace(status_code=status, headers=headers or {})
+
+
+def test_errors_are_classified(retry):
+    assert retry.classify(BadRequest("Chat not found")) == (retry.PERMANENT, None)
+    assert retry.classify(TimedOut("Timed out")) == (retry.TRANSIENT, None)
+    assert retry.classify(RetryAfter(timedelta(seconds=12))) == (retry.RATE_LIMITED, 12.0)
+    assert retry.classify(HTTPError(404)) == (retry.PERMANENT, None)
+    assert retry.classify(HTTPError(503)) == (retry.TRANSIENT, None)
+    assert retry.classify(HTTPError(429, {"Retry-After": "30"})) == (retry.RATE_LIMITED, 30.0)
+    assert retry.classify(ConnectionResetError()) == (retry.TRANSIENT, None)
+    assert retry.classify(ValueError("Newspaper parse failed")) == (retry.PERMANENT, None)
+    try:
+        try:
+            raise HTTPError(502)
+        except HTTPError as e:
+            raise ValueError("Newspaper download failed") from e
+    except ValueError as wrapped:
+        assert retry.classify(wrapped) == (retry.TRANSIENT, None)
+
+
+def test_backoff_is_jittered_and_capped(retry):
+    for attempt, ceiling in ((0, 10), (1, 20), (2, 40), (6, 100)):
+        delays = [retry.backoff(attempt) for _ in range(200)]
+        assert all(ceiling / 2 <= d <= ceiling for d in delays)
+        assert len(set(delays)) > 1
+    assert 30 <= retry.backoff(0, retry.RATE_LIMITED, retry_after=30) <= 37.5
+    assert 20 <= retry.backoff(0, retry.RATE_LIMITED) <= 40
+
+
+def test_retry_task_skips_permanent_errors(retry):
+    calls = []
+    task = types.SimpleNamespace(
+        name="tasks.publish_article_task", request=types.SimpleNamespace(retries=1),
+        retry=lambda exc, countdown: calls.append(countdown) or RuntimeError("retry"),
+    )
+    with pytest.raises(BadRequest):
+        retry.retry_task(task, BadRequest("Message is too long"))
+    assert calls == []
+    assert isinstance(retry.retry_task(task, TimedOut()), RuntimeError)
+    assert 10 <= calls[0] <= 20
@@ -7,10 +7,10 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")
 
 
 def setup_db():
-    sys.modules.pop("sqlalchemy", None)
-    sys.modules.pop("sqlalchemy.orm", None)
-    sys.modules.pop("sqlalchemy.ext.declarative", None)
-    sys.modules.pop("sqlalchemy.pool", None)
+    # فقط ماژول‌های جایگزین (stub) تست‌های دیگر حذف می‌شوند؛ sqlalchemy واقعی دوباره import نمی‌شود
+    for name in ("sqlalchemy", "sqlalchemy.orm", "sqlalchemy.ext.declarative", "sqlalchemy.pool"):
+        if name in sys.modules and not hasattr(sys.modules[name], "__file__"):
+            sys.modules.pop(name)
 
     from sqlalchemy import create_engine
     from sqlalchemy.orm import sessionmaker
@@ -0,0 +1,118 @@
+import os
+import sys
+import types
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+
+def setup_db():
+    # test_eventloop ماژول sqlalchemy.orm را با یک stub جایگزین می‌کند
+    if not hasattr(sys.modules.get("sqlalchemy.orm"), "sessionmaker"):
+        sys.modules.pop("sqlalchemy.orm", None)
+
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.ext.declarative import declarative_base
+    from sqlalchemy.pool import StaticPool
+    from sqlalchemy import Text
+
+    mysql_dialect = types.ModuleType("sqlalchemy.dialects.mysql")
+    mysql_dialect.LONGTEXT = Text
+    sys.modules["sqlalchemy.dialects.mysql"] = mysql_dialect
+    import sqlalchemy.dialects as _dials
+    _dials.mysql = mysql_dialect
+
+    Base = declarative_base()
+    engine = create_engine(
+        "sqlite:///:memory:", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    SessionLocal = sessionmaker(bind=engine)
+
+    core_database_mod = types.ModuleType("core.database")
+    core_database_mod.Base = Base
+    core_database_mod.SessionLocal = SessionLocal
+    sys.modules["core.database"] = core_database_mod
+
+    sys.modules.pop("core.db_models", None)
+    sys.modules.pop("core.state_machine", None)
+    from core.db_models import Article, ArticleTransition  # type: ignore
+    import core.state_machine as state_machine  # type: ignore
+
+    Base.metadata.create_all(bind=engine)
+    return SessionLocal, Article, ArticleTransition, state_machine
+
+
+def test_transition_is_compare_and_set_and_logged():
+    SessionLocal, Article, ArticleTransition, state_machine = setup_db()
+    session = SessionLocal()
+    article = Article(source_name="src", original_url="u1", original_title="t1", status="new")
+    session.add(article)
+    state_machine.record_creation(session, article)
+    session.commit()
+
+    assert state_machine.transition(session, article.id, "new", "pending_initial_approval", admin_chat_id=5)
+    # کلیک دوم روی همان دکمه نباید دوباره وضعیت را تغییر دهد
+    assert state_machine.transition(session, article.id, "pending_initial_approval", "approved")
+    assert not state_machine.transition(session, article.id, "pending_initial_approval", "approved")
+
+    stored = session.query(Article).filter_by(id=article.id).first()
+    assert stored.status == "approved"
+    assert stored.admin_chat_id == 5
+
+    log = session.query(ArticleTransition).order_by(ArticleTransition.id).all()
+    assert [(t.from_status, t.to_status) for t in log] == [
+        (None, "new"),
+        ("new", "pending_initial_approval"),
+        ("pending_initial_approval", "approved"),
+    ]
+
+
+def test_disallowed_transition_raises():
+    _, _, _, state_machine = setup_db()
+    try:
+        state_machine.transition(None, 1, "published", "new")
+    except state_machine.InvalidTransition:
+        return
+    assert False, "expected InvalidTransition"
+
+
+def test_transition_log_survives_article_cleanup(sqlite_db, reimport):
+    from sqlalchemy import text
+    state_machine = reimport("core.state_machine")
+    session, Article, ArticleTransition = sqlite_db.session, sqlite_db.models.Article, sqlite_db.models.ArticleTransition
+    session.execute(text("PRAGMA foreign_keys=ON"))
+    article = Article(source_name="src", original_url="u1", original_title="t1", status="new")
+    session.add(article)
+    state_machine.record_creation(session, article)
+    session.commit()
+    assert state_machine.transition(session, article.id, "new", "pending_initial_approval")
+
+    # همان حذف دسته‌ای cleanup_db_job
+    session.query(Article).filter(Article.id == article.id).delete(synchronize_session=False)
+    session.commit()
+
+    log = session.query(ArticleTransition).order_by(ArticleTransition.id).all()
+    assert [(t.article_id, t.to_status) for t in log] == [(None, "new"), (None, "pending_initial_approval")]
+
+
+def test_every_reachable_status_is_listed_and_fetching_is_log_only(sqlite_db, reimport):
+    state_machine = reimport("core.state_machine")
+    assert state_machine.ARTICLE_STATUSES[:6] == [
+        "new", "pending_initial_approval", "approved", "pending_publication", "sent_for_publication", "publishing",
+    ]
+    assert {"published", "discarded", "archived_unlinked"} <= set(state_machine.ARTICLE_STATUSES)
+    assert state_machine.FETCH_STAGE not in state_machine.ARTICLE_STATUSES
+
+    session, Article, ArticleTransition = sqlite_db.session, sqlite_db.models.Article, sqlite_db.models.ArticleTransition
+    article = Article(source_name="src", original_url="u1", original_title="t1", status="new")
+    session.add(article)
+    state_machine.record_creation(session, article, started_at=datetime.utcnow())
+    session.commit()
+    log = session.query(ArticleTransition).order_by(ArticleTransition.id).all()
+    assert [(t.from_status, t.to_status) for t in log] == [(None, "fetching"), ("fetching", "new")]
+    try:
+        state_machine.transition(session, article.id, "fetching", "new")
+    except state_machine.InvalidTransition:
+        return
+    assert False, "expected InvalidTransition"
@@ -0,0 +1,202 @@
+import asyncio
+import importlib
+import os
+import sys
+import time
+import types
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+STREAM = "test_requests"
+
+
+@pytest.fixture
+def listener_module(monkeypatch):
+    pytest.importorskip("fakeredis")
+    config = types.ModuleType("core.config")
+    config.settings = types.SimpleNamespace(
+        REDIS_URL="redis://fake", STREAM_BATCH_SIZE=10, STREAM_COALESCE_WINDOW_MS=200, STREAM_MAXLEN=1000,
+        STREAM_PENDING_IDLE_MS=0, STREAM_MAX_DELIVERIES=3, STREAM_MAINTENANCE_INTERVAL=3600,
+        LISTENER_HEALTH_PORT=0, LISTENER_SHUTDOWN_TIMEOUT=5,
+    )
+    monkeypatch.setitem(sys.modules, "core.config", config)
+    celery_app = types.ModuleType("celery_app")
+    celery_app.task_signature = lambda *a, **k: None
+    monkeypatch.setitem(sys.modules, "celery_app", celery_app)
+    jobs = types.ModuleType("handlers.jobs")
+    jobs.dispatch_preprocess_tasks = lambda: None
+    monkeypatch.setitem(sys.modules, "handlers.jobs", jobs)
+    # تست‌های دیگر utils و core.metrics را با stub جایگزین می‌کنند
+    for name in ("utils", "core.metrics"):
+        if name in sys.modules and not getattr(sys.modules[name], "__file__", None):
+            monkeypatch.delitem(sys.modules, name)
+    monkeypatch.delitem(sys.modules, "stream_listener", raising=False)
+    module = importlib.import_module("stream_listener")
+    monkeypatch.setattr(module, "READ_BLOCK_MS", 50)
+    yield module
+    sys.modules.pop("stream_listener", None)
+
+
+def make_listener(module, handler, coalesce=False):
+    from fakeredis import aioredis
+    r = aioredis.FakeRedis()
+    return module.StreamListener(r, {STREAM: module.StreamHandler(STREAM, handler, coalesce=coalesce)}), r
+
+
+async def wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "condition not reached"
+        await asyncio.sleep(0.01)
+
+
+def test_shutdown_stops_reading_and_finishes_in_flight_batches(listener_module):
+    started, finished = [], []
+
+    def slow_handler(entries):
+        started.append(len(entries))
+        time.sleep(0.3)
+        finished.append(len(entries))
+
+    async def scenario():
+        listener, r = make_listener(listener_module, slow_handler)
+        run = asyncio.create_task(listener.run())
+        await wait_until(lambda: STREAM in listener.heartbeats)
+        await r.xadd(STREAM, {"trigger": "test"})
+        await wait_until(lambda: started)
+        listener.stopping.set()
+        await asyncio.wait_for(run, timeout=5)
+        # batch در حال اجرا پیش از خروج تمام و ack شده است
+        assert finished == [1]
+        assert (await r.xpending(STREAM, listener_module.GROUP_NAME))["pending"] == 0
+        # پس از توقف هیچ پیام جدیدی خوانده نمی‌شود
+        await r.xadd(STREAM, {"trigger": "late"})
+        await asyncio.sleep(0.2)
+        assert started == [1]
+        group = (await r.xinfo_groups(STREAM))[0]
+        assert group["lag"] == 1
+
+    asyncio.run(scenario())
+
+
+
+async def deliver_to_dead_replica(module, listener, r, count=1):
+    """پیام‌ها را به مصرف‌کننده‌ای تحویل می‌دهد که هرگز ack نمی‌کند (مثل replica ای که از کار افتاده)."""
+    await listener.create_groups()
+    for i in range(count):
+        await r.xadd(STREAM, {"trigger": str(i)})
+    await r.xreadgroup(module.GROUP_NAME, "dead-replica", streams={STREAM: ">"}, count=count)
+
+
+async def reclaim_and_wait(listener):
+    await listener.reclaim_pending(STREAM)
+    if listener.in_flight:
+        await asyncio.wait(set(listener.in_flight))
+
+
+def test_reclaimed_messages_are_acked_only_after_the_handler_succeeds(listener_module):
+    calls = []
+
+    def flaky_handler(entries):
+        calls.append(len(entries))
+        if len(calls) == 1:
+            raise RuntimeError("broker down")
+
+    async def scenario():
+        listener, r = make_listener(listener_module, flaky_handler)
+        await deliver_to_dead_replica(listener_module, listener, r, count=2)
+
+        # پیام‌های replica مرده claim می‌شوند؛ خطای handler آن‌ها را معلق نگه می‌دارد
+        await reclaim_and_wait(listener)
+        pending = await r.xpending_range(STREAM, listener_module.GROUP_NAME, min="-", max="+", count=10)
+        assert calls == [2] and len(pending) == 2
+        assert {p["consumer"] for p in pending} == {listener_module.CONSUMER_NAME.encode()}
+
+        await reclaim_and_wait(listener)
+        assert calls == [2, 2]
+        assert (await r.xpending(STREAM, listener_module.GROUP_NAME))["pending"] == 0
+        assert await r.xlen(STREAM + listener_module.DEAD_LETTER_SUFFIX) == 0
+
+    asyncio.run(scenario())
+
+
+def test_messages_past_the_delivery_limit_go_to_the_dead_letter_stream(listener_module):
+    calls = []
+
+    def failing_handler(entries):
+        calls.append(len(entries))
+        raise RuntimeError("always fails")
+
+    async def scenario():
+        listener, r = make_listener(listener_module, failing_handler)
+        await deliver_to_dead_replica(listener_module, listener, r)
+        max_deliveries = listener_module.settings.STREAM_MAX_DELIVERIES
+
+        # تحویل اول به replica مرده و هر claim یک تحویل دیگر است
+        for _ in range(max_deliveries - 1):
+            await reclaim_and_wait(listener)
+        assert len(calls) == max_deliveries - 1
+        assert (await r.xpending(STREAM, listener_module.GROUP_NAME))["pending"] == 1
+
+        await reclaim_and_wait(listener)
+        assert len(calls) == max_deliveries - 1
+        assert (await r.xpending(STREAM, listener_module.GROUP_NAME))["pending"] == 0
+        dead = await r.xrange(STREAM + listener_module.DEAD_LETTER_SUFFIX)
+        assert len(dead) == 1
+        fields = dead[0][1]
+        assert fields[b"trigger"] == b"0" and int(fields[b"deliveries"]) == max_deliveries + 1
+
+    asyncio.run(scenario())
+
+
+def test_maintenance_trims_streams_and_removes_only_idle_consumers(listener_module, monkeypatch):
+    monkeypatch.setattr(listener_module.settings, "STREAM_MAXLEN", 5)
+    monkeypatch.setattr(listener_module.settings, "STREAM_PENDING_IDLE_MS", 60_000)
+    monkeypatch.setattr(listener_module, "STALE_CONSUMER_IDLE_MS", -1)
+
+    async def scenario():
+        listener, r = make_listener(listener_module, lambda entries: None)
+        # یک replica با پیام معلق و یک replica بی‌کار که دیگر وجود ندارد
+        await deliver_to_dead_replica(listener_module, listener, r)
+        await r.xreadgroup(listener_module.GROUP_NAME, "idle-replica", streams={STREAM: ">"}, count=1)
+        for i in range(299):
+            await r.xadd(STREAM, {"trigger": f"extra-{i}"})
+
+        await listener.run_maintenance()
+
+        # trim تقریبی (~) فقط node های کامل (۱۰۰ پیامی) را حذف می‌کند
+        assert 5 <= await r.xlen(STREAM) <= 100
+        consumers = {c["name"] for c in await r.xinfo_consumers(STREAM, listener_module.GROUP_NAME)}
+        assert consumers == {b"dead-replica", listener_module.CONSUMER_NAME.encode()}
+        assert listener.health[STREAM]["consumers"]["dead-replica"]["pending"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_requests_inside_the_coalesce_window_run_the_handler_once(listener_module):
+    calls = []
+
+    async def scenario():
+        listener, r = make_listener(listener_module, lambda entries: calls.append(len(entries)), coalesce=True)
+        await listener.create_groups()
+
+        async def request(trigger):
+            await r.xadd(STREAM, {"trigger": trigger})
+            [(_stream, entries)] = await r.xreadgroup(
+                listener_module.GROUP_NAME, listener_module.CONSUMER_NAME, streams={STREAM: ">"}, count=1
+            )
+            await listener.process_entries(STREAM, entries)
+
+        for i in range(3):
+            await request(str(i))
+        assert calls == [1]
+        # پیام‌های ادغام شده هم ack می‌شوند
+        assert (await r.xpending(STREAM, listener_module.GROUP_NAME))["pending"] == 0
+
+        await asyncio.sleep(listener_module.settings.STREAM_COALESCE_WINDOW_MS / 1000 + 0.05)
+        await request("later")
+        assert calls == [1, 1]
+
+    asyncio.run(scenario())
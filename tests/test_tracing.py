@@ -0,0 +1,38 @@
+import json
+import os
+import sys
+import types
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+core_config_mod = types.ModuleType("core.config")
+core_config_mod.settings = types.SimpleNamespace()
+sys.modules.setdefault("core.config", core_config_mod)
+
+from core import tracing
+
+
+def test_spans_join_article_trace_and_nest(tmp_path, monkeypatch):
+    path = tmp_path / "traces.jsonl"
+    monkeypatch.setattr(tracing, "settings", types.SimpleNamespace(TRACE_EXPORT_PATH=str(path), TRACE_COLLECTOR_URL=""))
+
+    with tracing.span("outside"):
+        pass  # بدون trace فعال چیزی ثبت نمی‌شود
+    with tracing.span("bot.callback", trace_id=tracing.article_trace_id(42)):
+        header = tracing.inject_context()
+        with tracing.span("llm.generate", prompt_type="title") as attrs:
+            attrs["output_tokens"] = 3
+    assert tracing.current_context() is None
+
+    # وظیفه‌ای در پردازه دیگر از روی هدر ادامه می‌دهد
+    state = tracing.start_span("task.process_article_task", parent=tracing.extract_context(header))
+    tracing.finish_span(state, error="RETRY")
+    tracing.flush()
+
+    spans = {s["name"]: s for s in map(json.loads, path.read_text().splitlines())}
+    assert set(spans) == {"bot.callback", "llm.generate", "task.process_article_task"}
+    assert {s["trace_id"] for s in spans.values()} == {f"{42:032x}"}
+    assert spans["llm.generate"]["parent_id"] == spans["bot.callback"]["span_id"]
+    assert spans["llm.generate"]["attributes"] == {"prompt_type": "title", "output_tokens": 3}
+    assert spans["task.process_article_task"]["parent_id"] == spans["bot.callback"]["span_id"]
+    assert spans["task.process_article_task"]["error"] == "RETRY"
@@ -0,0 +1,56 @@
+import os
+import sys
+import types
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+
+@pytest.fixture
+def tm(monkeypatch, sqlite_db, reimport):
+    config = types.ModuleType("core.config")
+    config.settings = types.SimpleNamespace(GLOSSARY_MIN_OCCURRENCES=3, CONFIG_CACHE_TTL=300)
+    monkeypatch.setitem(sys.modules, "core.config", config)
+    redis_client = types.ModuleType("core.redis_client")
+    redis_client.on_event = lambda *a: None
+    redis_client.publish_event = lambda *a: None
+    monkeypatch.setitem(sys.modules, "core.redis_client", redis_client)
+    return sqlite_db.session, reimport("core.translation_memory")
+
+
+def test_exact_and_number_only_matches_are_answered_locally(tm):
+    db, tm = tm
+    tm.remember(db, "en", "fa", "5 killed in Kabul blast - Reuters", "۵ کشته در انفجار کابل")
+
+    assert tm.lookup(db, "5 Killed in Kabul Blast", "en", "fa") == ("۵ کشته در انفجار کابل", "exact")
+    assert tm.lookup(db, "12 killed in Kabul blast", "en", "fa") == ("۱۲ کشته در انفجار کابل", "near")
+    assert tm.lookup(db, "5 injured in Kabul blast", "en", "fa") == (None, "miss")
+    assert tm.lookup(db, "5 killed in Kabul blast", "en", "de") == (None, "miss")
+
+
+def test_glossary_terms_are_learned_and_injected(tm):
+    db, tm = tm
+    pairs = [
+        ("Talks with Kaja Kallas end without deal", "مذاکرات با کایا کالاس بدون توافق پایان یافت"),
+        ("Ministers meet Kaja Kallas in Brussels", "وزیران با کایا کالاس در بروکسل دیدار کردند"),
+        ("Ukraine aid backed by Kaja Kallas", "کمک به اوکراین با حمایت کایا کالاس"),
+    ]
+    for source, target in pairs:
+        tm.remember(db, "en", "fa", source, target)
+
+    hint = tm.glossary_hint(db, "Kaja Kallas visits Kyiv", "en", "fa")
+    assert "Kaja Kallas => کایا کالاس" in hint
+    assert tm.glossary_hint(db, "Nothing relevant here", "en", "fa") == ""
+
+
+def test_like_wildcards_in_a_term_do_not_crowd_out_real_matches(tm):
+    db, tm = tm
+    tm.remember(db, "en", "fa", "Talks with Acme_Labs end without deal", "مذاکرات با آکمه لبز بدون توافق پایان یافت")
+    tm.remember(db, "en", "fa", "Regulators fine Acme_Labs again", "ناظران دوباره آکمه لبز را جریمه کردند")
+    # بدون escape، «_» در LIKE هر نویسه‌ای را می‌پذیرد و این عناوین جای ده نمونه اخیر را می‌گیرند
+    for word in ("rise", "fall", "jump", "slide", "soar", "sink", "climb", "drop", "surge", "stall"):
+        tm.remember(db, "en", "fa", f"Shares of AcmeXLabs {word}", f"سهام {word}")
+    tm.remember(db, "en", "fa", "Investors back Acme_Labs plan", "سرمایه‌گذاران از طرح آکمه لبز حمایت کردند")
+
+    assert "Acme_Labs => آکمه لبز" in tm.glossary_hint(db, "Acme_Labs opens new office", "en", "fa")
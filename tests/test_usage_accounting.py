@@ -0,0 +1,74 @@
+import os
+import sys
+import types
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+
+@pytest.fixture
+def usage(monkeypatch, sqlite_db, reimport):
+    config = types.ModuleType("core.config")
+    config.settings = types.SimpleNamespace(
+        LLM_USAGE_ENABLED=True, LLM_USAGE_RAW_DAYS=7, LLM_PRICES="flash=0.1/0.4, pro=1.25/5",
+    )
+    monkeypatch.setitem(sys.modules, "core.config", config)
+    return sqlite_db.session, reimport("core.llm_usage"), sqlite_db.models
+
+
+def test_calls_are_attributed_and_reported_with_cost(usage):
+    db, llm_usage, models = usage
+    with llm_usage.attribute(7, "Reuters"):
+        llm_usage.record("summary", "pro", 1_000_000, 200_000, 2.5)
+        llm_usage.record("content", "flash", 500_000, 500_000, 1.0, failed=True)
+    llm_usage.record("score", "unknown-model", 100, 1, 0.2)
+    llm_usage.flush()
+
+    rows = db.query(models.LLMUsage).order_by(models.LLMUsage.id).all()
+    assert [(r.article_id, r.source_name, r.latency_ms) for r in rows] == [(7, "Reuters", 2500), (7, "Reuters", 1000), (None, None, 200)]
+
+    report = llm_usage.usage_report(db, hours=24)
+    reuters = report["source"]["Reuters"]
+    assert reuters["calls"] == 2 and reuters["failures"] == 1 and reuters["published"] == 0
+    assert round(reuters["cost"], 4) == round(1.25 + 1.0 + 0.05 + 0.2, 4)
+    assert report["total"]["priced"] is False
+    assert report["model"]["pro"]["output_tokens"] == 200_000
+
+
+def test_rollup_moves_old_rows_into_daily_totals(usage):
+    db, llm_usage, models = usage
+    old = datetime.utcnow() - timedelta(days=10)
+    for tokens in (100, 300):
+        db.add(models.LLMUsage(
+            created_at=old, article_id=1, source_name="BBC", prompt_type="title", model="flash",
+            input_tokens=tokens, output_tokens=10, latency_ms=500, failed=False,
+        ))
+    db.commit()
+    llm_usage.record("title", "flash", 50, 5, 0.1)
+    llm_usage.flush()
+
+    assert llm_usage.rollup(db) == 2
+    daily = db.query(models.LLMUsageDaily).one()
+    assert (daily.day, daily.source_name, daily.calls, daily.input_tokens) == (old.date(), "BBC", 2, 400)
+    assert db.query(models.LLMUsage).count() == 1
+
+    report = llm_usage.usage_report(db, hours=24 * 30)
+    assert report["total"]["calls"] == 3 and report["source"]["BBC"]["input_tokens"] == 400
+
+
+def test_calls_are_written_in_batches_off_the_calling_thread(usage, monkeypatch):
+    db, llm_usage, models = usage
+    batches = []
+    write_batch = llm_usage._write_batch
+    monkeypatch.setattr(llm_usage, "_write_batch", lambda batch: (batches.append(len(batch)), write_batch(batch)))
+    monkeypatch.setattr(llm_usage, "FLUSH_INTERVAL", 0.5)
+
+    for _ in range(20):
+        llm_usage.record("title", "flash", 10, 2, 0.1)
+    llm_usage.flush()
+
+    # بیست فراخوانی با یک INSERT دسته‌ای و یک commit نوشته می‌شوند
+    assert batches == [20]
+    assert db.query(models.LLMUsage).count() == 20